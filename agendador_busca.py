@@ -0,0 +1,97 @@
+from typing import Callable, List, Optional
+from livro import Livro
+from tarefas import DespachanteTarefas, Tarefa
+from texto import normalizar
+
+
+class AgendadorBusca:
+    """
+    Agenda as buscas da caixa de busca fora da thread da interface
+    Cada nova digitação cancela a busca pendente (debounce). As consultas rodam na thread
+    do DespachanteTarefas, no grupo informado: uma busca nova cancela a anterior (e as
+    demais tarefas do grupo), então resultados de buscas já substituídas são descartados.
+    Se o termo novo apenas estende o anterior, o resultado anterior é filtrado em memória.
+    """
+
+    def __init__(self, root, executar: Callable[[str, str], List[Livro]],
+                 ao_concluir: Callable[[str, List[Livro]], None],
+                 ao_falhar: Callable[[Exception], None],
+                 filtrar: Optional[Callable[[List[Livro], str, str], List[Livro]]] = None,
+                 atraso_ms: int = 300, despachante: Optional[DespachanteTarefas] = None,
+                 grupo: str = 'busca'):
+        self.root = root
+        self.executar = executar
+        self.ao_concluir = ao_concluir
+        self.ao_falhar = ao_falhar
+        self.filtrar = filtrar
+        self.atraso_ms = atraso_ms
+        self.grupo = grupo
+        self._proprio = despachante is None
+        self.despachante = despachante or DespachanteTarefas(root)
+
+        self._pendente = None
+        self._tarefa: Optional[Tarefa] = None
+        self._ultima = None
+
+    def agendar(self, tipo: str, termo: str):
+        """Agenda uma busca, cancelando a que ainda estava aguardando o atraso"""
+        self._cancelar_pendente()
+        self._pendente = self.root.after(self.atraso_ms, lambda: self.buscar_agora(tipo, termo))
+
+    def buscar_agora(self, tipo: str, termo: str):
+        """Dispara a busca imediatamente"""
+        self._cancelar_pendente()
+        self._cancelar_tarefa()
+        # Vale também para o resultado filtrado em memória: outra carga do grupo não o sobrescreve
+        self.despachante.cancelar_grupo(self.grupo)
+
+        livros = self._estreitar(tipo, termo)
+        if livros is not None:
+            self._concluir(tipo, termo, livros)
+            return
+
+        self._tarefa = self.despachante.executar(
+            lambda: self.executar(tipo, termo),
+            ao_concluir=lambda livros: self._concluir(tipo, termo, livros),
+            ao_falhar=self.ao_falhar, descricao=f"Buscando '{termo}'", grupo=self.grupo
+        )
+
+    def cancelar(self):
+        """Cancela a busca pendente e descarta o resultado da que estiver em andamento"""
+        self._cancelar_pendente()
+        self._cancelar_tarefa()
+
+    def invalidar(self):
+        """Esquece o último resultado (usar após alterações no catálogo)"""
+        self._ultima = None
+
+    def fechar(self):
+        """Cancela as buscas e encerra o despachante, se foi criado pelo agendador"""
+        self.cancelar()
+        if self._proprio:
+            self.despachante.fechar()
+
+    def _cancelar_pendente(self):
+        if self._pendente is not None:
+            self.root.after_cancel(self._pendente)
+            self._pendente = None
+
+    def _cancelar_tarefa(self):
+        if self._tarefa is not None:
+            self._tarefa.cancelar()
+            self._tarefa = None
+
+    def _estreitar(self, tipo: str, termo: str) -> Optional[List[Livro]]:
+        """Filtra o último resultado em memória quando o termo novo estende o anterior"""
+        if self.filtrar is None or self._ultima is None:
+            return None
+
+        tipo_anterior, termo_anterior, livros = self._ultima
+        if tipo != tipo_anterior or not normalizar(termo).startswith(normalizar(termo_anterior)):
+            return None
+        return self.filtrar(livros, tipo, termo)
+
+    def _concluir(self, tipo: str, termo: str, livros: List[Livro]):
+        self._tarefa = None
+        self._ultima = (tipo, termo, livros)
+        self.ao_concluir(termo, livros)
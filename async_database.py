@@ -0,0 +1,137 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, List, Optional, Tuple, Union
+from database import (DatabaseManager, PerfilArmazenamento, ResultadoAlteracoes, ResultadoBusca,
+                      ResultadoFiltro, ResultadoImportacao)
+from livro import Livro
+
+
+class AsyncDatabaseManager:
+    """
+    Fachada asyncio para o DatabaseManager
+    As operações rodam em um executor dedicado, com tantas threads quanto conexões no
+    pool, então cada thread de trabalho usa uma conexão sem esperar pelas outras.
+    O número de operações em andamento (executando ou na fila do executor) é limitado
+    por max_pendentes: chamadas além do limite aguardam, sem bloquear o event loop.
+    Um db_manager informado continua sendo de quem o criou: fechar() não o fecha.
+    """
+
+    def __init__(self, db_name: str = "catalogo_livros.db", max_workers: int = 4,
+                 max_pendentes: Optional[int] = None,
+                 perfil: Optional[PerfilArmazenamento] = None,
+                 db_manager: Optional[DatabaseManager] = None):
+        if max_workers < 1:
+            raise ValueError("É preciso pelo menos uma thread de trabalho")
+
+        self.max_workers = max_workers
+        self.max_pendentes = max_pendentes or max_workers * 2
+        # Só o gerenciador criado aqui é fechado por fechar()
+        self._proprio = db_manager is None
+        if db_manager is None:
+            db_manager = DatabaseManager(db_name, tamanho_pool=max_workers, perfil=perfil)
+        self.db_manager = db_manager
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='catalogo-db')
+        self._semaforo: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.fechar()
+
+    async def _executar(self, funcao, *args, **kwargs):
+        """Executa uma chamada bloqueante no executor, respeitando o limite de pendentes"""
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.max_pendentes)
+
+        loop = asyncio.get_running_loop()
+        semaforo = self._semaforo
+        await semaforo.acquire()
+        try:
+            futuro = self._executor.submit(functools.partial(funcao, *args, **kwargs))
+        except BaseException:
+            semaforo.release()
+            raise
+
+        def liberar(_):
+            # A vaga só é liberada quando a thread termina, mesmo se a corrotina for cancelada
+            try:
+                loop.call_soon_threadsafe(semaforo.release)
+            except RuntimeError:
+                pass  # event loop já encerrado
+
+        futuro.add_done_callback(liberar)
+        return await asyncio.wrap_future(futuro)
+
+    async def criar_livro(self, livro: Livro, permitir_duplicado: bool = False) -> int:
+        return await self._executar(self.db_manager.criar_livro, livro, permitir_duplicado)
+
+    async def criar_livros(self, livros: Iterable[Union[Livro, dict]], tamanho_lote: int = 1000,
+                           duplicados: str = 'inserir') -> ResultadoImportacao:
+        return await self._executar(self.db_manager.criar_livros, livros, tamanho_lote, duplicados)
+
+    async def listar_livros(self) -> List[Livro]:
+        return await self._executar(self.db_manager.listar_livros)
+
+    async def buscar_livro_por_codigo(self, codigo: int) -> Optional[Livro]:
+        return await self._executar(self.db_manager.buscar_livro_por_codigo, codigo)
+
+    async def atualizar_livro(self, livro: Livro) -> bool:
+        return await self._executar(self.db_manager.atualizar_livro, livro)
+
+    async def deletar_livro(self, codigo: int, versao: Optional[int] = None) -> bool:
+        return await self._executar(self.db_manager.deletar_livro, codigo, versao)
+
+    async def atualizar_livros(self, livros: Iterable[Livro]) -> ResultadoAlteracoes:
+        return await self._executar(self.db_manager.atualizar_livros, livros)
+
+    async def deletar_livros(self, itens: Iterable[Union[int, Tuple[int, Optional[int]]]]
+                             ) -> ResultadoAlteracoes:
+        return await self._executar(self.db_manager.deletar_livros, itens)
+
+    async def buscar_livros_por_titulo(self, titulo: str) -> List[Livro]:
+        return await self._executar(self.db_manager.buscar_livros_por_titulo, titulo)
+
+    async def buscar_livros_por_autor(self, autor: str) -> List[Livro]:
+        return await self._executar(self.db_manager.buscar_livros_por_autor, autor)
+
+    async def pesquisar(self, termo: str, campos: Optional[Iterable[str]] = None, limite: int = 50,
+                        marcadores: Tuple[str, str] = ('[', ']')) -> List[ResultadoBusca]:
+        return await self._executar(self.db_manager.pesquisar, termo, campos, limite, marcadores)
+
+    async def filtrar(self, genero: Optional[str] = None, editora: Optional[str] = None,
+                      ano_min: Optional[int] = None, ano_max: Optional[int] = None,
+                      termo: Optional[str] = None, campos: Optional[Iterable[str]] = None,
+                      autor: Optional[str] = None, limite: int = 50,
+                      inicio: int = 0) -> ResultadoFiltro:
+        return await self._executar(self.db_manager.filtrar, genero, editora, ano_min, ano_max,
+                                    termo, campos, autor, limite, inicio)
+
+    async def contar_livros(self) -> int:
+        return await self._executar(self.db_manager.contar_livros)
+
+    async def pagina_apos(self, titulo: Optional[str] = None, codigo: Optional[int] = None,
+                          limite: int = 50) -> List[Livro]:
+        return await self._executar(self.db_manager.pagina_apos, titulo, codigo, limite)
+
+    async def iterar_livros(self, tamanho_lote: int = 500) -> AsyncIterator[Livro]:
+        """Percorre o catálogo em ordem de título, buscando uma página por vez"""
+        if tamanho_lote < 1:
+            raise ValueError("Tamanho do lote deve ser positivo")
+
+        titulo, codigo = None, None
+        while True:
+            pagina = await self.pagina_apos(titulo, codigo, tamanho_lote)
+            for livro in pagina:
+                yield livro
+            if len(pagina) < tamanho_lote:
+                return
+            titulo, codigo = pagina[-1].titulo, pagina[-1].codigo
+
+    async def fechar(self):
+        """Aguarda as operações em andamento e fecha as conexões (se o gerenciador é próprio)"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        if self._proprio:
+            self.db_manager.fechar()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Catálogo de Livros - Benchmark
+Mede as operações do DatabaseManager e do Livro sobre catálogos sintéticos
+
+Uso:
+    python benchmark.py                                  # catálogo de 10 mil livros
+    python benchmark.py --tamanhos 10000 100000 1000000 --saida resultado.json
+    python benchmark.py --comparar resultado.json        # falha se houver regressão
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import DatabaseManager, PerfilArmazenamento
+from lista_virtual import FonteCatalogo
+from livro import Livro
+from trigramas import IndiceTrigramas
+
+
+SUBSTANTIVOS = [
+    'Sertão', 'Mar', 'Cidade', 'Noite', 'Memórias', 'Casa', 'Rio', 'Caminho', 'Coração',
+    'Tempo', 'Vento', 'Estrela', 'Sombra', 'Jardim', 'Canção', 'Ilha', 'Viagem', 'Segredo',
+    'Menino', 'Senhora', 'Lua', 'Floresta', 'Janela', 'Montanha', 'Cartas', 'Herança',
+]
+ADJETIVOS = [
+    'Perdido', 'Azul', 'Eterno', 'Silencioso', 'Antigo', 'Distante', 'Escondido', 'Dourado',
+    'Invisível', 'Sagrado', 'Amargo', 'Infinito', 'Proibido', 'Selvagem', 'Último', 'Brasileiro',
+]
+COMPLEMENTOS = [
+    'de Minas', 'do Norte', 'sem Fim', 'de Outono', 'da Serra', 'do Passado', 'de Pedra',
+    'das Águas', 'do Sul', 'de Papel', 'da Memória', 'do Amanhã',
+]
+NOMES = [
+    'Ângelo', 'Pablo', 'Maria', 'João', 'Ana', 'José', 'Clarice', 'Jorge', 'Cecília', 'Graciliano',
+    'Rachel', 'Érico', 'Lygia', 'Carlos', 'Raquel', 'Mário', 'Conceição', 'Aluísio', 'Hilda',
+]
+SOBRENOMES = [
+    'Carvalho', 'Nunes', 'Silva', 'Souza', 'Oliveira', 'Lispector', 'Amado', 'Meireles', 'Ramos',
+    'Queiroz', 'Veríssimo', 'Telles', 'Andrade', 'Azevedo', 'Evaristo', 'Assis', 'Alencar',
+]
+GENEROS = ['Romance', 'Poesia', 'Conto', 'Crônica', 'Ficção Científica', 'Fantasia',
+           'Biografia', 'História', 'Infantil', 'Suspense', 'Drama', 'Ensaio']
+EDITORAS = ['Companhia das Letras', 'Record', 'Rocco', 'Ática', 'Globo', 'Intrínseca',
+            'Nova Fronteira', 'Saraiva', 'Moderna', 'Objetiva', 'Todavia', 'Martins Fontes']
+SILABAS = [
+    'ba', 'be', 'bi', 'bo', 'ca', 'ce', 'co', 'cu', 'da', 'de', 'di', 'do', 'fa', 'fe', 'fi', 'ga',
+    'go', 'la', 'le', 'li', 'lo', 'lu', 'ma', 'me', 'mi', 'mo', 'na', 'ne', 'ni', 'no', 'pa', 'pe',
+    'pi', 'po', 'ra', 're', 'ri', 'ro', 'sa', 'se', 'si', 'so', 'ta', 'te', 'ti', 'to', 'va', 've',
+    'vi', 'vo', 'lha', 'nho', 'ção', 'ar', 'er', 'or', 'an', 'en', 'in', 'on', 'as', 'es', 'os',
+]
+LIGACOES = ['de', 'do', 'da', 'dos', 'das', 'e', 'o', 'a', 'os', 'as', 'no', 'na', 'em']
+
+
+def gerar_livros(quantidade: int, semente: int = 42) -> Iterator[dict]:
+    """Gera livros sintéticos com títulos e autores em português"""
+    aleatorio = random.Random(semente)
+    for _ in range(quantidade):
+        modelo = aleatorio.random()
+        substantivo = aleatorio.choice(SUBSTANTIVOS)
+        if modelo < 0.4:
+            titulo = f"O {substantivo} {aleatorio.choice(ADJETIVOS)}"
+        elif modelo < 0.8:
+            titulo = f"{substantivo} {aleatorio.choice(COMPLEMENTOS)}"
+        else:
+            titulo = f"{substantivo} {aleatorio.choice(ADJETIVOS)} {aleatorio.choice(COMPLEMENTOS)}"
+        yield {
+            'titulo': titulo,
+            'autor': f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} "
+                     f"{aleatorio.choice(SOBRENOMES)}",
+            'genero': aleatorio.choice(GENEROS),
+            'editora': aleatorio.choice(EDITORAS),
+            'ano_publicacao': aleatorio.randint(1850, 2025),
+        }
+
+
+def gerar_titulos_distintos(quantidade: int, semente: int = 42) -> List[str]:
+    """
+    Gera títulos distintos com palavras sintéticas (sílabas do português)
+    Os títulos de gerar_livros() se repetem e virariam poucos textos no índice de trigramas.
+    """
+    aleatorio = random.Random(semente)
+    vocabulario = set()
+    while len(vocabulario) < 30000:
+        vocabulario.add(''.join(aleatorio.choice(SILABAS) for _ in range(aleatorio.randint(2, 4))))
+    vocabulario = sorted(vocabulario)
+
+    titulos = {}
+    while len(titulos) < quantidade:
+        palavras = [aleatorio.choice(vocabulario) for _ in range(aleatorio.randint(2, 4))]
+        if len(palavras) > 2 and aleatorio.random() < 0.6:
+            palavras.insert(1, aleatorio.choice(LIGACOES))
+        titulos[' '.join(palavras)] = None
+    return list(titulos)
+
+
+def digitar_com_erro(aleatorio: random.Random, texto: str) -> str:
+    """Troca, apaga ou insere uma letra do texto"""
+    posicao = aleatorio.randrange(len(texto))
+    letra = aleatorio.choice('abcdefghijlmnopqrstuv')
+    operacao = aleatorio.randrange(3)
+    if operacao == 0:
+        return texto[:posicao] + letra + texto[posicao + 1:]
+    if operacao == 1:
+        return texto[:posicao] + texto[posicao + 1:]
+    return texto[:posicao] + letra + texto[posicao:]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil pelo método do posto mais próximo (valores já ordenados)"""
+    if not valores:
+        return 0.0
+    posicao = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))
+    return valores[posicao]
+
+
+def medir(operacao: Callable[[], int], repeticoes: int) -> Dict[str, float]:
+    """
+    Executa a operação várias vezes e resume as latências em milissegundos
+    A operação retorna quantas linhas processou, para calcular linhas por segundo.
+    """
+    tempos = []
+    linhas = 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        linhas += operacao() or 0
+        tempos.append(time.perf_counter() - inicio)
+
+    tempos.sort()
+    total = sum(tempos)
+    return {
+        'repeticoes': repeticoes,
+        'p50_ms': percentil(tempos, 50) * 1000,
+        'p95_ms': percentil(tempos, 95) * 1000,
+        'p99_ms': percentil(tempos, 99) * 1000,
+        'media_ms': total / repeticoes * 1000,
+        'max_ms': tempos[-1] * 1000,
+        'linhas_por_segundo': linhas / total if total > 0 else 0.0,
+    }
+
+
+def preparar_banco(caminho: str, tamanho: int, semente: int,
+                   perfil: Optional[PerfilArmazenamento] = None) -> DatabaseManager:
+    """Cria (ou reaproveita) o banco sintético com o tamanho pedido"""
+    db = DatabaseManager(caminho, perfil=perfil)
+    existentes = db.contar_livros()
+    if existentes < tamanho:
+        db.criar_livros(gerar_livros(tamanho - existentes, semente + existentes), tamanho_lote=5000)
+    return db
+
+
+def executar_cenarios(db: DatabaseManager, tamanho: int, repeticoes: int,
+                      semente: int) -> Dict[str, Dict[str, float]]:
+    """Mede cada operação sobre um banco já preenchido"""
+    aleatorio = random.Random(semente)
+    codigos = [aleatorio.randint(1, tamanho) for _ in range(repeticoes * 10)]
+    palavras = [p.lower() for p in SUBSTANTIVOS + ADJETIVOS]
+    fonte = FonteCatalogo(db)
+    resultados = {}
+
+    repeticoes_lista = max(3, repeticoes // 20) if tamanho >= 100000 else max(5, repeticoes // 5)
+    resultados['listar_livros'] = medir(lambda: len(db.listar_livros()), repeticoes_lista)
+    resultados['iterar_livros'] = medir(lambda: sum(1 for _ in db.iterar_livros()), repeticoes_lista)
+
+    fila = iter(codigos)
+    resultados['buscar_livro_por_codigo'] = medir(
+        lambda: 1 if db.buscar_livro_por_codigo(next(fila)) else 0, repeticoes * 10
+    )
+    resultados['buscar_livros_por_titulo'] = medir(
+        lambda: len(db.buscar_livros_por_titulo(aleatorio.choice(palavras))), repeticoes
+    )
+    resultados['buscar_livros_por_autor'] = medir(
+        lambda: len(db.buscar_livros_por_autor(aleatorio.choice(SOBRENOMES))), repeticoes
+    )
+    if db.fts_disponivel:
+        resultados['pesquisar'] = medir(
+            lambda: len(db.pesquisar(f"{aleatorio.choice(palavras)} {aleatorio.choice(SOBRENOMES)}")),
+            repeticoes
+        )
+    resultados['pagina_apos'] = medir(lambda: len(db.pagina_apos(limite=50)), repeticoes)
+    resultados['contar_livros'] = medir(db.contar_livros, repeticoes)
+    resultados['filtrar_livros'] = medir(
+        lambda: len(db.filtrar_livros(genero=aleatorio.choice(GENEROS))), repeticoes
+    )
+    resultados['filtrar_facetas'] = medir(
+        lambda: len(db.filtrar(genero=aleatorio.choice(GENEROS)).livros), repeticoes
+    )
+
+    # Caminho de atualização da lista da interface, sem Tk: total + janela visível
+    def atualizar_janela():
+        fonte.invalidar()
+        total = fonte.contar()
+        return len(fonte.janela(aleatorio.randint(0, max(total - 30, 0)), 30))
+    resultados['atualizar_lista_janela'] = medir(atualizar_janela, repeticoes)
+
+    novos = gerar_livros(repeticoes, semente + tamanho)
+    resultados['criar_livro'] = medir(
+        lambda: 1 if db.criar_livro(Livro.from_dict(next(novos))) else 0, repeticoes
+    )
+
+    lotes = iter(range(repeticoes))
+    resultados['criar_livros'] = medir(
+        lambda: db.criar_livros(gerar_livros(1000, semente + next(lotes))).inseridos,
+        max(3, repeticoes // 20)
+    )
+
+    dados = list(gerar_livros(1000, semente))
+    resultados['livro_from_dict'] = medir(
+        lambda: len([Livro.from_dict(d) for d in dados]), repeticoes
+    )
+
+    resultados['busca_aproximada'] = medir_busca_aproximada(tamanho, repeticoes, semente)
+    return resultados
+
+
+def medir_busca_aproximada(tamanho: int, repeticoes: int, semente: int) -> Dict[str, float]:
+    """
+    Mede IndiceTrigramas.buscar com os padrões da busca aproximada sobre tamanho títulos
+    distintos, procurando títulos do índice digitados com um erro
+    Numa máquina de um núcleo, com 1 milhão de títulos (24 milhões de entradas em só
+    1.643 trigramas distintos, listas longas), o p50 ficou em 22 ms e o p95 em 24 ms,
+    com o processo ocupando 1,1 GB.
+    """
+    titulos = gerar_titulos_distintos(tamanho, semente)
+    indice = IndiceTrigramas()
+    for codigo, titulo in enumerate(titulos, 1):
+        indice.adicionar(codigo, titulo)
+
+    aleatorio = random.Random(semente)
+    termos = iter([digitar_com_erro(aleatorio, aleatorio.choice(titulos)) for _ in range(repeticoes)])
+    return medir(lambda: len(indice.buscar(next(termos))), repeticoes)
+
+
+PERFIS_CONCORRENCIA = {
+    'rollback': lambda: PerfilArmazenamento(journal_mode='DELETE', synchronous='FULL',
+                                            cache_size_kb=None, mmap_size=None, temp_store=None,
+                                            wal_autocheckpoint=None),
+    'wal': PerfilArmazenamento,
+}
+
+
+def medir_concorrencia(caminho: str, perfil: PerfilArmazenamento, tamanho: int,
+                       leitores: int, duracao: float) -> Dict[str, float]:
+    """
+    Roda leitores e um escritor ao mesmo tempo, cada um com seu próprio DatabaseManager
+    (como instâncias diferentes da interface ou scripts de relatório), e conta as
+    operações concluídas por segundo.
+    """
+    parar = threading.Event()
+    contagem = {'leituras': 0, 'escritas': 0, 'erros': 0}
+    lock = threading.Lock()
+
+    def ler(semente):
+        aleatorio = random.Random(semente)
+        with DatabaseManager(caminho, tamanho_pool=1, perfil=perfil) as db:
+            while not parar.is_set():
+                try:
+                    db.buscar_livro_por_codigo(aleatorio.randint(1, tamanho))
+                    db.pagina_apos(limite=20)
+                    with lock:
+                        contagem['leituras'] += 2
+                except Exception:
+                    with lock:
+                        contagem['erros'] += 1
+
+    def escrever():
+        novos = gerar_livros(10 ** 9, tamanho)
+        with DatabaseManager(caminho, tamanho_pool=1, perfil=perfil) as db:
+            while not parar.is_set():
+                try:
+                    codigo = db.criar_livro(Livro.from_dict(next(novos)))
+                    db.deletar_livro(codigo)
+                    with lock:
+                        contagem['escritas'] += 2
+                except Exception:
+                    with lock:
+                        contagem['erros'] += 1
+
+    threads = [threading.Thread(target=ler, args=(i,)) for i in range(leitores)]
+    threads.append(threading.Thread(target=escrever))
+    for thread in threads:
+        thread.start()
+    time.sleep(duracao)
+    parar.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'leitores': leitores,
+        'leituras_por_segundo': contagem['leituras'] / duracao,
+        'escritas_por_segundo': contagem['escritas'] / duracao,
+        'erros': contagem['erros'],
+    }
+
+
+def comparar(atual: dict, anterior: dict, tolerancia: float) -> List[str]:
+    """Lista as operações cujo p50 ou p95 piorou além da tolerância"""
+    regressoes = []
+    for tamanho, operacoes in atual['resultados'].items():
+        for nome, medidas in operacoes.items():
+            base = anterior.get('resultados', {}).get(tamanho, {}).get(nome)
+            if not base:
+                continue
+            for chave in ('p50_ms', 'p95_ms'):
+                if base[chave] > 0 and medidas[chave] > base[chave] * (1 + tolerancia):
+                    regressoes.append(
+                        f"{tamanho} livros / {nome}: {chave} {base[chave]:.3f} -> {medidas[chave]:.3f}"
+                    )
+    return regressoes
+
+
+def main(argv=None):
+    """Função principal do benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark do catálogo de livros")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10000],
+                        help="Quantidades de livros dos catálogos sintéticos")
+    parser.add_argument('--repeticoes', type=int, default=100, help="Repetições por operação")
+    parser.add_argument('--semente', type=int, default=42, help="Semente dos dados sintéticos")
+    parser.add_argument('--diretorio', help="Onde guardar os bancos sintéticos (reaproveitados entre execuções)")
+    parser.add_argument('--saida', help="Arquivo JSON para gravar os resultados")
+    parser.add_argument('--comparar', help="Resultado JSON anterior para detectar regressões")
+    parser.add_argument('--concorrencia', type=int, metavar='LEITORES',
+                        help="Mede também leitores concorrentes com um escritor, em cada perfil")
+    parser.add_argument('--duracao', type=float, default=5.0,
+                        help="Duração, em segundos, do teste de concorrência")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="Piora relativa aceita antes de acusar regressão (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    diretorio = args.diretorio or tempfile.mkdtemp(prefix='benchmark_catalogo_')
+    os.makedirs(diretorio, exist_ok=True)
+
+    relatorio = {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'semente': args.semente,
+            'repeticoes': args.repeticoes,
+        },
+        'resultados': {},
+    }
+
+    planos_regrediram = False
+    for tamanho in args.tamanhos:
+        caminho = os.path.join(diretorio, f"catalogo_{tamanho}_{args.semente}.db")
+        inicio = time.perf_counter()
+        with preparar_banco(caminho, tamanho, args.semente) as db:
+            print(f"Catálogo de {tamanho} livros pronto em {time.perf_counter() - inicio:.1f}s")
+            try:
+                db.verificar_planos()
+            except Exception as e:
+                print(e)
+                planos_regrediram = True
+            resultados = executar_cenarios(db, tamanho, args.repeticoes, args.semente)
+        relatorio['resultados'][str(tamanho)] = resultados
+
+        print(f"{'operação':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'linhas/s':>14}")
+        for nome, medidas in resultados.items():
+            print(f"{nome:<26}{medidas['p50_ms']:>10.3f}{medidas['p95_ms']:>10.3f}"
+                  f"{medidas['p99_ms']:>10.3f}{medidas['linhas_por_segundo']:>14.0f}")
+        print()
+
+        if args.concorrencia:
+            concorrencia = {}
+            for nome, criar_perfil in PERFIS_CONCORRENCIA.items():
+                perfil = criar_perfil()
+                caminho_perfil = os.path.join(diretorio, f"concorrencia_{tamanho}_{nome}.db")
+                preparar_banco(caminho_perfil, tamanho, args.semente, perfil).fechar()
+                concorrencia[nome] = medir_concorrencia(caminho_perfil, perfil, tamanho,
+                                                        args.concorrencia, args.duracao)
+                print(f"Concorrência ({nome}, {args.concorrencia} leitores + 1 escritor): "
+                      f"{concorrencia[nome]['leituras_por_segundo']:.0f} leituras/s, "
+                      f"{concorrencia[nome]['escritas_por_segundo']:.0f} escritas/s, "
+                      f"{concorrencia[nome]['erros']} erros")
+            relatorio.setdefault('concorrencia', {})[str(tamanho)] = concorrencia
+            print()
+
+    if not args.diretorio:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+        print(f"Resultados gravados em {args.saida}")
+
+    if planos_regrediram:
+        print("Há consultas sem uso de índice (veja acima)")
+        return 1
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        regressoes = comparar(relatorio, anterior, args.tolerancia)
+        if regressoes:
+            print("Regressões encontradas:")
+            for regressao in regressoes:
+                print(f"  {regressao}")
+            return 1
+        print("Nenhuma regressão em relação ao resultado anterior")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from database import DatabaseManager, PerfilArmazenamento, ResultadoBusca
+from instrumentacao import Instrumentacao
+from livro import Livro
+from texto import normalizar
+
+
+def estimar_tamanho(valor: Any) -> int:
+    """Estimativa aproximada, em bytes, da memória ocupada por um valor em cache"""
+    if isinstance(valor, Livro):
+        return (sys.getsizeof(valor) + sys.getsizeof(valor.titulo) + sys.getsizeof(valor.autor)
+                + sys.getsizeof(valor.genero) + sys.getsizeof(valor.editora) + 64)
+    if isinstance(valor, ResultadoBusca):
+        return sys.getsizeof(valor.trecho) + estimar_tamanho(valor.livro) + 64
+    if isinstance(valor, list):
+        return sys.getsizeof(valor) + sum(estimar_tamanho(item) for item in valor)
+    return sys.getsizeof(valor)
+
+
+def copiar_livro(livro: Livro) -> Livro:
+    """Cópia do livro, para que quem o receba possa alterá-lo sem mexer no cache"""
+    return Livro(livro.codigo, livro.titulo, livro.autor, livro.genero,
+                 livro.editora, livro.ano_publicacao, livro.versao)
+
+
+class CacheLRU:
+    """
+    Cache LRU limitado por número de entradas e por bytes aproximados, com validade (TTL)
+    Seguro para uso entre threads.
+    """
+
+    def __init__(self, max_entradas: int = 1024, max_bytes: int = 8 * 1024 * 1024,
+                 ttl: Optional[float] = None):
+        if max_entradas < 1 or max_bytes < 1:
+            raise ValueError("Limites do cache devem ser positivos")
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entradas: "OrderedDict[Hashable, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._estatisticas = {'acertos': 0, 'falhas': 0, 'remocoes': 0,
+                              'expiracoes': 0, 'invalidacoes': 0}
+
+    def obter(self, chave: Hashable) -> Tuple[bool, Any]:
+        """Retorna (True, valor) se a chave está no cache e válida, senão (False, None)"""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self._estatisticas['falhas'] += 1
+                return False, None
+
+            valor, tamanho, expira_em = entrada
+            if expira_em is not None and time.monotonic() >= expira_em:
+                self._descartar(chave)
+                self._estatisticas['expiracoes'] += 1
+                self._estatisticas['falhas'] += 1
+                return False, None
+
+            self._entradas.move_to_end(chave)
+            self._estatisticas['acertos'] += 1
+            return True, valor
+
+    def guardar(self, chave: Hashable, valor: Any, ttl: Optional[float] = None):
+        """Guarda um valor, removendo os menos usados se os limites forem ultrapassados"""
+        tamanho = estimar_tamanho(valor)
+        if tamanho > self.max_bytes:
+            return
+
+        validade = ttl if ttl is not None else self.ttl
+        expira_em = time.monotonic() + validade if validade is not None else None
+        with self._lock:
+            if chave in self._entradas:
+                self._descartar(chave)
+            self._entradas[chave] = (valor, tamanho, expira_em)
+            self._bytes += tamanho
+
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                self._descartar(next(iter(self._entradas)))
+                self._estatisticas['remocoes'] += 1
+
+    def invalidar(self, *chaves: Hashable):
+        """Remove as chaves informadas do cache, se existirem"""
+        with self._lock:
+            for chave in chaves:
+                if chave in self._entradas:
+                    self._descartar(chave)
+                    self._estatisticas['invalidacoes'] += 1
+
+    def limpar(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self._estatisticas['invalidacoes'] += len(self._entradas)
+            self._entradas.clear()
+            self._bytes = 0
+
+    def _descartar(self, chave: Hashable):
+        _, tamanho, _ = self._entradas.pop(chave)
+        self._bytes -= tamanho
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Retorna os contadores de acertos, falhas, remoções por limite e invalidações"""
+        with self._lock:
+            dados = dict(self._estatisticas)
+            dados['entradas'] = len(self._entradas)
+            dados['bytes'] = self._bytes
+        return dados
+
+
+class DatabaseManagerCache(DatabaseManager):
+    """
+    DatabaseManager com cache de leitura para buscas por código e buscas textuais
+    Escritas feitas por este gerenciador invalidam o livro alterado e incrementam a
+    versão do catálogo, que faz parte da chave das buscas (resultados antigos deixam de
+    ser encontrados), depois do commit. Leituras dentro de transacao() não usam o cache:
+    veem as escritas ainda não confirmadas da transação, que as outras threads não veem.
+    Escritas de outros processos só são vistas após o TTL.
+    Os livros retornados são cópias e podem ser alterados livremente.
+    """
+
+    def __init__(self, db_name: str = "catalogo_livros.db", tamanho_pool: int = 4,
+                 max_livros: int = 4096, max_buscas: int = 256,
+                 max_bytes: int = 16 * 1024 * 1024, ttl: Optional[float] = 300.0,
+                 perfil: Optional[PerfilArmazenamento] = None,
+                 instrumentacao: Optional[Instrumentacao] = None):
+        self.cache_livros = CacheLRU(max_livros, max_bytes // 2, ttl)
+        self.cache_buscas = CacheLRU(max_buscas, max_bytes // 2, ttl)
+        super().__init__(db_name, tamanho_pool, perfil, instrumentacao)
+
+    def buscar_livro_por_codigo(self, codigo: int) -> Optional[Livro]:
+        """Busca um livro pelo código, consultando o cache antes do banco"""
+        if self._em_transacao():
+            return super().buscar_livro_por_codigo(codigo)
+        encontrado, livro = self.cache_livros.obter(codigo)
+        if encontrado:
+            return copiar_livro(livro)
+
+        versao = self.versao_local
+        livro = super().buscar_livro_por_codigo(codigo)
+        if livro is not None and versao == self.versao_local:
+            self.cache_livros.guardar(codigo, copiar_livro(livro))
+        return livro
+
+    def buscar_livros_por_titulo(self, titulo: str) -> List[Livro]:
+        consultar = super().buscar_livros_por_titulo
+        return self._buscar_em_cache(('titulo', normalizar(titulo)), lambda: consultar(titulo))
+
+    def buscar_livros_por_autor(self, autor: str) -> List[Livro]:
+        consultar = super().buscar_livros_por_autor
+        return self._buscar_em_cache(('autor', normalizar(autor)), lambda: consultar(autor))
+
+    def pesquisar(self, termo: str, campos: Optional[Iterable[str]] = None, limite: int = 50,
+                  marcadores: Tuple[str, str] = ('[', ']')) -> List[ResultadoBusca]:
+        campos = tuple(campos) if campos else None
+        chave = ('pesquisar', normalizar(termo), campos, limite, marcadores)
+        consultar = super().pesquisar
+        resultados = self._buscar_em_cache(
+            chave, lambda: consultar(termo, campos, limite, marcadores), copiar=False
+        )
+        return [ResultadoBusca(copiar_livro(r.livro), r.relevancia, r.trecho) for r in resultados]
+
+    def _buscar_em_cache(self, chave: tuple, consultar, copiar: bool = True) -> list:
+        """Busca no cache pela chave + versão do catálogo; na falta, consulta e guarda"""
+        if self._em_transacao():
+            return consultar()
+        versao = self.versao_local
+        chave = chave + (versao,)
+        encontrado, resultado = self.cache_buscas.obter(chave)
+        if not encontrado:
+            resultado = consultar()
+            if versao == self.versao_local:
+                self.cache_buscas.guardar(chave, resultado)
+        return [copiar_livro(livro) for livro in resultado] if copiar else resultado
+
+    def _ao_confirmar(self, codigos: Iterable[int]):
+        """Invalida os livros alterados; a nova versão torna obsoletas as buscas em cache"""
+        super()._ao_confirmar(codigos)
+        self.cache_livros.invalidar(*codigos)
+
+    def limpar_cache(self):
+        """Descarta todo o conteúdo dos caches"""
+        self.cache_livros.limpar()
+        self.cache_buscas.limpar()
+
+    def estatisticas_cache(self) -> Dict[str, Dict[str, int]]:
+        """Retorna acertos, falhas, remoções e invalidações de cada cache"""
+        return {'livros': self.cache_livros.estatisticas(),
+                'buscas': self.cache_buscas.estatisticas()}
@@ -1,204 +1,1597 @@
+import queue
 import sqlite3
-from typing import List, Optional
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from instrumentacao import EventoConsulta, Instrumentacao, forma_parametros
 from livro import Livro
+from migracoes import (FACETAS, VERSAO_INICIAL, criar_indice_busca, migrar, preencher_impressoes,
+                       versao_esquema)
+from texto import impressao_digital, tokenizar
+
+
+CAMPOS_BUSCA = ('titulo', 'autor', 'genero', 'editora')
+
+# Colunas na ordem dos parâmetros do construtor de Livro
+COLUNAS_LIVRO = ('livros.codigo, livros.titulo, livros.autor, livros.genero, '
+                 'livros.editora, livros.ano_publicacao, livros.versao')
+
+# Consultas usadas pelo DatabaseManager; verificar_planos() confere o plano de cada uma
+SQL_LISTAR = f'SELECT {COLUNAS_LIVRO} FROM livros ORDER BY titulo, codigo'
+SQL_PRIMEIRA_PAGINA = f'{SQL_LISTAR} LIMIT ?'
+SQL_PAGINA_APOS = f'''
+    SELECT {COLUNAS_LIVRO} FROM livros
+    WHERE (titulo, codigo) > (?, ?)
+    ORDER BY titulo, codigo
+    LIMIT ?
+'''
+SQL_PAGINA_ANTES = f'''
+    SELECT {COLUNAS_LIVRO} FROM livros
+    WHERE (titulo, codigo) < (?, ?)
+    ORDER BY titulo DESC, codigo DESC
+    LIMIT ?
+'''
+SQL_PAGINA_POR_POSICAO = f'''
+    SELECT {COLUNAS_LIVRO} FROM livros
+    WHERE codigo IN (
+        SELECT codigo FROM livros ORDER BY titulo, codigo LIMIT ? OFFSET ?
+    )
+    ORDER BY titulo, codigo
+'''
+SQL_POR_CODIGO = f'SELECT {COLUNAS_LIVRO} FROM livros WHERE codigo = ?'
+SQL_BUSCA_CAMPO = f'''
+    SELECT {COLUNAS_LIVRO} FROM livros_fts
+    JOIN livros ON livros.codigo = livros_fts.rowid
+    WHERE livros_fts MATCH ?
+    ORDER BY livros.titulo, livros.codigo
+'''
+SQL_PESQUISAR = f'''
+    SELECT {COLUNAS_LIVRO}, bm25(livros_fts) AS relevancia,
+           snippet(livros_fts, -1, ?, ?, '…', 12) AS trecho
+    FROM livros_fts
+    JOIN livros ON livros.codigo = livros_fts.rowid
+    WHERE livros_fts MATCH ?
+    ORDER BY relevancia
+    LIMIT ?
+'''
+SQL_INSERIR = '''
+    INSERT INTO livros (titulo, autor, genero, editora, ano_publicacao, impressao)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+SQL_ATUALIZAR = '''
+    UPDATE livros
+    SET titulo = ?, autor = ?, genero = ?, editora = ?, ano_publicacao = ?, impressao = ?,
+        versao = versao + 1
+    WHERE codigo = ?
+'''
+SQL_DELETAR = 'DELETE FROM livros WHERE codigo = ?'
+# Variantes condicionadas à versão lida: não alteram a linha se outro usuário já a alterou
+SQL_ATUALIZAR_VERSAO = f'{SQL_ATUALIZAR.rstrip()} AND versao = ?'
+SQL_DELETAR_VERSAO = f'{SQL_DELETAR} AND versao = ?'
+SQL_VERSAO_LIVRO = 'SELECT versao FROM livros WHERE codigo = ?'
+SQL_CONTAR = 'SELECT COUNT(*) FROM livros'
+SQL_VERSAO_CATALOGO = "SELECT valor FROM metadados WHERE chave = 'versao_catalogo'"
+SQL_ULTIMA_ALTERACAO = "SELECT seq FROM sqlite_sequence WHERE name = 'alteracoes'"
+SQL_ALTERACOES_DESCARTADAS = "SELECT valor FROM metadados WHERE chave = 'alteracoes_descartadas_ate'"
+SQL_ALTERACOES_DESDE = 'SELECT seq, codigo, operacao FROM alteracoes WHERE seq > ? ORDER BY seq LIMIT ?'
+SQL_DESCARTAR_ALTERACOES = 'DELETE FROM alteracoes WHERE seq <= ?'
+SQL_MARCAR_DESCARTADAS = '''
+    UPDATE metadados SET valor = MAX(valor, ?) WHERE chave = 'alteracoes_descartadas_ate'
+'''
+SQL_METADADO = 'SELECT valor FROM metadados WHERE chave = ?'
+SQL_GRAVAR_METADADO = 'INSERT OR REPLACE INTO metadados (chave, valor) VALUES (?, ?)'
+SQL_REMOVER_METADADO = 'DELETE FROM metadados WHERE chave = ?'
+SQL_CODIGOS = 'SELECT codigo FROM livros ORDER BY codigo'
+# Cópia de um livro vindo de outro banco, com o mesmo código e versão
+SQL_REPLICAR_ATUALIZACAO = '''
+    UPDATE livros
+    SET titulo = ?, autor = ?, genero = ?, editora = ?, ano_publicacao = ?, impressao = ?,
+        versao = ?
+    WHERE codigo = ?
+'''
+SQL_REPLICAR_INSERCAO = '''
+    INSERT INTO livros (titulo, autor, genero, editora, ano_publicacao, impressao, versao, codigo)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_MARCAR_REPLICADO = 'INSERT OR IGNORE INTO livros_replicados (codigo) VALUES (?)'
+# Livro mais antigo com a mesma impressão digital (índice idx_livros_impressao)
+SQL_DUPLICADO = 'SELECT codigo FROM livros WHERE impressao = ? ORDER BY codigo LIMIT 1'
+SQL_IMPRESSOES_APOS = f'''
+    SELECT livros.impressao, {COLUNAS_LIVRO} FROM livros
+    WHERE (impressao, codigo) > (?, ?)
+    ORDER BY impressao, codigo
+    LIMIT ?
+'''
+SQL_TOTAL_FACETAS = "SELECT COALESCE(SUM(quantidade), 0) FROM contagens_facetas WHERE faceta = 'genero'"
+SQL_CONTAGENS_FACETA = '''
+    SELECT valor, quantidade FROM contagens_facetas
+    WHERE faceta = ? ORDER BY quantidade DESC, valor
+'''
+
+
+def sql_pagina_filtrada(where: str, apos: bool = False) -> str:
+    """
+    Consulta da página de livros que atendem à cláusula WHERE, em ordem de título
+    Com apos=True, só os livros depois de (titulo, codigo), informados após os
+    parâmetros do WHERE: a continuação da página anterior sem OFFSET.
+    """
+    if apos:
+        condicao = '(livros.titulo, livros.codigo) > (?, ?)'
+        where = f'{where} AND {condicao}' if where else f'WHERE {condicao}'
+    return f'SELECT {COLUNAS_LIVRO} FROM livros {where} ORDER BY titulo, codigo LIMIT ? OFFSET ?'
+
+
+def sql_exportacao(where: str) -> str:
+    """
+    Consulta dos livros que atendem à cláusula WHERE, em ordem de código
+    NOT INDEXED força a leitura da tabela pela ordem do rowid, sem ordenação em B-tree
+    temporária, então a memória usada não depende da quantidade de livros.
+    """
+    return f'SELECT {COLUNAS_LIVRO} FROM livros NOT INDEXED {where} ORDER BY livros.codigo'
+
+
+def fabrica_livro(cursor: sqlite3.Cursor, row: tuple) -> Livro:
+    """
+    row_factory que cria o Livro direto da tupla do SQLite, sem dicionário intermediário
+    Os dados do banco já foram validados na escrita, então o construtor não revalida.
+    """
+    return Livro(*row)
+
+
+def montar_consulta_fts(termo: str, campos: Optional[Iterable[str]] = None) -> str:
+    """
+    Monta uma consulta FTS5 em que cada palavra do termo é buscada como prefixo
+    Retorna string vazia se o termo não tiver nenhuma palavra
+    """
+    palavras = tokenizar(termo)
+    if not palavras:
+        return ''
+    
+    expressao = ' '.join(f'"{palavra}"*' for palavra in palavras)
+    if campos:
+        campos = list(campos)
+        invalidos = [campo for campo in campos if campo not in CAMPOS_BUSCA]
+        if invalidos:
+            raise ValueError(f"Campo de busca inválido: {', '.join(invalidos)}")
+        return f"{{{' '.join(campos)}}} : ({expressao})"
+    return expressao
+
+
+# O que criar_livros faz com registros cuja impressão digital já existe
+MODOS_DUPLICADOS = ('inserir', 'ignorar', 'atualizar')
+
+
+def valores_livro(livro: Livro) -> tuple:
+    """Valores das colunas de dados de um livro, com a impressão digital, na ordem de SQL_INSERIR"""
+    return (livro.titulo, livro.autor, livro.genero, livro.editora, livro.ano_publicacao,
+            impressao_digital(livro.titulo, livro.autor, livro.editora, livro.ano_publicacao))
+
+
+def valores_para_insercao(item: Union[Livro, dict]) -> tuple:
+    """
+    Valida um livro (ou dicionário) com as regras de Livro e retorna os valores das
+    colunas na ordem de SQL_INSERIR (o último é a impressão digital)
+    Lança ValueError ou TypeError com o motivo da rejeição.
+    """
+    if isinstance(item, Livro):
+        item = item.to_dict()
+    if not isinstance(item, dict):
+        raise TypeError("Registro em formato inválido: esperado Livro ou dicionário")
+    
+    dados = dict(item)
+    dados.pop('codigo', None)
+    try:
+        livro = Livro.from_dict(dados)
+    except KeyError as e:
+        raise ValueError(f"Campo obrigatório ausente: {e.args[0]}")
+    return valores_livro(livro)
+
+
+class ConflitoVersao(Exception):
+    """
+    O livro foi alterado ou excluído por outra escrita depois de lido
+    versao_atual é a versão gravada no banco no momento da tentativa.
+    """
+    
+    def __init__(self, codigo: int, versao_esperada: int, versao_atual: int):
+        super().__init__(f"Conflito de versão no livro {codigo}: esperada {versao_esperada}, "
+                         f"atual {versao_atual}")
+        self.codigo = codigo
+        self.versao_esperada = versao_esperada
+        self.versao_atual = versao_atual
+
+
+class LivroDuplicado(Exception):
+    """
+    Já existe um livro com a mesma impressão digital (mesmo título, autor, editora e ano,
+    ignorando acentos, maiúsculas e pontuação); codigo_existente é o código dele
+    """
+    
+    def __init__(self, codigo_existente: int, impressao: str):
+        super().__init__(f"Livro já cadastrado com o código {codigo_existente}")
+        self.codigo_existente = codigo_existente
+        self.impressao = impressao
+
+
+class ResultadoBusca:
+    """Livro encontrado pela busca textual, com relevância (bm25) e trecho destacado"""
+    
+    def __init__(self, livro: Livro, relevancia: float, trecho: str):
+        self.livro = livro
+        self.relevancia = relevancia
+        self.trecho = trecho
+    
+    def __str__(self):
+        return f"ResultadoBusca(livro={self.livro}, relevancia={self.relevancia:.3f})"
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+class ResultadoFiltro:
+    """
+    Página de livros de DatabaseManager.filtrar, com o total de livros que atendem aos
+    filtros e as contagens de cada faceta: {'genero': [(valor, quantidade), ...], ...}
+    """
+    
+    def __init__(self, livros: List[Livro], total: int,
+                 facetas: Dict[str, List[Tuple[Union[str, int], int]]]):
+        self.livros = livros
+        self.total = total
+        self.facetas = facetas
+    
+    def __str__(self):
+        return f"ResultadoFiltro(livros={len(self.livros)}, total={self.total})"
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+class PerfilArmazenamento:
+    """
+    Configuração de armazenamento aplicada a cada conexão aberta (pragmas do SQLite)
+    O perfil padrão usa WAL: leitores não bloqueiam o escritor nem são bloqueados por
+    ele, e com synchronous=NORMAL o commit não espera um fsync (só o checkpoint espera).
+    Valores None mantêm o padrão do SQLite.
+    """
+    
+    MODOS_JOURNAL = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+    MODOS_SYNCHRONOUS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+    MODOS_TEMP_STORE = ('DEFAULT', 'FILE', 'MEMORY')
+    
+    def __init__(self, journal_mode: Optional[str] = 'WAL', synchronous: Optional[str] = 'NORMAL',
+                 cache_size_kb: Optional[int] = 64 * 1024, mmap_size: Optional[int] = 256 * 1024 * 1024,
+                 temp_store: Optional[str] = 'MEMORY', busy_timeout_ms: Optional[int] = 5000,
+                 wal_autocheckpoint: Optional[int] = 1000):
+        self.journal_mode = self._validar_opcao(journal_mode, self.MODOS_JOURNAL, 'journal_mode')
+        self.synchronous = self._validar_opcao(synchronous, self.MODOS_SYNCHRONOUS, 'synchronous')
+        self.temp_store = self._validar_opcao(temp_store, self.MODOS_TEMP_STORE, 'temp_store')
+        self.cache_size_kb = self._validar_inteiro(cache_size_kb, 'cache_size_kb')
+        self.mmap_size = self._validar_inteiro(mmap_size, 'mmap_size')
+        self.busy_timeout_ms = self._validar_inteiro(busy_timeout_ms, 'busy_timeout_ms')
+        self.wal_autocheckpoint = self._validar_inteiro(wal_autocheckpoint, 'wal_autocheckpoint')
+    
+    @staticmethod
+    def _validar_opcao(valor: Optional[str], opcoes: Tuple[str, ...], nome: str) -> Optional[str]:
+        if valor is None:
+            return None
+        if valor.upper() not in opcoes:
+            raise ValueError(f"{nome} inválido: {valor} (opções: {', '.join(opcoes)})")
+        return valor.upper()
+    
+    @staticmethod
+    def _validar_inteiro(valor: Optional[int], nome: str) -> Optional[int]:
+        if valor is None:
+            return None
+        if not isinstance(valor, int) or valor < 0:
+            raise ValueError(f"{nome} deve ser um inteiro não negativo")
+        return valor
+    
+    def aplicar(self, conn: sqlite3.Connection):
+        """Aplica os pragmas do perfil a uma conexão recém-aberta"""
+        if self.busy_timeout_ms is not None:
+            conn.execute(f'PRAGMA busy_timeout = {self.busy_timeout_ms}')
+        if self.journal_mode is not None:
+            conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+        if self.synchronous is not None:
+            conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        if self.cache_size_kb is not None:
+            # Valor negativo: tamanho em KiB em vez de número de páginas
+            conn.execute(f'PRAGMA cache_size = -{self.cache_size_kb}')
+        if self.mmap_size is not None:
+            conn.execute(f'PRAGMA mmap_size = {self.mmap_size}')
+        if self.temp_store is not None:
+            conn.execute(f'PRAGMA temp_store = {self.temp_store}')
+        if self.wal_autocheckpoint is not None:
+            conn.execute(f'PRAGMA wal_autocheckpoint = {self.wal_autocheckpoint}')
+    
+    @classmethod
+    def compativel(cls) -> 'PerfilArmazenamento':
+        """Perfil sem ajustes: journal de rollback e padrões do SQLite"""
+        return cls(journal_mode=None, synchronous=None, cache_size_kb=None, mmap_size=None,
+                   temp_store=None, busy_timeout_ms=None, wal_autocheckpoint=None)
+    
+    def __str__(self):
+        return (f"PerfilArmazenamento(journal_mode={self.journal_mode}, "
+                f"synchronous={self.synchronous})")
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+class PoolConexoes:
+    """Pool de conexões SQLite reutilizáveis, seguro para uso entre threads"""
+    
+    def __init__(self, db_name: str, tamanho: int = 4, timeout: float = 30.0,
+                 perfil: Optional[PerfilArmazenamento] = None):
+        if tamanho < 1:
+            raise ValueError("O pool precisa de pelo menos uma conexão")
+        
+        # Cada conexão com ':memory:' abriria um banco diferente
+        if db_name == ":memory:":
+            tamanho = 1
+        
+        self.db_name = db_name
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self.perfil = perfil
+        self._livres = queue.LifoQueue()
+        self._todas = []
+        self._lock = threading.Lock()
+        self._fechado = False
+        self._estatisticas = {'aberturas': 0, 'reutilizacoes': 0, 'esperas': 0}
+    
+    def _abrir(self) -> sqlite3.Connection:
+        """Abre uma nova conexão física com o banco de dados"""
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.perfil is not None:
+            self.perfil.aplicar(conn)
+        return conn
+    
+    def adquirir(self) -> sqlite3.Connection:
+        """
+        Retira uma conexão do pool
+        Abre uma nova se o limite não foi atingido, senão espera uma ser devolvida
+        """
+        return self.adquirir_com_origem()[0]
+    
+    def adquirir_com_origem(self) -> Tuple[sqlite3.Connection, bool]:
+        """Como adquirir, mas retorna (conexão, reutilizada): False se acabou de ser aberta"""
+        if self._fechado:
+            raise Exception("Pool de conexões já foi fechado")
+        
+        try:
+            conn = self._livres.get_nowait()
+            with self._lock:
+                self._estatisticas['reutilizacoes'] += 1
+            return conn, True
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if len(self._todas) < self.tamanho:
+                conn = self._abrir()
+                self._todas.append(conn)
+                self._estatisticas['aberturas'] += 1
+                return conn, False
+            self._estatisticas['esperas'] += 1
+        
+        try:
+            conn = self._livres.get(timeout=self.timeout)
+        except queue.Empty:
+            raise Exception("Tempo esgotado aguardando uma conexão livre")
+        with self._lock:
+            self._estatisticas['reutilizacoes'] += 1
+        return conn, True
+    
+    def devolver(self, conn: sqlite3.Connection):
+        """Devolve uma conexão ao pool"""
+        if self._fechado:
+            conn.close()
+            return
+        self._livres.put(conn)
+    
+    def fechar(self):
+        """Fecha todas as conexões abertas pelo pool"""
+        with self._lock:
+            self._fechado = True
+            conexoes, self._todas = self._todas, []
+        for conn in conexoes:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+    
+    def estatisticas(self) -> Dict[str, int]:
+        """Retorna os contadores de uso do pool"""
+        with self._lock:
+            dados = dict(self._estatisticas)
+            dados['abertas'] = len(self._todas)
+        dados['livres'] = self._livres.qsize()
+        return dados
+
+
+class ResultadoImportacao:
+    """
+    Resumo de uma inserção em lote: faixas de códigos geradas, registros rejeitados e
+    duplicatas, pares (índice do registro, código do livro com a mesma impressão digital)
+    """
+    
+    def __init__(self):
+        self.inseridos = 0
+        self.faixas_codigos: List[Tuple[int, int]] = []
+        self.falhas: List[Tuple[int, str]] = []
+        self.duplicados: List[Tuple[int, int]] = []
+    
+    def registrar_faixa(self, primeiro: int, ultimo: int):
+        """Registra os códigos gerados por um lote, unindo faixas contíguas"""
+        self.inseridos += ultimo - primeiro + 1
+        if self.faixas_codigos and self.faixas_codigos[-1][1] + 1 == primeiro:
+            self.faixas_codigos[-1] = (self.faixas_codigos[-1][0], ultimo)
+        else:
+            self.faixas_codigos.append((primeiro, ultimo))
+    
+    def __str__(self):
+        return (f"ResultadoImportacao(inseridos={self.inseridos}, falhas={len(self.falhas)}, "
+                f"duplicados={len(self.duplicados)})")
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+class ResultadoAlteracoes:
+    """
+    Resultado por livro de atualizar_livros e deletar_livros, na ordem de entrada
+    Cada item é (codigo, situacao, versao), com situacao 'aplicado', 'conflito' ou
+    'inexistente'. versao é a nova versão do livro atualizado (None se a atualização não
+    foi condicionada), a versão atual no banco em caso de conflito e None nos demais casos.
+    """
+    
+    def __init__(self):
+        self.itens: List[Tuple[Optional[int], str, Optional[int]]] = []
+    
+    def registrar(self, codigo: Optional[int], situacao: str, versao: Optional[int] = None):
+        self.itens.append((codigo, situacao, versao))
+    
+    def _codigos(self, situacao: str) -> List[int]:
+        return [codigo for codigo, atual, _ in self.itens if atual == situacao]
+    
+    @property
+    def aplicados(self) -> List[int]:
+        return self._codigos('aplicado')
+    
+    @property
+    def conflitos(self) -> List[int]:
+        return self._codigos('conflito')
+    
+    @property
+    def inexistentes(self) -> List[int]:
+        return self._codigos('inexistente')
+    
+    def __str__(self):
+        return (f"ResultadoAlteracoes(aplicados={len(self.aplicados)}, "
+                f"conflitos={len(self.conflitos)}, inexistentes={len(self.inexistentes)})")
+    
+    def __repr__(self):
+        return self.__str__()
 
 
 class DatabaseManager:
     """Classe responsável por gerenciar a conexão e operações com o banco de dados"""
     
-    def __init__(self, db_name: str = "catalogo_livros.db"):
+    def __init__(self, db_name: str = "catalogo_livros.db", tamanho_pool: int = 4,
+                 perfil: Optional[PerfilArmazenamento] = None,
+                 instrumentacao: Optional[Instrumentacao] = None, verificar_esquema: bool = True):
         self.db_name = db_name
-        self.criar_tabela()
+        # Sem instrumentação (padrão), as consultas não são medidas
+        self.instrumentacao = instrumentacao
+        self.perfil = perfil if perfil is not None else PerfilArmazenamento()
+        self._pool = PoolConexoes(db_name, tamanho_pool, perfil=self.perfil)
+        self._local = threading.local()
+        self.fts_disponivel = False
+        self.versao_local = 0
+        self._lock_versao = threading.Lock()
+        self._observadores: List[Callable[[Iterable[int]], None]] = []
+        # Conexão emprestada a cada thread, para interromper() a partir de outra thread
+        self._emprestadas: Dict[int, sqlite3.Connection] = {}
+        # Com verificar_esquema=False nenhuma conexão é aberta aqui: quem cria o gerenciador
+        # chama criar_tabela() antes da primeira operação (ex.: em segundo plano)
+        if verificar_esquema:
+            self.criar_tabela()
+    
+    def __enter__(self):
+        return self
     
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.fechar()
+    
+    @contextmanager
     def obter_conexao(self):
-        """Cria uma conexão com o banco de dados"""
+        """
+        Empresta uma conexão do pool durante o bloco with
+        Faz commit ao final do bloco (ou rollback em caso de erro) e devolve a conexão.
+        Chamadas aninhadas na mesma thread reutilizam a mesma conexão e transação; os
+        observadores das escritas feitas dentro delas só são avisados depois do commit.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        
         try:
-            conn = sqlite3.connect(self.db_name)
-            conn.row_factory = sqlite3.Row 
-            return conn
+            conn, reutilizada = self._pool.adquirir_com_origem()
         except sqlite3.Error as e:
             raise Exception(f"Erro ao conectar com o banco de dados: {e}")
+        
+        notificacoes: List[List[int]] = []
+        self._local.conn = conn
+        self._local.reutilizada = reutilizada
+        self._local.notificacoes = notificacoes
+        ident = threading.get_ident()
+        self._emprestadas[ident] = conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            # Escritas desfeitas: as notificações pendentes são descartadas
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.reutilizada = None
+            self._local.notificacoes = None
+            del self._emprestadas[ident]
+            self._pool.devolver(conn)
+        
+        for codigos in notificacoes:
+            self._ao_confirmar(codigos)
+    
+    @contextmanager
+    def transacao(self):
+        """
+        Agrupa as operações feitas na mesma thread durante o bloco with em uma única
+        transação, confirmada ao final (ou desfeita em caso de erro)
+        Começa com BEGIN IMMEDIATE: outros processos não escrevem entre as leituras e
+        as escritas do bloco.
+        """
+        try:
+            with self.obter_conexao() as conn:
+                if not conn.in_transaction:
+                    conn.execute('BEGIN IMMEDIATE')
+                yield
+        except sqlite3.Error as e:
+            raise Exception(f"Erro na transação: {e}")
+    
+    def interromper(self, ident_thread: int) -> bool:
+        """
+        Interrompe a consulta em andamento na conexão emprestada à thread informada
+        (threading.get_ident()); a operação interrompida falha com erro de interrupção e
+        sua transação é desfeita. Retorna False se a thread não está usando o banco.
+        """
+        conn = self._emprestadas.get(ident_thread)
+        if conn is None:
+            return False
+        conn.interrupt()
+        return True
+    
+    def _medir(self, alvo, operacao: str, sql: str, parametros, executar: Callable[[], object],
+               contar: Callable[[object], Optional[int]]):
+        """
+        Ponto único por onde passam os comandos SQL do DatabaseManager
+        Com instrumentação, mede executar() (execução e leitura das linhas) e registra
+        um EventoConsulta; alvo é a conexão ou o cursor usado, para o plano das lentas.
+        """
+        instrumentacao = self.instrumentacao
+        if instrumentacao is None:
+            return executar()
+        
+        inicio = time.perf_counter()
+        resultado, erro = None, None
+        try:
+            resultado = executar()
+            return resultado
+        except sqlite3.Error as e:
+            erro = str(e)
+            raise
+        finally:
+            evento = EventoConsulta(operacao, sql, forma_parametros(parametros),
+                                    contar(resultado) if erro is None else None,
+                                    time.perf_counter() - inicio,
+                                    getattr(self._local, 'reutilizada', None), erro)
+            conn = alvo.connection if isinstance(alvo, sqlite3.Cursor) else alvo
+            instrumentacao.registrar(evento, conn, parametros)
+    
+    def _consultar(self, alvo, operacao: str, sql: str, parametros=(),
+                   limite: Optional[int] = None) -> list:
+        """Executa a consulta e retorna todas as linhas (ou até limite linhas)"""
+        def executar():
+            cursor = alvo.execute(sql, parametros)
+            return cursor.fetchall() if limite is None else cursor.fetchmany(limite)
+        return self._medir(alvo, operacao, sql, parametros, executar, len)
+    
+    def _consultar_um(self, alvo, operacao: str, sql: str, parametros=()):
+        """Executa a consulta e retorna a primeira linha (ou None)"""
+        return self._medir(alvo, operacao, sql, parametros,
+                           lambda: alvo.execute(sql, parametros).fetchone(),
+                           lambda linha: 0 if linha is None else 1)
+    
+    def _executar(self, alvo, operacao: str, sql: str, parametros=(),
+                  muitos: bool = False) -> sqlite3.Cursor:
+        """
+        Executa um comando (escritas, ou leituras consumidas depois pelo chamador)
+        As linhas registradas são as alteradas; muitos=True usa executemany.
+        """
+        executar = alvo.executemany if muitos else alvo.execute
+        return self._medir(alvo, operacao, sql, parametros, lambda: executar(sql, parametros),
+                           lambda cursor: cursor.rowcount if cursor.rowcount >= 0 else None)
+    
+    @staticmethod
+    def _cursor_livros(conn: sqlite3.Connection) -> sqlite3.Cursor:
+        """Cursor cujas linhas (selecionadas com COLUNAS_LIVRO) já saem como Livro"""
+        cursor = conn.cursor()
+        cursor.row_factory = fabrica_livro
+        return cursor
+    
+    def checkpoint(self, modo: str = 'PASSIVE') -> Tuple[int, int, int]:
+        """
+        Copia as páginas do WAL para o arquivo do banco
+        Modos: PASSIVE (não espera leitores), FULL, RESTART ou TRUNCATE (zera o WAL).
+        Retorna (ocupado, páginas no WAL, páginas copiadas).
+        """
+        modo = modo.upper()
+        if modo not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Modo de checkpoint inválido: {modo}")
+        try:
+            with self.obter_conexao() as conn:
+                return tuple(self._consultar_um(conn, 'checkpoint', f'PRAGMA wal_checkpoint({modo})'))
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao executar checkpoint: {e}")
+    
+    def fechar(self):
+        """Fecha todas as conexões com o banco de dados"""
+        self._pool.fechar()
+    
+    def _ao_alterar(self, codigos: Iterable[int]):
+        """
+        Chamado após cada escrita com os códigos afetados
+        Dentro de um bloco externo (transacao() ou obter_conexao() aninhado) a escrita
+        ainda não foi confirmada: _ao_confirmar() fica pendente até o commit e é
+        descartado no rollback.
+        """
+        notificacoes = getattr(self._local, 'notificacoes', None)
+        if notificacoes is not None:
+            notificacoes.append(list(codigos))
+            return
+        self._ao_confirmar(codigos)
+    
+    def _ao_confirmar(self, codigos: Iterable[int]):
+        """
+        Chamado após o commit de cada escrita com os códigos afetados
+        Incrementa a versão local do catálogo e avisa os observadores; subclasses podem
+        estender (ex.: caches).
+        """
+        with self._lock_versao:
+            self.versao_local += 1
+        for observador in list(self._observadores):
+            observador(codigos)
+    
+    def _em_transacao(self) -> bool:
+        """Se a thread atual está dentro de um bloco obter_conexao() ou transacao()"""
+        return getattr(self._local, 'conn', None) is not None
+    
+    def adicionar_observador(self, observador: Callable[[Iterable[int]], None]):
+        """
+        Registra uma função chamada após cada escrita confirmada, com os códigos afetados
+        (incluídos, alterados ou excluídos). É chamada na thread que fez a escrita; dentro
+        de transacao(), depois do commit, e não é chamada se a transação for desfeita.
+        """
+        self._observadores.append(observador)
+    
+    def remover_observador(self, observador: Callable[[Iterable[int]], None]):
+        """Cancela o registro de um observador"""
+        if observador in self._observadores:
+            self._observadores.remove(observador)
+    
+    def estatisticas_pool(self) -> Dict[str, int]:
+        """Retorna quantas conexões foram abertas, reutilizadas e aguardadas"""
+        return self._pool.estatisticas()
     
     def criar_tabela(self):
-        """Cria a tabela de livros se ela não existir"""
+        """Cria a tabela de livros e aplica as migrações de esquema pendentes"""
         try:
             with self.obter_conexao() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS livros (
-                        codigo INTEGER PRIMARY KEY AUTOINCREMENT,
-                        titulo TEXT NOT NULL,
-                        autor TEXT NOT NULL,
-                        genero TEXT NOT NULL,
-                        editora TEXT NOT NULL,
-                        ano_publicacao INTEGER NOT NULL
-                    )
-                ''')
-                conn.commit()
+                migrar(conn)
+                self.fts_disponivel = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'livros_fts'"
+                ).fetchone() is not None
+                if not self.fts_disponivel:
+                    # Banco migrado por um SQLite sem FTS5: tenta de novo com este
+                    self.fts_disponivel = criar_indice_busca(conn)
         except sqlite3.Error as e:
             raise Exception(f"Erro ao criar tabela: {e}")
     
-    def criar_livro(self, livro: Livro) -> int:
+    def versao_esquema(self) -> int:
+        """Retorna a versão do esquema gravada no banco"""
+        try:
+            with self.obter_conexao() as conn:
+                return versao_esquema(conn)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao consultar versão do esquema: {e}")
+    
+    def criar_livro(self, livro: Livro, permitir_duplicado: bool = False) -> int:
         """
         Insere um novo livro no banco de dados
+        Lança LivroDuplicado se já existe um livro com a mesma impressão digital, a menos
+        que permitir_duplicado seja True.
         Retorna o código do livro inserido
         """
+        valores = valores_livro(livro)
         try:
             with self.obter_conexao() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO livros (titulo, autor, genero, editora, ano_publicacao)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (livro.titulo, livro.autor, livro.genero, livro.editora, livro.ano_publicacao))
+                if not permitir_duplicado:
+                    # Consulta e inserção na mesma transação de escrita: outro processo
+                    # não insere a mesma impressão entre uma e outra
+                    if not conn.in_transaction:
+                        conn.execute('BEGIN IMMEDIATE')
+                    existente = self._consultar_um(conn, 'buscar_duplicado', SQL_DUPLICADO,
+                                                   (valores[-1],))
+                    if existente is not None:
+                        raise LivroDuplicado(existente[0], valores[-1])
+                cursor = self._executar(conn, 'criar_livro', SQL_INSERIR, valores)
                 
                 codigo_inserido = cursor.lastrowid
-                conn.commit()
-                return codigo_inserido
+            
+            self._ao_alterar([codigo_inserido])
+            return codigo_inserido
         except sqlite3.IntegrityError as e:
             raise Exception(f"Erro de integridade: {e}")
         except sqlite3.Error as e:
             raise Exception(f"Erro ao inserir livro: {e}")
     
+    def buscar_duplicado(self, livro: Livro) -> Optional[int]:
+        """Retorna o código do livro mais antigo com a mesma impressão digital, ou None"""
+        impressao = impressao_digital(livro.titulo, livro.autor, livro.editora,
+                                      livro.ano_publicacao)
+        try:
+            with self.obter_conexao() as conn:
+                linha = self._consultar_um(conn, 'buscar_duplicado', SQL_DUPLICADO, (impressao,))
+                return linha[0] if linha is not None else None
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao buscar livro duplicado: {e}")
+    
+    def criar_livros(self, livros: Iterable[Union[Livro, dict]], tamanho_lote: int = 1000,
+                     duplicados: str = 'inserir') -> ResultadoImportacao:
+        """
+        Insere vários livros em lotes, com uma transação por lote
+        Aceita qualquer iterável (inclusive geradores) de Livro ou dicionários.
+        Registros inválidos são anotados em falhas, pelo índice, sem interromper a carga.
+        duplicados define o que fazer com registros cuja impressão digital já está no
+        banco ou em um registro anterior da carga: 'inserir' (sem consulta, como em uma
+        carga inicial), 'ignorar' ou 'atualizar' o livro existente com os dados do
+        registro (upsert). Nos dois últimos, eles são anotados em resultado.duplicados.
+        """
+        if tamanho_lote < 1:
+            raise ValueError("Tamanho do lote deve ser positivo")
+        if duplicados not in MODOS_DUPLICADOS:
+            raise ValueError(f"Modo de duplicados inválido: {duplicados}")
+        
+        resultado = ResultadoImportacao()
+        itens = enumerate(livros)
+        
+        while True:
+            lote = list(islice(itens, tamanho_lote))
+            if not lote:
+                break
+            
+            indices, valores = [], []
+            for indice, item in lote:
+                try:
+                    valores.append(valores_para_insercao(item))
+                    indices.append(indice)
+                except (ValueError, TypeError) as e:
+                    resultado.falhas.append((indice, str(e)))
+            
+            if valores:
+                self._inserir_lote(valores, resultado, duplicados, indices)
+        
+        return resultado
+    
+    def criar_livros_validados(self, valores: Iterable[tuple], tamanho_lote: int = 1000,
+                               duplicados: str = 'inserir') -> ResultadoImportacao:
+        """
+        Insere em lotes, com uma transação por lote, livros já validados: tuplas de
+        valores_para_insercao(), que pode rodar em outros processos
+        duplicados segue as regras de criar_livros.
+        """
+        if tamanho_lote < 1:
+            raise ValueError("Tamanho do lote deve ser positivo")
+        if duplicados not in MODOS_DUPLICADOS:
+            raise ValueError(f"Modo de duplicados inválido: {duplicados}")
+        
+        resultado = ResultadoImportacao()
+        valores = iter(valores)
+        inicio = 0
+        while True:
+            lote = list(islice(valores, tamanho_lote))
+            if not lote:
+                return resultado
+            self._inserir_lote(lote, resultado, duplicados, range(inicio, inicio + len(lote)))
+            inicio += len(lote)
+    
+    def _inserir_lote(self, valores: List[tuple], resultado: ResultadoImportacao,
+                      duplicados: str = 'inserir', indices: Optional[Sequence[int]] = None):
+        """
+        Insere um lote em uma transação e registra a faixa de códigos gerada
+        Fora do modo 'inserir', separa antes as duplicatas (veja criar_livros); indices
+        são as posições dos registros na carga, anotadas em resultado.duplicados.
+        """
+        inserir, atualizar = valores, {}
+        # (índice, código existente) ou (índice, posição em inserir) de duplicatas no lote
+        anotados: List[Tuple[int, Optional[int], int]] = []
+        ultimo = 0
+        try:
+            with self.obter_conexao() as conn:
+                if duplicados != 'inserir':
+                    if not conn.in_transaction:
+                        conn.execute('BEGIN IMMEDIATE')
+                    existentes = self._codigos_por_impressao(conn, [linha[-1] for linha in valores])
+                    inserir, posicoes = [], {}
+                    for indice, linha in zip(indices, valores):
+                        impressao = linha[-1]
+                        if impressao in existentes:
+                            anotados.append((indice, existentes[impressao], 0))
+                            if duplicados == 'atualizar':
+                                atualizar[existentes[impressao]] = linha
+                        elif impressao in posicoes:
+                            anotados.append((indice, None, posicoes[impressao]))
+                            if duplicados == 'atualizar':
+                                inserir[posicoes[impressao]] = linha
+                        else:
+                            posicoes[impressao] = len(inserir)
+                            inserir.append(linha)
+                    if atualizar:
+                        self._executar(conn, 'criar_livros_atualizar', SQL_ATUALIZAR,
+                                       [linha + (codigo,) for codigo, linha in atualizar.items()],
+                                       muitos=True)
+                if inserir:
+                    self._executar(conn, 'criar_livros', SQL_INSERIR, inserir, muitos=True)
+                    ultimo = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao inserir lote de livros: {e}")
+        
+        primeiro = ultimo - len(inserir) + 1
+        resultado.duplicados.extend(
+            (indice, codigo if codigo is not None else primeiro + posicao)
+            for indice, codigo, posicao in anotados
+        )
+        alterados = list(atualizar)
+        if inserir:
+            resultado.registrar_faixa(primeiro, ultimo)
+            alterados.extend(range(primeiro, ultimo + 1))
+        if alterados:
+            self._ao_alterar(alterados)
+    
+    def _codigos_por_impressao(self, conn: sqlite3.Connection, impressoes: List[str]) -> Dict[str, int]:
+        """Código do livro mais antigo com cada impressão digital presente no banco"""
+        encontrados: Dict[str, int] = {}
+        impressoes = list(set(impressoes))
+        # Em lotes, abaixo do limite de parâmetros por comando do SQLite
+        for inicio in range(0, len(impressoes), 500):
+            lote = impressoes[inicio:inicio + 500]
+            marcadores = ', '.join('?' * len(lote))
+            encontrados.update(self._consultar(
+                conn, 'codigos_por_impressao',
+                f'SELECT impressao, MIN(codigo) FROM livros WHERE impressao IN ({marcadores}) '
+                f'GROUP BY impressao', lote
+            ))
+        return encontrados
+    
+    def preencher_impressoes(self) -> int:
+        """
+        Calcula a impressão digital dos livros gravados sem ela (por programas que não
+        usam o DatabaseManager); retorna quantos foram preenchidos
+        """
+        try:
+            with self.obter_conexao() as conn:
+                return preencher_impressoes(conn)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao preencher impressões digitais: {e}")
+    
+    def iterar_impressoes(self, tamanho_lote: int = 1000) -> Iterator[Tuple[str, Livro]]:
+        """
+        Percorre os livros em ordem de impressão digital (e código), em pares
+        (impressao, livro): duplicatas e livros com o mesmo começo de título ficam
+        vizinhos. Livros sem impressão (veja preencher_impressoes) ficam de fora.
+        """
+        if tamanho_lote < 1:
+            raise ValueError("Tamanho do lote deve ser positivo")
+        
+        impressao, codigo = '', 0
+        while True:
+            try:
+                with self.obter_conexao() as conn:
+                    linhas = self._consultar(conn, 'impressoes_apos', SQL_IMPRESSOES_APOS,
+                                             (impressao, codigo, tamanho_lote))
+            except sqlite3.Error as e:
+                raise Exception(f"Erro ao listar impressões digitais: {e}")
+            for linha in linhas:
+                yield linha[0], Livro(*linha[1:])
+            if len(linhas) < tamanho_lote:
+                return
+            impressao, codigo = linhas[-1][0], linhas[-1][1]
+    
     def listar_livros(self) -> List[Livro]:
         """Retorna todos os livros do banco de dados"""
         try:
             with self.obter_conexao() as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM livros ORDER BY titulo')
-                rows = cursor.fetchall()
-                
-                livros = []
-                for row in rows:
-                    dados = {
-                        'codigo': row['codigo'],
-                        'titulo': row['titulo'],
-                        'autor': row['autor'],
-                        'genero': row['genero'],
-                        'editora': row['editora'],
-                        'ano_publicacao': row['ano_publicacao']
-                    }
-                    livros.append(Livro.from_dict(dados))
+                return self._consultar(self._cursor_livros(conn), 'listar_livros', SQL_LISTAR)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao listar livros: {e}")
+    
+    def iterar_livros(self, tamanho_lote: int = 500) -> Iterator[Livro]:
+        """
+        Percorre todos os livros ordenados por título sem carregar a tabela inteira
+        Os livros são lidos em lotes por paginação (titulo, codigo), então a conexão
+        não fica presa entre um lote e outro.
+        """
+        if tamanho_lote < 1:
+            raise ValueError("Tamanho do lote deve ser positivo")
+        
+        titulo, codigo = None, None
+        while True:
+            pagina = self.pagina_apos(titulo, codigo, tamanho_lote)
+            yield from pagina
+            if len(pagina) < tamanho_lote:
+                return
+            titulo, codigo = pagina[-1].titulo, pagina[-1].codigo
+    
+    @contextmanager
+    def leitura_exportacao(self, autor: Optional[str] = None, genero: Optional[str] = None,
+                           editora: Optional[str] = None, ano_min: Optional[int] = None,
+                           ano_max: Optional[int] = None, termo: Optional[str] = None,
+                           campos: Optional[Iterable[str]] = None, tamanho_lote: int = 1000,
+                           contar: bool = True):
+        """
+        Abre uma leitura dos livros que atendem aos filtros (os mesmos de filtrar_livros),
+        em ordem de código, para exportação
+        Produz (total, lotes): o total de livros (None se contar=False) e um iterador de
+        listas de tuplas na ordem de COLUNAS_LIVRO, lidas do cursor sob demanda. Contagem
+        e leitura acontecem na mesma transação, então escritas concorrentes não aparecem
+        no meio da exportação. A conexão fica ocupada até o fim do bloco with.
+        """
+        if tamanho_lote < 1:
+            raise ValueError("Tamanho do lote deve ser positivo")
+        
+        where, parametros = self._montar_filtro(autor, genero, editora, ano_min, ano_max,
+                                                termo, campos)
+        try:
+            with self.obter_conexao() as conn:
+                if not conn.in_transaction:
+                    conn.execute('BEGIN')
+                total = None
+                if contar:
+                    sql = f'SELECT COUNT(*) FROM livros {where}' if where else SQL_CONTAR
+                    total = self._consultar_um(conn, 'exportar_contagem', sql, parametros)[0]
                 
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                cursor.arraysize = tamanho_lote
+                self._executar(cursor, 'exportar', sql_exportacao(where), parametros)
+                yield total, iter(cursor.fetchmany, [])
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao exportar livros: {e}")
+    
+    def pagina_apos(self, titulo: Optional[str] = None, codigo: Optional[int] = None,
+                    limite: int = 50) -> List[Livro]:
+        """
+        Retorna a página de livros seguinte ao par (titulo, codigo), em ordem de título
+        Sem título, retorna a primeira página. Usa o índice (titulo, codigo), então o
+        custo não depende da posição da página no catálogo.
+        """
+        try:
+            with self.obter_conexao() as conn:
+                cursor = self._cursor_livros(conn)
+                if titulo is None:
+                    return self._consultar(cursor, 'primeira_pagina', SQL_PRIMEIRA_PAGINA,
+                                           (limite,), limite)
+                return self._consultar(cursor, 'pagina_apos', SQL_PAGINA_APOS,
+                                       (titulo, codigo if codigo is not None else 0, limite),
+                                       limite)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao paginar livros: {e}")
+    
+    def pagina_antes(self, titulo: str, codigo: int, limite: int = 50) -> List[Livro]:
+        """Retorna a página de livros anterior ao par (titulo, codigo), em ordem de título"""
+        try:
+            with self.obter_conexao() as conn:
+                livros = self._consultar(self._cursor_livros(conn), 'pagina_antes',
+                                         SQL_PAGINA_ANTES, (titulo, codigo, limite), limite)
+                livros.reverse()
                 return livros
         except sqlite3.Error as e:
-            raise Exception(f"Erro ao listar livros: {e}")
+            raise Exception(f"Erro ao paginar livros: {e}")
+    
+    def pagina_por_posicao(self, inicio: int, limite: int = 50) -> List[Livro]:
+        """
+        Retorna a página que começa na posição informada, em ordem de título
+        Útil para saltos arbitrários (ex.: arrastar a barra de rolagem); o deslocamento
+        percorre apenas o índice (titulo, codigo), sem ler as linhas puladas.
+        """
+        try:
+            with self.obter_conexao() as conn:
+                return self._consultar(self._cursor_livros(conn), 'pagina_por_posicao',
+                                       SQL_PAGINA_POR_POSICAO, (limite, max(inicio, 0)))
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao paginar livros: {e}")
     
     def buscar_livro_por_codigo(self, codigo: int) -> Optional[Livro]:
         """Busca um livro específico pelo código"""
         try:
             with self.obter_conexao() as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM livros WHERE codigo = ?', (codigo,))
-                row = cursor.fetchone()
-                
-                if row:
-                    dados = {
-                        'codigo': row['codigo'],
-                        'titulo': row['titulo'],
-                        'autor': row['autor'],
-                        'genero': row['genero'],
-                        'editora': row['editora'],
-                        'ano_publicacao': row['ano_publicacao']
-                    }
-                    return Livro.from_dict(dados)
-                return None
+                return self._consultar_um(self._cursor_livros(conn), 'buscar_livro_por_codigo',
+                                          SQL_POR_CODIGO, (codigo,))
         except sqlite3.Error as e:
             raise Exception(f"Erro ao buscar livro: {e}")
     
+    def buscar_livros_por_codigos(self, codigos: Iterable[int]) -> List[Livro]:
+        """Busca vários livros pelo código, na ordem informada; códigos inexistentes são ignorados"""
+        codigos = list(codigos)
+        encontrados = {}
+        try:
+            with self.obter_conexao() as conn:
+                cursor = self._cursor_livros(conn)
+                # Em lotes, abaixo do limite de parâmetros por comando do SQLite
+                for inicio in range(0, len(codigos), 500):
+                    lote = codigos[inicio:inicio + 500]
+                    marcadores = ', '.join('?' * len(lote))
+                    livros = self._consultar(
+                        cursor, 'buscar_livros_por_codigos',
+                        f'SELECT {COLUNAS_LIVRO} FROM livros WHERE codigo IN ({marcadores})', lote
+                    )
+                    encontrados.update((livro.codigo, livro) for livro in livros)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao buscar livros: {e}")
+        return [encontrados[codigo] for codigo in codigos if codigo in encontrados]
+    
+    def _gravar_versionado(self, conn: sqlite3.Connection, operacao: str, sql: str,
+                           sql_versao: str, parametros: tuple, codigo: int,
+                           versao: Optional[int]) -> Tuple[str, Optional[int]]:
+        """
+        Executa o UPDATE/DELETE de um livro, condicionado à versão se ela for informada
+        Retorna (situacao, versao) como em ResultadoAlteracoes, com a versão lida em caso
+        de sucesso. A versão atual só é consultada quando a escrita não altera nada.
+        """
+        if versao is None:
+            cursor = self._executar(conn, operacao, sql, parametros + (codigo,))
+            return ('aplicado' if cursor.rowcount > 0 else 'inexistente'), None
+        
+        cursor = self._executar(conn, operacao, sql_versao, parametros + (codigo, versao))
+        if cursor.rowcount > 0:
+            return 'aplicado', versao
+        linha = self._consultar_um(conn, 'versao_livro', SQL_VERSAO_LIVRO, (codigo,))
+        return ('conflito', linha[0]) if linha is not None else ('inexistente', None)
+    
     def atualizar_livro(self, livro: Livro) -> bool:
         """
         Atualiza um livro existente no banco de dados
-        Retorna True se a atualização foi bem-sucedida
+        Se livro.versao estiver preenchida (livros lidos do banco), a atualização só é
+        feita se o livro não foi alterado desde a leitura; caso contrário lança
+        ConflitoVersao. Em caso de sucesso, livro.versao passa a ser a nova versão.
+        Retorna True se a atualização foi bem-sucedida e False se o livro não existe.
         """
         try:
             with self.obter_conexao() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE livros 
-                    SET titulo = ?, autor = ?, genero = ?, editora = ?, ano_publicacao = ?
-                    WHERE codigo = ?
-                ''', (livro.titulo, livro.autor, livro.genero, livro.editora, 
-                      livro.ano_publicacao, livro.codigo))
-                
-                conn.commit()
-                return cursor.rowcount > 0
+                situacao, versao = self._gravar_versionado(
+                    conn, 'atualizar_livro', SQL_ATUALIZAR, SQL_ATUALIZAR_VERSAO,
+                    valores_livro(livro), livro.codigo, livro.versao
+                )
+                if situacao == 'conflito':
+                    raise ConflitoVersao(livro.codigo, livro.versao, versao)
+            
+            if situacao != 'aplicado':
+                return False
+            if versao is not None:
+                livro.versao = versao + 1
+            self._ao_alterar([livro.codigo])
+            return True
         except sqlite3.Error as e:
             raise Exception(f"Erro ao atualizar livro: {e}")
     
-    def deletar_livro(self, codigo: int) -> bool:
+    def deletar_livro(self, codigo: int, versao: Optional[int] = None) -> bool:
         """
         Remove um livro do banco de dados
+        Com versao, só remove se o livro não foi alterado desde a leitura; caso contrário
+        lança ConflitoVersao.
         Retorna True se a remoção foi bem-sucedida
         """
         try:
             with self.obter_conexao() as conn:
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM livros WHERE codigo = ?', (codigo,))
-                conn.commit()
-                return cursor.rowcount > 0
+                situacao, atual = self._gravar_versionado(
+                    conn, 'deletar_livro', SQL_DELETAR, SQL_DELETAR_VERSAO, (), codigo, versao
+                )
+                if situacao == 'conflito':
+                    raise ConflitoVersao(codigo, versao, atual)
+            
+            removido = situacao == 'aplicado'
+            if removido:
+                self._ao_alterar([codigo])
+            return removido
         except sqlite3.Error as e:
             raise Exception(f"Erro ao deletar livro: {e}")
     
-    def buscar_livros_por_titulo(self, titulo: str) -> List[Livro]:
-        """Busca livros que contenham o título especificado"""
+    def atualizar_livros(self, livros: Iterable[Livro]) -> ResultadoAlteracoes:
+        """
+        Atualiza vários livros em uma única transação
+        Cada livro segue as regras de atualizar_livro, mas conflitos e livros inexistentes
+        não interrompem o lote: ficam anotados no resultado e os demais são gravados.
+        Os livros atualizados com versão têm livro.versao avançada.
+        """
+        resultado = ResultadoAlteracoes()
+        atualizados = []
         try:
             with self.obter_conexao() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    'SELECT * FROM livros WHERE titulo LIKE ? ORDER BY titulo',
-                    (f'%{titulo}%',)
-                )
-                rows = cursor.fetchall()
-                
-                livros = []
-                for row in rows:
-                    dados = {
-                        'codigo': row['codigo'],
-                        'titulo': row['titulo'],
-                        'autor': row['autor'],
-                        'genero': row['genero'],
-                        'editora': row['editora'],
-                        'ano_publicacao': row['ano_publicacao']
-                    }
-                    livros.append(Livro.from_dict(dados))
-                
-                return livros
+                for livro in livros:
+                    situacao, versao = self._gravar_versionado(
+                        conn, 'atualizar_livros', SQL_ATUALIZAR, SQL_ATUALIZAR_VERSAO,
+                        valores_livro(livro), livro.codigo, livro.versao
+                    )
+                    if situacao == 'aplicado':
+                        atualizados.append(livro)
+                        if versao is not None:
+                            versao += 1
+                    resultado.registrar(livro.codigo, situacao, versao)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao atualizar lote de livros: {e}")
+        
+        # Só depois do commit: se o lote falhar, os objetos continuam com a versão lida
+        for livro in atualizados:
+            if livro.versao is not None:
+                livro.versao += 1
+        if atualizados:
+            self._ao_alterar([livro.codigo for livro in atualizados])
+        return resultado
+    
+    def deletar_livros(self, itens: Iterable[Union[int, Tuple[int, Optional[int]]]]
+                       ) -> ResultadoAlteracoes:
+        """
+        Remove vários livros em uma única transação
+        Cada item é um código ou um par (codigo, versao); com versão, o livro só é removido
+        se não foi alterado desde a leitura. Conflitos e livros inexistentes ficam anotados
+        no resultado sem interromper o lote.
+        """
+        resultado = ResultadoAlteracoes()
+        try:
+            with self.obter_conexao() as conn:
+                for item in itens:
+                    codigo, versao = item if isinstance(item, tuple) else (item, None)
+                    situacao, atual = self._gravar_versionado(
+                        conn, 'deletar_livros', SQL_DELETAR, SQL_DELETAR_VERSAO, (), codigo, versao
+                    )
+                    resultado.registrar(codigo, situacao, atual if situacao == 'conflito' else None)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao deletar lote de livros: {e}")
+        
+        removidos = resultado.aplicados
+        if removidos:
+            self._ao_alterar(removidos)
+        return resultado
+    
+    def replicar_livros(self, livros: Iterable[Livro]) -> Tuple[int, int]:
+        """
+        Grava cópias de livros de outro banco com o mesmo código e versão, em uma única
+        transação: atualiza o livro com o código ou o insere se ele não existe
+        Os livros ficam marcados como replicados (veja codigos_replicados). Retorna
+        (inseridos, atualizados).
+        """
+        valores = [valores_livro(livro) + (livro.versao or VERSAO_INICIAL, livro.codigo)
+                   for livro in livros]
+        codigos = [linha[-1] for linha in valores]
+        try:
+            with self.obter_conexao() as conn:
+                existentes = self._codigos_em(conn, 'livros', codigos)
+                atualizar = [linha for linha in valores if linha[-1] in existentes]
+                inserir = [linha for linha in valores if linha[-1] not in existentes]
+                if atualizar:
+                    self._executar(conn, 'replicar_atualizacao', SQL_REPLICAR_ATUALIZACAO,
+                                   atualizar, muitos=True)
+                if inserir:
+                    self._executar(conn, 'replicar_insercao', SQL_REPLICAR_INSERCAO,
+                                   inserir, muitos=True)
+                self._executar(conn, 'marcar_replicados', SQL_MARCAR_REPLICADO,
+                               [(codigo,) for codigo in codigos], muitos=True)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao replicar livros: {e}")
+        
+        if codigos:
+            self._ao_alterar(codigos)
+        return len(inserir), len(atualizar)
+    
+    def marcar_replicados(self, codigos: Iterable[int]):
+        """Marca como replicados livros já iguais aos do outro banco, sem regravá-los"""
+        try:
+            with self.obter_conexao() as conn:
+                self._executar(conn, 'marcar_replicados', SQL_MARCAR_REPLICADO,
+                               [(codigo,) for codigo in codigos], muitos=True)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao marcar livros replicados: {e}")
+    
+    def codigos_replicados(self, codigos: Iterable[int]) -> Set[int]:
+        """
+        Códigos, entre os informados, de livros gravados por replicar_livros ou
+        marcar_replicados; os demais foram criados neste banco
+        """
+        try:
+            with self.obter_conexao() as conn:
+                return self._codigos_em(conn, 'livros_replicados', list(codigos))
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao consultar livros replicados: {e}")
+    
+    def _codigos_em(self, conn: sqlite3.Connection, tabela: str, codigos: List[int]) -> Set[int]:
+        """Códigos, entre os informados, presentes na tabela (livros ou livros_replicados)"""
+        encontrados = set()
+        # Em lotes, abaixo do limite de parâmetros por comando do SQLite
+        for inicio in range(0, len(codigos), 500):
+            lote = codigos[inicio:inicio + 500]
+            marcadores = ', '.join('?' * len(lote))
+            encontrados.update(linha[0] for linha in self._consultar(
+                conn, f'codigos_{tabela}',
+                f'SELECT codigo FROM {tabela} WHERE codigo IN ({marcadores})', lote
+            ))
+        return encontrados
+    
+    def buscar_livros_por_titulo(self, titulo: str) -> List[Livro]:
+        """Busca livros cujo título contenha palavras começando pelos termos informados"""
+        try:
+            return self._buscar_por_campo('titulo', titulo)
         except sqlite3.Error as e:
             raise Exception(f"Erro ao buscar livros por título: {e}")
     
     def buscar_livros_por_autor(self, autor: str) -> List[Livro]:
         """Busca livros pelo autor"""
+        try:
+            return self._buscar_por_campo('autor', autor)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao buscar livros por autor: {e}")
+    
+    def _buscar_por_campo(self, campo: str, termo: str) -> List[Livro]:
+        """Busca livros por um campo usando o índice FTS5 (ou LIKE, se indisponível)"""
+        with self.obter_conexao() as conn:
+            cursor = self._cursor_livros(conn)
+            if self.fts_disponivel:
+                consulta = montar_consulta_fts(termo, [campo])
+                if not consulta:
+                    return []
+                return self._consultar(cursor, 'buscar_por_campo', SQL_BUSCA_CAMPO, (consulta,))
+            return self._consultar(
+                cursor, 'buscar_por_campo',
+                f'SELECT {COLUNAS_LIVRO} FROM livros WHERE {campo} LIKE ? ORDER BY titulo, codigo',
+                (f'%{termo}%',)
+            )
+    
+    def pesquisar(self, termo: str, campos: Optional[Iterable[str]] = None, limite: int = 50,
+                  marcadores: Tuple[str, str] = ('[', ']')) -> List[ResultadoBusca]:
+        """
+        Busca textual em título, autor, gênero e editora, ordenada por relevância (bm25)
+        Cada palavra do termo é tratada como prefixo e acentos são ignorados.
+        Use campos para restringir a busca, por exemplo ['titulo', 'autor'].
+        """
+        if not self.fts_disponivel:
+            raise Exception("Busca textual indisponível: SQLite sem suporte a FTS5")
+        
+        consulta = montar_consulta_fts(termo, campos)
+        if not consulta:
+            return []
+        
         try:
             with self.obter_conexao() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    'SELECT * FROM livros WHERE autor LIKE ? ORDER BY titulo',
-                    (f'%{autor}%',)
-                )
-                rows = cursor.fetchall()
+                linhas = self._consultar(conn, 'pesquisar', SQL_PESQUISAR,
+                                         (marcadores[0], marcadores[1], consulta, limite))
                 
-                livros = []
-                for row in rows:
-                    dados = {
-                        'codigo': row['codigo'],
-                        'titulo': row['titulo'],
-                        'autor': row['autor'],
-                        'genero': row['genero'],
-                        'editora': row['editora'],
-                        'ano_publicacao': row['ano_publicacao']
-                    }
-                    livros.append(Livro.from_dict(dados))
+                return [ResultadoBusca(Livro(*row[:7]), row[7], row[8]) for row in linhas]
+        except sqlite3.Error as e:
+            raise Exception(f"Erro na busca textual: {e}")
+    
+    def filtrar_livros(self, autor: Optional[str] = None, genero: Optional[str] = None,
+                       editora: Optional[str] = None, ano_min: Optional[int] = None,
+                       ano_max: Optional[int] = None, termo: Optional[str] = None,
+                       campos: Optional[Iterable[str]] = None, limite: int = 50,
+                       inicio: int = 0, apos: Optional[Tuple[str, int]] = None) -> List[Livro]:
+        """
+        Retorna os livros com autor, gênero e editora exatamente iguais aos informados
+        e ano de publicação no intervalo [ano_min, ano_max], em ordem de título
+        Com termo, só os livros encontrados pela busca textual nos campos pedidos.
+        Filtros omitidos (None) não restringem o resultado.
+        apos=(titulo, codigo) continua a partir desse livro pelo índice, sem percorrer
+        as posições anteriores como inicio (OFFSET) faz.
+        """
+        where, parametros = self._montar_filtro(autor, genero, editora, ano_min, ano_max,
+                                                termo, campos)
+        try:
+            with self.obter_conexao() as conn:
+                return self._pagina_filtrada(conn, where, parametros, limite, inicio, apos)
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao filtrar livros: {e}")
+    
+    def filtrar(self, genero: Optional[str] = None, editora: Optional[str] = None,
+                ano_min: Optional[int] = None, ano_max: Optional[int] = None,
+                termo: Optional[str] = None, campos: Optional[Iterable[str]] = None,
+                autor: Optional[str] = None, limite: int = 50, inicio: int = 0) -> ResultadoFiltro:
+        """
+        Busca facetada: combina os filtros informados e retorna, na mesma transação, a
+        página pedida (em ordem de título), o total e as contagens por gênero, editora e
+        década
+        As contagens de cada faceta consideram os demais filtros, mas não o dela mesma,
+        para mostrar as alternativas ao valor escolhido. Sem outros filtros, elas vêm da
+        tabela contagens_facetas, mantida por triggers, sem percorrer os livros.
+        Use limite=0 para obter só o total e as facetas.
+        """
+        filtros = {'autor': autor, 'genero': genero, 'editora': editora, 'ano_min': ano_min,
+                   'ano_max': ano_max, 'termo': termo, 'campos': campos}
+        where, parametros = self._montar_filtro(**filtros)
+        try:
+            with self.obter_conexao() as conn:
+                livros = self._pagina_filtrada(conn, where, parametros, limite, inicio) if limite > 0 else []
                 
-                return livros
+                if where:
+                    total = self._consultar_um(conn, 'filtrar_total',
+                                               f'SELECT COUNT(*) FROM livros {where}', parametros)[0]
+                else:
+                    total = self._consultar_um(conn, 'filtrar_total', SQL_TOTAL_FACETAS)[0]
+                
+                facetas = {}
+                for faceta in FACETAS:
+                    outros = dict(filtros)
+                    if faceta == 'decada':
+                        outros['ano_min'] = outros['ano_max'] = None
+                    else:
+                        outros[faceta] = None
+                    facetas[faceta] = self._contar_faceta(conn, faceta, outros)
+                
+                return ResultadoFiltro(livros, total, facetas)
         except sqlite3.Error as e:
-            raise Exception(f"Erro ao buscar livros por autor: {e}")
+            raise Exception(f"Erro ao filtrar livros: {e}")
+    
+    def _pagina_filtrada(self, conn: sqlite3.Connection, where: str, parametros: list,
+                         limite: int, inicio: int,
+                         apos: Optional[Tuple[str, int]] = None) -> List[Livro]:
+        if apos is not None:
+            parametros = parametros + list(apos)
+        return self._consultar(self._cursor_livros(conn), 'filtrar_pagina',
+                               sql_pagina_filtrada(where, apos is not None),
+                               parametros + [limite, max(inicio, 0)])
+    
+    def _contar_faceta(self, conn: sqlite3.Connection, faceta: str,
+                       filtros: dict) -> List[Tuple[Union[str, int], int]]:
+        """Contagens (valor, quantidade) de uma faceta entre os livros que atendem aos filtros"""
+        where, parametros = self._montar_filtro(**filtros)
+        if where:
+            expressao = FACETAS[faceta].format(p='livros.')
+            linhas = self._consultar(conn, 'contagens_faceta', f'''
+                SELECT {expressao} AS valor, COUNT(*) AS quantidade FROM livros {where}
+                GROUP BY valor ORDER BY quantidade DESC, valor
+            ''', parametros)
+        else:
+            linhas = self._consultar(conn, 'contagens_faceta', SQL_CONTAGENS_FACETA, (faceta,))
+        return [tuple(linha) for linha in linhas]
+    
+    def _montar_filtro(self, autor: Optional[str] = None, genero: Optional[str] = None,
+                       editora: Optional[str] = None, ano_min: Optional[int] = None,
+                       ano_max: Optional[int] = None, termo: Optional[str] = None,
+                       campos: Optional[Iterable[str]] = None) -> Tuple[str, list]:
+        """
+        Monta a cláusula WHERE (ou string vazia) e os parâmetros dos filtros informados
+        O termo é buscado no índice FTS5 (ou com LIKE, se indisponível) nos campos pedidos.
+        """
+        condicoes, parametros = [], []
+        for coluna, valor in (('autor', autor), ('genero', genero), ('editora', editora)):
+            if valor is not None:
+                condicoes.append(f'livros.{coluna} = ?')
+                parametros.append(valor)
+        if ano_min is not None:
+            condicoes.append('livros.ano_publicacao >= ?')
+            parametros.append(ano_min)
+        if ano_max is not None:
+            condicoes.append('livros.ano_publicacao <= ?')
+            parametros.append(ano_max)
+        if termo:
+            if self.fts_disponivel:
+                consulta = montar_consulta_fts(termo, campos)
+                if consulta:
+                    condicoes.append('livros.codigo IN (SELECT rowid FROM livros_fts WHERE livros_fts MATCH ?)')
+                    parametros.append(consulta)
+            else:
+                colunas = list(campos) if campos else list(CAMPOS_BUSCA)
+                invalidos = [coluna for coluna in colunas if coluna not in CAMPOS_BUSCA]
+                if invalidos:
+                    raise ValueError(f"Campo de busca inválido: {', '.join(invalidos)}")
+                condicoes.append('(' + ' OR '.join(f'livros.{coluna} LIKE ?' for coluna in colunas) + ')')
+                parametros.extend(f'%{termo}%' for _ in colunas)
+        
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+        return where, parametros
+    
+    def versao_catalogo(self) -> int:
+        """
+        Retorna a versão persistida do catálogo, que muda a cada inclusão, alteração ou
+        exclusão de livros feita por qualquer processo (ao contrário de versao_local)
+        """
+        try:
+            with self.obter_conexao() as conn:
+                return self._consultar_um(conn, 'versao_catalogo', SQL_VERSAO_CATALOGO)[0]
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao consultar versão do catálogo: {e}")
+    
+    def ultima_alteracao(self) -> int:
+        """
+        Número de sequência (seq) da última escrita em livros registrada na tabela
+        alteracoes (0 se nenhuma); só cresce, mesmo após o registro ser compactado
+        """
+        try:
+            with self.obter_conexao() as conn:
+                linha = self._consultar_um(conn, 'ultima_alteracao', SQL_ULTIMA_ALTERACAO)
+                return linha[0] if linha is not None else 0
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao consultar registro de alterações: {e}")
+    
+    def alteracoes_desde(self, seq: int, limite: int = 100000
+                         ) -> Optional[List[Tuple[int, int, str]]]:
+        """
+        Escritas em livros registradas após seq, em ordem: (seq, codigo, operacao), com
+        operacao 'I' (inclusão), 'U' (alteração) ou 'D' (exclusão), até limite itens
+        Retorna None se parte delas já foi descartada do registro: quem leu até seq
+        precisa recarregar o catálogo inteiro.
+        """
+        try:
+            with self.obter_conexao() as conn:
+                alteracoes = [tuple(linha) for linha in
+                              self._consultar(conn, 'alteracoes_desde', SQL_ALTERACOES_DESDE,
+                                              (seq, limite))]
+                # Lido depois: uma compactação concorrente com a leitura acima é percebida
+                if seq < self._consultar_um(conn, 'alteracoes_descartadas',
+                                            SQL_ALTERACOES_DESCARTADAS)[0]:
+                    return None
+                return alteracoes
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao consultar registro de alterações: {e}")
+    
+    def compactar_alteracoes(self, ate_seq: int) -> int:
+        """
+        Descarta do registro as alterações com seq até ate_seq (limitado à última) e
+        retorna quantas foram removidas
+        Quem ainda não leu essas alterações passa a receber None de alteracoes_desde().
+        """
+        try:
+            with self.obter_conexao() as conn:
+                ate_seq = min(ate_seq, self.ultima_alteracao())
+                removidas = self._executar(conn, 'compactar_alteracoes', SQL_DESCARTAR_ALTERACOES,
+                                           (ate_seq,)).rowcount
+                self._executar(conn, 'compactar_alteracoes', SQL_MARCAR_DESCARTADAS, (ate_seq,))
+                return removidas
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao compactar registro de alterações: {e}")
+    
+    def ler_metadado(self, chave: str) -> Optional[int]:
+        """Valor gravado na tabela metadados, ou None se a chave não existe"""
+        try:
+            with self.obter_conexao() as conn:
+                linha = self._consultar_um(conn, 'ler_metadado', SQL_METADADO, (chave,))
+                return linha[0] if linha is not None else None
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao ler metadado: {e}")
+    
+    def gravar_metadado(self, chave: str, valor: Optional[int]):
+        """Grava um valor inteiro na tabela metadados (None remove a chave)"""
+        try:
+            with self.obter_conexao() as conn:
+                if valor is None:
+                    self._executar(conn, 'gravar_metadado', SQL_REMOVER_METADADO, (chave,))
+                else:
+                    self._executar(conn, 'gravar_metadado', SQL_GRAVAR_METADADO, (chave, valor))
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao gravar metadado: {e}")
+    
+    def identificador_banco(self) -> int:
+        """Número aleatório sorteado na criação do banco, que o distingue dos demais"""
+        return self.ler_metadado('identificador')
+    
+    def listar_codigos(self) -> List[int]:
+        """Códigos de todos os livros, em ordem crescente"""
+        try:
+            with self.obter_conexao() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                return [linha[0] for linha in self._consultar(cursor, 'listar_codigos', SQL_CODIGOS)]
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao listar códigos: {e}")
     
     def contar_livros(self) -> int:
         """Retorna o número total de livros no catálogo"""
         try:
             with self.obter_conexao() as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT COUNT(*) FROM livros')
-                return cursor.fetchone()[0]
+                return self._consultar_um(conn, 'contar_livros', SQL_CONTAR)[0]
+        except sqlite3.Error as e:
+            raise Exception(f"Erro ao contar livros: {e}") 
+    
+    def _consultas_diagnostico(self) -> List[Tuple[str, str, tuple, bool]]:
+        """
+        Consultas verificadas por verificar_planos(): (nome, sql, parâmetros, ordena)
+        ordena indica que a consulta pode ordenar em B-tree temporária: nas buscas textuais
+        (o FTS não devolve na ordem pedida), no intervalo de anos e na página por posição
+        (que reordena apenas as linhas da página).
+        """
+        consultas = [
+            ('listar_livros', SQL_LISTAR, (), False),
+            ('primeira_pagina', SQL_PRIMEIRA_PAGINA, (50,), False),
+            ('pagina_apos', SQL_PAGINA_APOS, ('a', 1, 50), False),
+            ('pagina_antes', SQL_PAGINA_ANTES, ('a', 1, 50), False),
+            ('pagina_por_posicao', SQL_PAGINA_POR_POSICAO, (50, 1000), True),
+            ('buscar_livro_por_codigo', SQL_POR_CODIGO, (1,), False),
+            ('atualizar_livro', SQL_ATUALIZAR, ('t', 'a', 'g', 'e', 2000, 't|a|e|2000', 1), False),
+            ('deletar_livro', SQL_DELETAR, (1,), False),
+            ('atualizar_livro_versao', SQL_ATUALIZAR_VERSAO,
+             ('t', 'a', 'g', 'e', 2000, 't|a|e|2000', 1, 1), False),
+            ('deletar_livro_versao', SQL_DELETAR_VERSAO, (1, 1), False),
+            ('versao_livro', SQL_VERSAO_LIVRO, (1,), False),
+            ('contar_livros', SQL_CONTAR, (), False),
+            ('contagens_faceta', SQL_CONTAGENS_FACETA, ('genero',), True),
+            ('versao_catalogo', SQL_VERSAO_CATALOGO, (), False),
+            ('filtrar_total', SQL_TOTAL_FACETAS, (), False),
+            ('alteracoes_desde', SQL_ALTERACOES_DESDE, (0, 1000), False),
+            ('ler_metadado', SQL_METADADO, ('identificador',), False),
+            ('replicar_atualizacao', SQL_REPLICAR_ATUALIZACAO,
+             ('t', 'a', 'g', 'e', 2000, 't|a|e|2000', 1, 1), False),
+            ('buscar_duplicado', SQL_DUPLICADO, ('t|a|e|2000',), False),
+            ('impressoes_apos', SQL_IMPRESSOES_APOS, ('t|a|e|2000', 1, 1000), False),
+        ]
+        if self.fts_disponivel:
+            consultas += [
+                ('buscar_por_campo', SQL_BUSCA_CAMPO, ('{titulo} : ("a"*)',), True),
+                ('pesquisar', SQL_PESQUISAR, ('[', ']', '"a"*', 50), True),
+            ]
+        
+        filtros = [
+            ('filtrar_autor', {'autor': 'a'}, False),
+            ('filtrar_genero', {'genero': 'g'}, False),
+            ('filtrar_editora', {'editora': 'e'}, False),
+            ('filtrar_ano', {'ano_min': 1990, 'ano_max': 2000}, True),
+        ]
+        for nome, filtro, ordena in filtros:
+            where, parametros = self._montar_filtro(**filtro)
+            consultas.append((nome, sql_pagina_filtrada(where), tuple(parametros) + (50, 0), ordena))
+        where, parametros = self._montar_filtro(genero='g')
+        consultas.append(('filtrar_genero_apos', sql_pagina_filtrada(where, apos=True),
+                          tuple(parametros) + ('a', 1, 50, 0), False))
+        return consultas
+    
+    def verificar_planos(self, falhar: bool = True) -> Dict[str, List[str]]:
+        """
+        Roda EXPLAIN QUERY PLAN em cada consulta do DatabaseManager
+        Uma consulta regrediu se percorre uma tabela inteira sem índice (SCAN sem USING)
+        ou se ordena em B-tree temporária quando deveria usar a ordem de um índice.
+        Retorna o plano de cada consulta; com falhar=True, lança exceção listando as
+        regressões encontradas.
+        """
+        planos, regressoes = {}, []
+        try:
+            with self.obter_conexao() as conn:
+                # EXPLAIN não confere se o esquema mudou: uma leitura antes recarrega o
+                # esquema, para uma conexão do pool não reportar índices já removidos
+                conn.execute('SELECT count(*) FROM sqlite_master').fetchone()
+                for nome, sql, parametros, ordena in self._consultas_diagnostico():
+                    detalhes = [linha[3] for linha in
+                                conn.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)]
+                    planos[nome] = detalhes
+                    for detalhe in detalhes:
+                        varredura = (detalhe.startswith('SCAN ') and 'USING' not in detalhe
+                                     and 'VIRTUAL TABLE' not in detalhe)
+                        if varredura or ('TEMP B-TREE' in detalhe and not ordena):
+                            regressoes.append(f"{nome}: {detalhe}")
         except sqlite3.Error as e:
-            raise Exception(f"Erro ao contar livros: {e}") 
\ No newline at end of file
+            raise Exception(f"Erro ao verificar planos de consulta: {e}")
+        
+        if regressoes and falhar:
+            raise Exception("Consultas sem uso de índice: " + "; ".join(regressoes))
+        return planos
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Catálogo de Livros - Detecção de Duplicatas
+Procura livros cadastrados mais de uma vez, inclusive com pequenas diferenças (erro de
+digitação, pontuação, ano trocado), e gera um relatório de mesclagem com o livro mantido
+e os que seriam excluídos em cada grupo
+
+Uso:
+    python deduplicacao.py --relatorio mesclagem.csv
+    python deduplicacao.py --banco catalogo_livros.db --limiar 0.9 --prefixo 6
+    python deduplicacao.py --relatorio mesclagem.csv --limiar 0.95 --aplicar
+
+Comparar todos os pares de livros seria O(n²). Os livros são lidos em ordem de impressão
+digital (texto.impressao_digital, que começa pelo título normalizado) e divididos em
+blocos de mesmo prefixo; só os livros de um mesmo bloco são comparados entre si.
+Duplicatas com erro nos primeiros caracteres do título ficam em blocos diferentes e não
+são encontradas.
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import DatabaseManager, ResultadoAlteracoes
+from livro import Livro
+from texto import SEPARADOR_IMPRESSAO
+from trigramas import trigramas_palavras
+
+
+# Peso de cada campo da impressão digital na similaridade, na ordem em que são comparados.
+# Com anos a mais de um de distância, o máximo (0.8) fica abaixo do limiar padrão: edições
+# diferentes do mesmo livro não são duplicatas
+PESOS = (('ano_publicacao', 0.2), ('titulo', 0.4), ('autor', 0.3), ('editora', 0.1))
+
+LIMIAR_PADRAO = 0.9
+
+# Palavras do título que distinguem livros de uma série: números ("harry potter 2",
+# "a139") e algarismos romanos até 39 ("volume ii", "tomo iv")
+_PADRAO_ROMANO = re.compile(r'x{0,3}(ix|iv|v?i{0,3})')
+
+CAMPOS_RELATORIO = ('grupo', 'acao', 'similaridade', 'codigo', 'versao', 'titulo', 'autor',
+                    'genero', 'editora', 'ano_publicacao')
+
+
+class GrupoDuplicados:
+    """
+    Livros considerados o mesmo: manter é o mais antigo (menor código) e duplicados traz
+    os pares (livro, similaridade com o mantido)
+    """
+
+    def __init__(self, manter: Livro, duplicados: List[Tuple[Livro, float]]):
+        self.manter = manter
+        self.duplicados = duplicados
+
+    def __str__(self):
+        codigos = ', '.join(str(livro.codigo) for livro, _ in self.duplicados)
+        return f"GrupoDuplicados(manter={self.manter.codigo}, excluir=[{codigos}])"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class ResultadoDeduplicacao:
+    """
+    Grupos de duplicatas encontrados e o trabalho feito: livros lidos, blocos, pares
+    comparados e o tamanho do maior bloco (em impressões distintas)
+    """
+
+    def __init__(self):
+        self.grupos: List[GrupoDuplicados] = []
+        self.livros = 0
+        self.blocos = 0
+        self.comparacoes = 0
+        self.maior_bloco = 0
+        self.segundos = 0.0
+
+    @property
+    def duplicados(self) -> int:
+        """Livros que seriam excluídos na mesclagem"""
+        return sum(len(grupo.duplicados) for grupo in self.grupos)
+
+    def __str__(self):
+        return (f"ResultadoDeduplicacao(livros={self.livros}, grupos={len(self.grupos)}, "
+                f"duplicados={self.duplicados}, comparacoes={self.comparacoes})")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def marcadores_serie(palavras: Iterable[str]) -> frozenset:
+    """Palavras (já normalizadas) com dígitos ou que são algarismos romanos"""
+    return frozenset(palavra for palavra in palavras
+                     if any(c.isdigit() for c in palavra) or _PADRAO_ROMANO.fullmatch(palavra))
+
+
+class _Comparador:
+    """Similaridade entre impressões digitais, com os trigramas de cada campo em cache"""
+
+    def __init__(self):
+        self._campos: Dict[str, tuple] = {}
+
+    def _separar(self, impressao: str) -> tuple:
+        campos = self._campos.get(impressao)
+        if campos is None:
+            titulo, autor, editora, ano = impressao.split(SEPARADOR_IMPRESSAO)
+            palavras = titulo.split()
+            campos = (int(ano), marcadores_serie(palavras), trigramas_palavras(palavras),
+                      trigramas_palavras(autor.split()), trigramas_palavras(editora.split()))
+            self._campos[impressao] = campos
+        return campos
+
+    def similaridade(self, impressao: str, outra: str, minimo: float = 0.0) -> float:
+        """
+        Média ponderada (PESOS) da proximidade dos anos (1 se iguais, 0.5 se vizinhos) e
+        do Jaccard dos trigramas de título, autor e editora; 1.0 para impressões iguais
+        Títulos com números ou algarismos romanos diferentes (volumes, tomos, edições de
+        uma série) têm similaridade 0, por mais parecido que seja o resto.
+        Para assim que o resultado não pode mais chegar a minimo, retornando um valor
+        menor que ele: a maioria dos pares de um bloco é descartada só pelo ano.
+        """
+        if impressao == outra:
+            return 1.0
+        campos, outros = self._separar(impressao), self._separar(outra)
+        if campos[1] != outros[1]:
+            return 0.0
+        distancia = abs(campos[0] - outros[0])
+        total = PESOS[0][1] if distancia == 0 else PESOS[0][1] / 2 if distancia == 1 else 0.0
+        restante = 1.0 - PESOS[0][1]
+        for (_, peso), valor, outro in zip(PESOS[1:], campos[2:], outros[2:]):
+            if total + restante < minimo:
+                return total
+            uniao = len(valor | outro)
+            total += peso * (len(valor & outro) / uniao if uniao else 1.0)
+            restante -= peso
+        return total
+
+    def limpar(self):
+        self._campos.clear()
+
+
+def blocos_por_prefixo(pares: Iterable[Tuple[str, Livro]], prefixo: int
+                       ) -> Iterator[Dict[str, List[Livro]]]:
+    """
+    Agrupa pares (impressao, livro) em ordem de impressão em blocos de mesmo prefixo
+    Cada bloco é um dicionário impressão -> livros com ela.
+    """
+    bloco: Dict[str, List[Livro]] = {}
+    chave = None
+    for impressao, livro in pares:
+        if impressao[:prefixo] != chave:
+            if bloco:
+                yield bloco
+            bloco, chave = {}, impressao[:prefixo]
+        bloco.setdefault(impressao, []).append(livro)
+    if bloco:
+        yield bloco
+
+
+def _dividir(impressoes: List[str], prefixo: int, max_bloco: int) -> Iterator[List[str]]:
+    """
+    Divide as impressões distintas de um bloco (ordenadas) em grupos de no máximo
+    max_bloco, alongando o prefixo dos grandes demais (títulos que começam por palavras
+    comuns, como artigos)
+    """
+    if len(impressoes) <= max_bloco:
+        yield impressoes
+        return
+    if prefixo >= max(len(impressao) for impressao in impressoes):
+        for inicio in range(0, len(impressoes), max_bloco):
+            yield impressoes[inicio:inicio + max_bloco]
+        return
+    partes: Dict[str, List[str]] = {}
+    for impressao in impressoes:
+        partes.setdefault(impressao[:prefixo * 2], []).append(impressao)
+    for parte in partes.values():
+        yield from _dividir(parte, prefixo * 2, max_bloco)
+
+
+def _agrupar(impressoes: List[str], comparador: _Comparador, limiar: float,
+             resultado: ResultadoDeduplicacao) -> List[List[str]]:
+    """Componentes conexos do grafo de impressões com similaridade >= limiar"""
+    pai = list(range(len(impressoes)))
+
+    def raiz(i):
+        while pai[i] != i:
+            pai[i] = pai[pai[i]]
+            i = pai[i]
+        return i
+
+    for i in range(len(impressoes)):
+        for j in range(i + 1, len(impressoes)):
+            resultado.comparacoes += 1
+            if comparador.similaridade(impressoes[i], impressoes[j], limiar) >= limiar:
+                pai[raiz(j)] = raiz(i)
+
+    componentes: Dict[int, List[str]] = {}
+    for i, impressao in enumerate(impressoes):
+        componentes.setdefault(raiz(i), []).append(impressao)
+    return list(componentes.values())
+
+
+def encontrar_duplicatas(db_manager: DatabaseManager, limiar: float = LIMIAR_PADRAO,
+                         prefixo: int = 5,
+                         max_bloco: int = 200,
+                         progresso: Optional[Callable[[ResultadoDeduplicacao], None]] = None
+                         ) -> ResultadoDeduplicacao:
+    """
+    Encontra grupos de livros duplicados ou quase iguais
+    Livros com a mesma impressão digital são sempre duplicatas; impressões diferentes do
+    mesmo bloco (mesmos prefixo primeiros caracteres) com similaridade >= limiar também,
+    e a relação é transitiva dentro do bloco. Blocos com mais de max_bloco impressões
+    distintas são divididos por um prefixo mais longo, limitando as comparações.
+    Os livros são lidos em ordem, bloco a bloco; só o bloco atual fica em memória.
+    progresso(resultado) é chamado após cada bloco.
+    """
+    if not 0 < limiar <= 1:
+        raise ValueError("Limiar deve estar entre 0 e 1")
+    if prefixo < 1 or max_bloco < 2:
+        raise ValueError("Prefixo deve ser positivo e o bloco ter ao menos 2 livros")
+
+    inicio = time.perf_counter()
+    resultado = ResultadoDeduplicacao()
+    db_manager.preencher_impressoes()
+    comparador = _Comparador()
+
+    for bloco in blocos_por_prefixo(db_manager.iterar_impressoes(), prefixo):
+        resultado.blocos += 1
+        resultado.livros += sum(len(livros) for livros in bloco.values())
+        for impressoes in _dividir(sorted(bloco), prefixo, max_bloco):
+            resultado.maior_bloco = max(resultado.maior_bloco, len(impressoes))
+            for componente in _agrupar(impressoes, comparador, limiar, resultado):
+                grupo = _grupo(componente, bloco, comparador)
+                if grupo is not None:
+                    resultado.grupos.append(grupo)
+        comparador.limpar()
+        if progresso is not None:
+            progresso(resultado)
+
+    resultado.grupos.sort(key=lambda grupo: grupo.manter.codigo)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def _grupo(componente: List[str], bloco: Dict[str, List[Livro]],
+           comparador: _Comparador) -> Optional[GrupoDuplicados]:
+    """Grupo com os livros das impressões do componente; None se houver só um livro"""
+    livros = sorted(((livro, impressao) for impressao in componente for livro in bloco[impressao]),
+                    key=lambda par: par[0].codigo)
+    if len(livros) < 2:
+        return None
+    manter, impressao = livros[0]
+    return GrupoDuplicados(manter, [(livro, comparador.similaridade(impressao, outra))
+                                    for livro, outra in livros[1:]])
+
+
+def gravar_relatorio(resultado: ResultadoDeduplicacao, caminho: str):
+    """
+    Grava o relatório de mesclagem em CSV: uma linha por livro, com o número do grupo,
+    a ação ('manter' ou 'excluir') e a similaridade com o livro mantido
+    """
+    with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+        saida = csv.writer(arquivo)
+        saida.writerow(CAMPOS_RELATORIO)
+        for numero, grupo in enumerate(resultado.grupos, 1):
+            itens = [(grupo.manter, 'manter', 1.0)]
+            itens += [(livro, 'excluir', similaridade) for livro, similaridade in grupo.duplicados]
+            for livro, acao, similaridade in itens:
+                saida.writerow((numero, acao, f'{similaridade:.3f}', livro.codigo, livro.versao,
+                                livro.titulo, livro.autor, livro.genero, livro.editora,
+                                livro.ano_publicacao))
+
+
+def aplicar_mesclagem(db_manager: DatabaseManager, grupos: Iterable[GrupoDuplicados]
+                      ) -> ResultadoAlteracoes:
+    """
+    Exclui os duplicados de cada grupo, mantendo o livro mais antigo
+    Confira antes o relatório: a similaridade não distingue todas as obras diferentes de
+    títulos parecidos.
+    A exclusão é condicionada à versão lida: livros alterados depois da detecção não são
+    excluídos e aparecem como conflito no resultado.
+    """
+    return db_manager.deletar_livros([(livro.codigo, livro.versao)
+                                      for grupo in grupos for livro, _ in grupo.duplicados])
+
+
+def main(argv=None):
+    """Função principal da detecção de duplicatas"""
+    parser = argparse.ArgumentParser(description="Encontra livros duplicados no catálogo")
+    parser.add_argument('--banco', default='catalogo_livros.db', help="Arquivo do banco de dados")
+    parser.add_argument('--relatorio', default=None,
+                        help="Arquivo CSV do relatório de mesclagem")
+    parser.add_argument('--limiar', type=float, default=None,
+                        help=f"Similaridade mínima (0 a 1) para considerar dois livros iguais "
+                             f"(padrão {LIMIAR_PADRAO}; obrigatório com --aplicar)")
+    parser.add_argument('--prefixo', type=int, default=5,
+                        help="Caracteres iniciais da impressão digital que formam um bloco")
+    parser.add_argument('--max-bloco', type=int, default=200,
+                        help="Impressões distintas comparadas entre si em cada bloco")
+    parser.add_argument('--aplicar', action='store_true',
+                        help="Exclui os duplicados, mantendo o livro mais antigo de cada grupo")
+    args = parser.parse_args(argv)
+
+    if args.aplicar and args.limiar is None:
+        print("--aplicar exclui livros: informe --limiar explicitamente (confira antes o "
+              "relatório gerado com o limiar escolhido)", file=sys.stderr)
+        return 1
+    limiar = args.limiar if args.limiar is not None else LIMIAR_PADRAO
+
+    if not os.path.exists(args.banco):
+        print(f"Banco não encontrado: {args.banco}")
+        return 1
+
+    try:
+        with DatabaseManager(args.banco) as db:
+            resultado = encontrar_duplicatas(db, limiar, args.prefixo, args.max_bloco)
+            print(f"{resultado.livros} livros em {resultado.blocos} blocos, "
+                  f"{resultado.comparacoes} comparações em {resultado.segundos:.2f} s")
+            print(f"Grupos de duplicatas: {len(resultado.grupos)} "
+                  f"({resultado.duplicados} livros a excluir)")
+            if args.relatorio:
+                gravar_relatorio(resultado, args.relatorio)
+                print(f"Relatório gravado em {args.relatorio}")
+            if args.aplicar and resultado.grupos:
+                alteracoes = aplicar_mesclagem(db, resultado.grupos)
+                print(f"Livros excluídos: {len(alteracoes.aplicados)}")
+                if alteracoes.conflitos:
+                    print(f"Alterados desde a leitura (mantidos): {len(alteracoes.conflitos)}")
+    except (ValueError, OSError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Erro na detecção de duplicatas: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Catálogo de Livros - Exportação
+Exporta o catálogo (ou parte dele) para CSV, JSON Lines ou formato colunar, lendo os
+livros direto do cursor: a memória usada não depende do tamanho do catálogo
+
+Uso:
+    python exportador.py livros.csv
+    python exportador.py livros.jsonl.gz --genero Romance --ano-min 1900
+    python exportador.py livros.lcol --termo "machado" --campos autor
+
+Formato colunar (.lcol):
+    arquivo := MAGICA grupo* rodapé tamanho_do_rodapé (uint32) MAGICA
+    Cada grupo guarda até tamanho_grupo linhas, uma coluna após a outra (comprimidas
+    com zlib, se indicado no rodapé). Inteiros são gravados como diferenças em relação
+    ao valor anterior (int64); textos, como dicionário mais índices quando há muitas
+    repetições (gênero, editora, autor), ou então comprimentos mais bytes UTF-8.
+    O rodapé é um JSON com as colunas, o total de linhas e a posição, o tamanho, a
+    codificação e o mínimo/máximo de cada coluna em cada grupo, o que permite ler só
+    as colunas (e os grupos) necessários. Todos os números são little-endian.
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import DatabaseManager
+
+
+# Colunas exportadas, na ordem de COLUNAS_LIVRO
+CAMPOS_EXPORTACAO = ('codigo', 'titulo', 'autor', 'genero', 'editora', 'ano_publicacao',
+                     'versao')
+TIPOS_COLUNAS = {'codigo': 'inteiro', 'titulo': 'texto', 'autor': 'texto', 'genero': 'texto',
+                 'editora': 'texto', 'ano_publicacao': 'inteiro', 'versao': 'inteiro'}
+
+FORMATOS = ('csv', 'jsonl', 'colunar')
+
+MAGICA_COLUNAR = b'LCOL'
+VERSAO_COLUNAR = 1
+TAMANHO_GRUPO_PADRAO = 65536
+
+
+class ResultadoExportacao:
+    """Resumo de uma exportação: livros gravados, tamanho do arquivo e duração"""
+
+    def __init__(self, caminho: str, formato: str, exportados: int, tamanho_bytes: int,
+                 segundos: float):
+        self.caminho = caminho
+        self.formato = formato
+        self.exportados = exportados
+        self.tamanho_bytes = tamanho_bytes
+        self.segundos = segundos
+
+    def __str__(self):
+        return (f"ResultadoExportacao(formato={self.formato}, exportados={self.exportados}, "
+                f"tamanho_bytes={self.tamanho_bytes})")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class EscritorCSV:
+    """Grava as linhas como CSV com cabeçalho (o mesmo formato lido pelo importar.py)"""
+
+    def __init__(self, arquivo):
+        self._escritor = csv.writer(arquivo)
+        self._escritor.writerow(CAMPOS_EXPORTACAO)
+
+    def escrever(self, linhas: List[tuple]):
+        self._escritor.writerows(linhas)
+
+    def finalizar(self):
+        pass
+
+
+class EscritorJSONL:
+    """Grava um objeto JSON por linha (o mesmo formato lido pelo importar.py)"""
+
+    def __init__(self, arquivo):
+        self._arquivo = arquivo
+        self._codificador = json.JSONEncoder(ensure_ascii=False)
+
+    def escrever(self, linhas: List[tuple]):
+        codificar = self._codificador.encode
+        self._arquivo.writelines(codificar(dict(zip(CAMPOS_EXPORTACAO, linha))) + '\n'
+                                 for linha in linhas)
+
+    def finalizar(self):
+        pass
+
+
+def _bytes_le(valores: array) -> bytes:
+    if sys.byteorder == 'big':
+        valores = array(valores.typecode, valores)
+        valores.byteswap()
+    return valores.tobytes()
+
+
+def _array_le(typecode: str, dados: bytes) -> array:
+    valores = array(typecode)
+    valores.frombytes(dados)
+    if sys.byteorder == 'big':
+        valores.byteswap()
+    return valores
+
+
+def _codificar_textos(textos: Sequence[str]) -> bytes:
+    """quantidade (uint32), comprimentos (uint32 cada) e os textos em UTF-8 concatenados"""
+    codificados = [texto.encode('utf-8') for texto in textos]
+    comprimentos = array('I', map(len, codificados))
+    return struct.pack('<I', len(codificados)) + _bytes_le(comprimentos) + b''.join(codificados)
+
+
+def _decodificar_textos(dados: bytes, inicio: int = 0):
+    """Inverso de _codificar_textos; retorna os textos e a posição seguinte"""
+    quantidade, = struct.unpack_from('<I', dados, inicio)
+    inicio += 4
+    comprimentos = _array_le('I', dados[inicio:inicio + 4 * quantidade])
+    posicao = inicio + 4 * quantidade
+    textos = []
+    for comprimento in comprimentos:
+        textos.append(dados[posicao:posicao + comprimento].decode('utf-8'))
+        posicao += comprimento
+    return textos, posicao
+
+
+class EscritorColunar:
+    """
+    Grava o formato colunar descrito no início do módulo
+    As linhas são acumuladas por coluna até completar um grupo, então a memória usada
+    é limitada por tamanho_grupo.
+    """
+
+    def __init__(self, arquivo, comprimir: bool = True, tamanho_grupo: int = TAMANHO_GRUPO_PADRAO):
+        if tamanho_grupo < 1:
+            raise ValueError("Tamanho do grupo deve ser positivo")
+        self._arquivo = arquivo
+        self.comprimir = comprimir
+        self.tamanho_grupo = tamanho_grupo
+        self._colunas: List[list] = [[] for _ in CAMPOS_EXPORTACAO]
+        self._grupos: List[dict] = []
+        self._linhas = 0
+        self._posicao = 0
+        self._gravar(MAGICA_COLUNAR)
+
+    def _gravar(self, dados: bytes):
+        self._arquivo.write(dados)
+        self._posicao += len(dados)
+
+    def escrever(self, linhas: List[tuple]):
+        while linhas:
+            espaco = self.tamanho_grupo - len(self._colunas[0])
+            parte, linhas = linhas[:espaco], linhas[espaco:]
+            for coluna, valores in zip(self._colunas, zip(*parte)):
+                coluna.extend(valores)
+            if len(self._colunas[0]) >= self.tamanho_grupo:
+                self._gravar_grupo()
+
+    def _gravar_grupo(self):
+        quantidade = len(self._colunas[0])
+        if not quantidade:
+            return
+
+        colunas = []
+        for nome, valores in zip(CAMPOS_EXPORTACAO, self._colunas):
+            if TIPOS_COLUNAS[nome] == 'inteiro':
+                codificacao, dados = 'delta', self._codificar_inteiros(valores)
+            else:
+                codificacao, dados = self._codificar_coluna_texto(valores)
+            if self.comprimir:
+                dados = zlib.compress(dados, 6)
+            colunas.append({'deslocamento': self._posicao, 'tamanho': len(dados),
+                            'codificacao': codificacao, 'minimo': min(valores),
+                            'maximo': max(valores)})
+            self._gravar(dados)
+
+        self._grupos.append({'linhas': quantidade, 'colunas': colunas})
+        self._linhas += quantidade
+        self._colunas = [[] for _ in CAMPOS_EXPORTACAO]
+
+    @staticmethod
+    def _codificar_inteiros(valores: list) -> bytes:
+        diferencas = array('q', valores)
+        for i in range(len(diferencas) - 1, 0, -1):
+            diferencas[i] -= diferencas[i - 1]
+        return _bytes_le(diferencas)
+
+    @staticmethod
+    def _codificar_coluna_texto(valores: list):
+        dicionario: Dict[str, int] = {}
+        for valor in valores:
+            if valor not in dicionario:
+                dicionario[valor] = len(dicionario)
+                if len(dicionario) * 2 > len(valores):
+                    # Poucas repetições: o dicionário não compensa
+                    return 'plano', _codificar_textos(valores)
+        indices = array('I', (dicionario[valor] for valor in valores))
+        return 'dicionario', _codificar_textos(list(dicionario)) + _bytes_le(indices)
+
+    def finalizar(self):
+        self._gravar_grupo()
+        rodape = json.dumps({
+            'versao': VERSAO_COLUNAR,
+            'colunas': [{'nome': nome, 'tipo': TIPOS_COLUNAS[nome]} for nome in CAMPOS_EXPORTACAO],
+            'linhas': self._linhas,
+            'compressao': 'zlib' if self.comprimir else None,
+            'grupos': self._grupos,
+        }, ensure_ascii=False).encode('utf-8')
+        self._gravar(rodape + struct.pack('<I', len(rodape)) + MAGICA_COLUNAR)
+
+
+def ler_metadados_colunar(caminho: str) -> dict:
+    """Lê o rodapé de um arquivo colunar (colunas, total de linhas e grupos)"""
+    with open(caminho, 'rb') as arquivo:
+        return _ler_rodape(arquivo)
+
+
+def _ler_rodape(arquivo) -> dict:
+    if arquivo.read(len(MAGICA_COLUNAR)) != MAGICA_COLUNAR:
+        raise ValueError("Arquivo não está no formato colunar")
+    arquivo.seek(-(4 + len(MAGICA_COLUNAR)), os.SEEK_END)
+    final = arquivo.read()
+    if final[4:] != MAGICA_COLUNAR:
+        raise ValueError("Arquivo colunar incompleto ou corrompido")
+    tamanho, = struct.unpack('<I', final[:4])
+    arquivo.seek(-(tamanho + 4 + len(MAGICA_COLUNAR)), os.SEEK_END)
+    metadados = json.loads(arquivo.read(tamanho).decode('utf-8'))
+    if metadados.get('versao') != VERSAO_COLUNAR:
+        raise ValueError(f"Versão do formato colunar não suportada: {metadados.get('versao')}")
+    return metadados
+
+
+def ler_colunar(caminho: str, colunas: Optional[Sequence[str]] = None) -> Iterator[dict]:
+    """
+    Lê um arquivo colunar, um registro (dicionário) por vez
+    Com colunas, só essas colunas são lidas do arquivo.
+    """
+    with open(caminho, 'rb') as arquivo:
+        metadados = _ler_rodape(arquivo)
+        nomes = [coluna['nome'] for coluna in metadados['colunas']]
+        pedidas = list(colunas) if colunas is not None else nomes
+        desconhecidas = [nome for nome in pedidas if nome not in nomes]
+        if desconhecidas:
+            raise ValueError(f"Coluna inexistente: {', '.join(desconhecidas)}")
+
+        for grupo in metadados['grupos']:
+            valores = []
+            for nome in pedidas:
+                indice = nomes.index(nome)
+                bloco = grupo['colunas'][indice]
+                arquivo.seek(bloco['deslocamento'])
+                dados = arquivo.read(bloco['tamanho'])
+                if metadados['compressao'] == 'zlib':
+                    dados = zlib.decompress(dados)
+                valores.append(_decodificar_coluna(bloco['codificacao'], dados, grupo['linhas']))
+            for linha in zip(*valores):
+                yield dict(zip(pedidas, linha))
+
+
+def _decodificar_coluna(codificacao: str, dados: bytes, linhas: int) -> list:
+    if codificacao == 'delta':
+        valores = _array_le('q', dados)
+        for i in range(1, len(valores)):
+            valores[i] += valores[i - 1]
+        return valores.tolist()
+    if codificacao == 'plano':
+        return _decodificar_textos(dados)[0]
+    if codificacao == 'dicionario':
+        dicionario, posicao = _decodificar_textos(dados)
+        return [dicionario[indice] for indice in _array_le('I', dados[posicao:posicao + 4 * linhas])]
+    raise ValueError(f"Codificação desconhecida: {codificacao}")
+
+
+def detectar_formato(caminho: str) -> str:
+    """Deduz o formato pela extensão (ignorando um .gz final)"""
+    nome = caminho[:-3] if caminho.lower().endswith('.gz') else caminho
+    extensao = os.path.splitext(nome)[1].lower()
+    if extensao in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extensao == '.lcol':
+        return 'colunar'
+    return 'csv'
+
+
+def exportar(db_manager: DatabaseManager, caminho: str, formato: Optional[str] = None,
+             comprimir: Optional[bool] = None, filtros: Optional[dict] = None,
+             progresso: Optional[Callable[[int, Optional[int]], None]] = None,
+             tamanho_lote: int = 1000,
+             tamanho_grupo: int = TAMANHO_GRUPO_PADRAO) -> ResultadoExportacao:
+    """
+    Exporta os livros que atendem aos filtros (os mesmos de filtrar_livros) para o arquivo
+    Os livros são lidos do cursor em lotes de tamanho_lote e gravados em seguida, em
+    ordem de código. progresso(exportados, total) é chamado após cada lote.
+    comprimir: gzip no arquivo todo para CSV/JSON Lines (padrão: se o nome termina em
+    .gz) e zlib em cada coluna no formato colunar (padrão: sim).
+    O arquivo é gravado com outro nome e só substitui o destino quando completo.
+    """
+    formato = formato or detectar_formato(caminho)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato} (opções: {', '.join(FORMATOS)})")
+    if comprimir is None:
+        comprimir = formato == 'colunar' or caminho.lower().endswith('.gz')
+
+    inicio = time.perf_counter()
+    temporario = f'{caminho}.tmp'
+    exportados = 0
+    try:
+        with db_manager.leitura_exportacao(tamanho_lote=tamanho_lote, contar=progresso is not None,
+                                           **(filtros or {})) as (total, lotes):
+            with _abrir_destino(temporario, formato, comprimir) as arquivo:
+                if formato == 'csv':
+                    escritor = EscritorCSV(arquivo)
+                elif formato == 'jsonl':
+                    escritor = EscritorJSONL(arquivo)
+                else:
+                    escritor = EscritorColunar(arquivo, comprimir, tamanho_grupo)
+
+                for lote in lotes:
+                    escritor.escrever(lote)
+                    exportados += len(lote)
+                    if progresso is not None:
+                        progresso(exportados, total)
+                escritor.finalizar()
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+    return ResultadoExportacao(caminho, formato, exportados, os.path.getsize(caminho),
+                               time.perf_counter() - inicio)
+
+
+def _abrir_destino(caminho: str, formato: str, comprimir: bool):
+    if formato == 'colunar':
+        return open(caminho, 'wb')
+    if comprimir:
+        return gzip.open(caminho, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    return open(caminho, 'w', encoding='utf-8', newline='')
+
+
+def main(argv=None):
+    """Função principal da exportação"""
+    parser = argparse.ArgumentParser(description="Exporta o catálogo para CSV, JSON Lines ou formato colunar")
+    parser.add_argument('arquivo', help="Arquivo de saída (.csv, .jsonl, .lcol; .gz para comprimir)")
+    parser.add_argument('--formato', choices=FORMATOS,
+                        help="Formato do arquivo (deduzido pela extensão se omitido)")
+    parser.add_argument('--banco', default='catalogo_livros.db', help="Arquivo do banco de dados")
+    parser.add_argument('--sem-compressao', action='store_true',
+                        help="Não comprime o arquivo (gzip) nem as colunas do formato colunar")
+    parser.add_argument('--lote', type=int, default=1000, help="Livros lidos do banco por vez")
+    parser.add_argument('--autor', help="Somente livros deste autor")
+    parser.add_argument('--genero', help="Somente livros deste gênero")
+    parser.add_argument('--editora', help="Somente livros desta editora")
+    parser.add_argument('--ano-min', type=int, help="Ano de publicação mínimo")
+    parser.add_argument('--ano-max', type=int, help="Ano de publicação máximo")
+    parser.add_argument('--termo', help="Somente livros encontrados pela busca textual")
+    parser.add_argument('--campos', help="Campos da busca textual, separados por vírgula")
+    parser.add_argument('--silencioso', action='store_true', help="Não mostra o progresso")
+    args = parser.parse_args(argv)
+
+    filtros = {'autor': args.autor, 'genero': args.genero, 'editora': args.editora,
+               'ano_min': args.ano_min, 'ano_max': args.ano_max, 'termo': args.termo,
+               'campos': args.campos.split(',') if args.campos else None}
+
+    def mostrar_progresso(exportados, total):
+        print(f"\rExportados {exportados} de {total} livros", end='', file=sys.stderr, flush=True)
+
+    comprimir = False if args.sem_compressao else None
+    try:
+        with DatabaseManager(args.banco) as db:
+            resultado = exportar(db, args.arquivo, args.formato, comprimir, filtros,
+                                 None if args.silencioso else mostrar_progresso, args.lote)
+    except OSError as e:
+        print(f"\nErro ao gravar arquivo: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"\nErro na exportação: {e}", file=sys.stderr)
+        return 1
+
+    if not args.silencioso:
+        print(file=sys.stderr)
+    print(f"Livros exportados: {resultado.exportados} ({resultado.tamanho_bytes} bytes "
+          f"em {resultado.segundos:.1f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
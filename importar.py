@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Catálogo de Livros - Importação em Lote
+Importa livros de arquivos CSV ou JSON Lines sem abrir a interface gráfica
+
+Uso:
+    python importar.py livros.csv
+    python importar.py livros.jsonl --lote 5000 --banco catalogo_livros.db
+    python importar.py livros.csv --duplicados ignorar
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Iterator
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import MODOS_DUPLICADOS, DatabaseManager
+
+
+CAMPOS_INTEIROS = ('ano_publicacao', 'versao')
+
+
+def converter_registro(dados: dict) -> dict:
+    """Converte os campos numéricos lidos como texto para inteiros"""
+    registro = dict(dados)
+    for campo in CAMPOS_INTEIROS:
+        valor = registro.get(campo)
+        if isinstance(valor, str) and valor.strip().lstrip('-').isdigit():
+            registro[campo] = int(valor.strip())
+    return registro
+
+
+def ler_csv(caminho: str, delimitador: str = ',') -> Iterator[dict]:
+    """Lê um arquivo CSV com cabeçalho, um registro por vez"""
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        for linha in csv.DictReader(arquivo, delimiter=delimitador):
+            yield converter_registro(linha)
+
+
+def ler_jsonl(caminho: str) -> Iterator[dict]:
+    """
+    Lê um arquivo JSON Lines, um registro por vez
+    Linhas que não são JSON válido são repassadas como texto e rejeitadas na validação
+    """
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                yield linha
+                continue
+            yield converter_registro(registro) if isinstance(registro, dict) else registro
+
+
+def detectar_formato(caminho: str) -> str:
+    """Deduz o formato do arquivo pela extensão"""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return 'csv'
+
+
+def main(argv=None):
+    """Função principal da importação em lote"""
+    parser = argparse.ArgumentParser(description="Importa livros de arquivos CSV ou JSON Lines")
+    parser.add_argument('arquivo', help="Arquivo de entrada (.csv, .jsonl)")
+    parser.add_argument('--formato', choices=['csv', 'jsonl'],
+                        help="Formato do arquivo (deduzido pela extensão se omitido)")
+    parser.add_argument('--banco', default='catalogo_livros.db', help="Arquivo do banco de dados")
+    parser.add_argument('--lote', type=int, default=1000, help="Livros por transação")
+    parser.add_argument('--delimitador', default=',', help="Delimitador do CSV")
+    parser.add_argument('--max-falhas', type=int, default=20,
+                        help="Quantidade máxima de falhas exibidas")
+    parser.add_argument('--duplicados', choices=MODOS_DUPLICADOS, default='inserir',
+                        help="Livros já cadastrados (mesma impressão digital): inserir de novo, "
+                             "ignorar ou atualizar o existente")
+    args = parser.parse_args(argv)
+
+    formato = args.formato or detectar_formato(args.arquivo)
+    if formato == 'jsonl':
+        registros = ler_jsonl(args.arquivo)
+    else:
+        registros = ler_csv(args.arquivo, args.delimitador)
+
+    try:
+        with DatabaseManager(args.banco) as db:
+            resultado = db.criar_livros(registros, tamanho_lote=args.lote,
+                                        duplicados=args.duplicados)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Erro ao ler arquivo: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Erro na importação: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Livros importados: {resultado.inseridos}")
+    for primeiro, ultimo in resultado.faixas_codigos:
+        print(f"  Códigos {primeiro} a {ultimo}")
+
+    if resultado.duplicados:
+        acao = 'atualizados' if args.duplicados == 'atualizar' else 'ignorados'
+        print(f"Livros já cadastrados ({acao}): {len(resultado.duplicados)}")
+        for indice, codigo in resultado.duplicados[:args.max_falhas]:
+            print(f"  Registro {indice + 1}: livro {codigo}")
+
+    if resultado.falhas:
+        print(f"Registros rejeitados: {len(resultado.falhas)}", file=sys.stderr)
+        for indice, mensagem in resultado.falhas[:args.max_falhas]:
+            print(f"  Registro {indice + 1}: {mensagem}", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Catálogo de Livros - Ingestão Paralela
+Importa arquivos grandes (milhões de livros) validando os registros em vários processos
+
+Uso:
+    python ingestao.py editora.csv
+    python ingestao.py editora.jsonl --processos 8 --bloco 20000 --rejeitados rejeitados.csv
+    python ingestao.py atualizacao.csv --duplicados atualizar
+
+O arquivo é dividido em blocos de registros lidos em sequência; cada bloco é
+interpretado e validado com as regras de Livro em um processo do ProcessPoolExecutor, e
+um único escritor grava os livros válidos em lotes, na ordem do arquivo. Registros
+inválidos vão para o arquivo de rejeitados, com a linha e o motivo.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import MODOS_DUPLICADOS, DatabaseManager, ResultadoImportacao, valores_para_insercao
+from importar import converter_registro, detectar_formato
+
+
+CAMPOS_REJEITADOS = ('linha', 'motivo', 'registro')
+
+
+class EstatisticaEtapa:
+    """Registros processados por uma etapa e o tempo gasto nela"""
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.registros = 0
+        self.bytes = 0
+        self.segundos = 0.0
+
+    @property
+    def vazao(self) -> float:
+        """Registros por segundo"""
+        return self.registros / self.segundos if self.segundos else 0.0
+
+    def __str__(self):
+        return (f"{self.nome}: {self.registros} registros em {self.segundos:.2f} s "
+                f"({self.vazao:,.0f}/s)")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class ResultadoIngestao:
+    """
+    Resumo de uma ingestão: livros inseridos, rejeitados, duplicados (ignorados ou
+    atualizados, conforme o modo) e a vazão de cada etapa
+    A etapa de leitura (divisão em blocos) e a de gravação rodam no processo principal;
+    a de validação soma o tempo de todos os processos, então a vazão dela é a de um
+    processo, e a capacidade total é aproximadamente vazao × processos.
+    """
+
+    def __init__(self, processos: int):
+        self.processos = processos
+        self.importacao = ResultadoImportacao()
+        self.rejeitados = 0
+        self.duplicados = 0
+        self.blocos = 0
+        self.leitura = EstatisticaEtapa('leitura')
+        self.validacao = EstatisticaEtapa('validação')
+        self.gravacao = EstatisticaEtapa('gravação')
+        self.segundos = 0.0
+
+    @property
+    def inseridos(self) -> int:
+        return self.importacao.inseridos
+
+    @property
+    def vazao(self) -> float:
+        """Registros lidos por segundo, do início ao fim da ingestão"""
+        return self.leitura.registros / self.segundos if self.segundos else 0.0
+
+    def __str__(self):
+        return (f"ResultadoIngestao(inseridos={self.inseridos}, rejeitados={self.rejeitados}, "
+                f"duplicados={self.duplicados}, segundos={self.segundos:.2f})")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def dividir_blocos(arquivo, formato: str, registros_por_bloco: int
+                   ) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Divide o arquivo (aberto em modo binário, após o cabeçalho do CSV) em blocos de
+    registros completos: (linha inicial, quantidade de registros, conteúdo)
+    No CSV, uma linha só termina o registro se a quantidade de aspas até ela é par, o
+    que mantém inteiros os campos entre aspas com quebras de linha.
+    """
+    linha_inicial = proxima_linha = 1
+    linhas: List[bytes] = []
+    registros = 0
+    aspas = 0
+    for linha in arquivo:
+        linhas.append(linha)
+        proxima_linha += 1
+        if formato == 'csv':
+            aspas += linha.count(b'"')
+            if aspas % 2:
+                continue
+            aspas = 0
+        if not linha.strip():
+            continue
+        registros += 1
+        if registros == registros_por_bloco:
+            yield linha_inicial, registros, b''.join(linhas)
+            linha_inicial, linhas, registros = proxima_linha, [], 0
+    if linhas:
+        yield linha_inicial, registros, b''.join(linhas)
+
+
+def validar_bloco(formato: str, cabecalho: Optional[List[str]], delimitador: str,
+                  linha_inicial: int, conteudo: bytes):
+    """
+    Interpreta e valida um bloco (roda nos processos de validação)
+    Retorna (valores, rejeitados, registros, segundos): as tuplas dos livros válidos, na
+    ordem do bloco, os pares (linha, motivo, registro) dos inválidos, a quantidade de
+    registros e o tempo de CPU gasto.
+    """
+    inicio = time.process_time()
+    valores, rejeitados = [], []
+    texto = conteudo.decode('utf-8', errors='replace')
+    if formato == 'csv':
+        leitor = csv.reader(io.StringIO(texto, newline=''), delimiter=delimitador)
+        linha = linha_inicial
+        for campos in leitor:
+            if campos:
+                registro = dict(zip(cabecalho, campos))
+                if len(campos) != len(cabecalho):
+                    rejeitados.append((linha, f"Esperados {len(cabecalho)} campos, "
+                                              f"encontrados {len(campos)}", registro))
+                else:
+                    _validar(converter_registro(registro), linha, valores, rejeitados)
+            linha = linha_inicial + leitor.line_num
+    else:
+        for deslocamento, texto_linha in enumerate(texto.split('\n')):
+            if not texto_linha.strip():
+                continue
+            linha = linha_inicial + deslocamento
+            try:
+                registro = json.loads(texto_linha)
+            except json.JSONDecodeError as e:
+                rejeitados.append((linha, f"JSON inválido: {e.msg}", texto_linha))
+                continue
+            if isinstance(registro, dict):
+                registro = converter_registro(registro)
+            _validar(registro, linha, valores, rejeitados)
+    return valores, rejeitados, len(valores) + len(rejeitados), time.process_time() - inicio
+
+
+def _validar(registro, linha: int, valores: list, rejeitados: list):
+    try:
+        valores.append(valores_para_insercao(registro))
+    except (ValueError, TypeError) as e:
+        rejeitados.append((linha, str(e), registro))
+
+
+def ingerir(db_manager: DatabaseManager, caminho: str, formato: Optional[str] = None,
+            processos: Optional[int] = None, registros_por_bloco: int = 10000,
+            tamanho_lote: int = 5000, delimitador: str = ',',
+            arquivo_rejeitados: Optional[str] = None,
+            progresso: Optional[Callable[[ResultadoIngestao], None]] = None,
+            duplicados: str = 'inserir') -> ResultadoIngestao:
+    """
+    Importa um arquivo CSV ou JSON Lines validando os registros em processos paralelos
+    O processo principal divide o arquivo em blocos e os envia ao ProcessPoolExecutor;
+    uma thread escritora recebe os blocos validados na ordem do arquivo e grava os
+    livros com criar_livros_validados, uma transação a cada tamanho_lote livros. No
+    máximo 2 × processos blocos ficam em andamento, limitando a memória usada.
+    Registros inválidos são gravados em arquivo_rejeitados (CSV com linha, motivo e
+    registro), se informado. progresso(resultado) é chamado após cada bloco gravado.
+    duplicados segue as regras de DatabaseManager.criar_livros; a impressão digital de
+    cada livro é calculada nos processos de validação.
+    """
+    if registros_por_bloco < 1 or tamanho_lote < 1:
+        raise ValueError("Tamanho do bloco e do lote devem ser positivos")
+    if duplicados not in MODOS_DUPLICADOS:
+        raise ValueError(f"Modo de duplicados inválido: {duplicados}")
+    formato = formato or detectar_formato(caminho)
+    processos = processos or os.cpu_count() or 1
+    resultado = ResultadoIngestao(processos)
+    inicio = time.perf_counter()
+
+    pendentes = queue.Queue()
+    vagas = threading.Semaphore(2 * processos)
+    falha: List[BaseException] = []
+    rejeitados = None
+    if arquivo_rejeitados is not None:
+        rejeitados = open(arquivo_rejeitados, 'w', newline='', encoding='utf-8')
+        csv.writer(rejeitados).writerow(CAMPOS_REJEITADOS)
+
+    def escrever():
+        """Grava os blocos na ordem em que foram enviados"""
+        saida = csv.writer(rejeitados) if rejeitados is not None else None
+        while True:
+            futuro: Optional[Future] = pendentes.get()
+            if futuro is None:
+                return
+            try:
+                if falha:
+                    continue
+                valores, invalidos, registros, segundos = futuro.result()
+                resultado.validacao.registros += registros
+                resultado.validacao.segundos += segundos
+
+                comeco = time.perf_counter()
+                lote = db_manager.criar_livros_validados(valores, tamanho_lote, duplicados)
+                resultado.importacao.faixas_codigos.extend(lote.faixas_codigos)
+                resultado.importacao.inseridos += lote.inseridos
+                resultado.duplicados += len(lote.duplicados)
+                if saida is not None:
+                    saida.writerows(
+                        (linha, motivo, registro if isinstance(registro, str)
+                         else json.dumps(registro, ensure_ascii=False))
+                        for linha, motivo, registro in invalidos
+                    )
+                resultado.gravacao.registros += len(valores)
+                resultado.gravacao.segundos += time.perf_counter() - comeco
+                resultado.rejeitados += len(invalidos)
+                resultado.blocos += 1
+                if progresso is not None:
+                    progresso(resultado)
+            except BaseException as e:
+                falha.append(e)
+            finally:
+                vagas.release()
+
+    escritor = threading.Thread(target=escrever, name="ingestao-escritor", daemon=True)
+    escritor.start()
+    try:
+        with open(caminho, 'rb') as arquivo, ProcessPoolExecutor(processos) as executor:
+            cabecalho = None
+            linha_inicial = 1
+            if formato == 'csv':
+                primeira = arquivo.readline().decode('utf-8-sig')
+                cabecalho = next(csv.reader([primeira], delimiter=delimitador), None)
+                if not cabecalho:
+                    raise ValueError("Arquivo CSV sem cabeçalho")
+                cabecalho = [campo.strip() for campo in cabecalho]
+                linha_inicial = 2
+
+            comeco = time.perf_counter()
+            for linha, registros, conteudo in dividir_blocos(arquivo, formato, registros_por_bloco):
+                resultado.leitura.registros += registros
+                resultado.leitura.bytes += len(conteudo)
+                resultado.leitura.segundos += time.perf_counter() - comeco
+                vagas.acquire()
+                if falha:
+                    break
+                pendentes.put(executor.submit(validar_bloco, formato, cabecalho, delimitador,
+                                              linha + linha_inicial - 1, conteudo))
+                comeco = time.perf_counter()
+            pendentes.put(None)
+            escritor.join()
+    except BaseException as e:
+        # O escritor descarta os blocos ainda na fila em vez de gravá-los
+        falha.append(e)
+        raise
+    finally:
+        pendentes.put(None)
+        escritor.join()
+        if rejeitados is not None:
+            rejeitados.close()
+
+    resultado.segundos = time.perf_counter() - inicio
+    if falha:
+        raise falha[0]
+    return resultado
+
+
+def main(argv=None):
+    """Função principal da ingestão paralela"""
+    parser = argparse.ArgumentParser(
+        description="Importa arquivos grandes de livros validando em processos paralelos")
+    parser.add_argument('arquivo', help="Arquivo de entrada (.csv, .jsonl)")
+    parser.add_argument('--formato', choices=['csv', 'jsonl'],
+                        help="Formato do arquivo (deduzido pela extensão se omitido)")
+    parser.add_argument('--banco', default='catalogo_livros.db', help="Arquivo do banco de dados")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="Processos de validação (padrão: um por núcleo)")
+    parser.add_argument('--bloco', type=int, default=10000, help="Registros por bloco de validação")
+    parser.add_argument('--lote', type=int, default=5000, help="Livros por transação")
+    parser.add_argument('--delimitador', default=',', help="Delimitador do CSV")
+    parser.add_argument('--rejeitados', default=None,
+                        help="Arquivo CSV para os registros rejeitados (linha, motivo, registro)")
+    parser.add_argument('--duplicados', choices=MODOS_DUPLICADOS, default='inserir',
+                        help="Livros já cadastrados (mesma impressão digital): inserir de novo, "
+                             "ignorar ou atualizar o existente")
+    args = parser.parse_args(argv)
+
+    def mostrar_progresso(resultado: ResultadoIngestao):
+        print(f"\r{resultado.leitura.registros} registros lidos, {resultado.inseridos} "
+              f"inseridos, {resultado.rejeitados} rejeitados", end='', file=sys.stderr)
+
+    try:
+        with DatabaseManager(args.banco) as db:
+            resultado = ingerir(db, args.arquivo, args.formato, args.processos, args.bloco,
+                                args.lote, args.delimitador, args.rejeitados, mostrar_progresso,
+                                args.duplicados)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"\nErro ao ler arquivo: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"\nErro na ingestão: {e}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+
+    print(f"Livros importados: {resultado.inseridos} em {resultado.segundos:.2f} s "
+          f"({resultado.vazao:,.0f} registros/s, {resultado.processos} processos)")
+    for etapa in (resultado.leitura, resultado.validacao, resultado.gravacao):
+        print(f"  {etapa}")
+    if resultado.duplicados:
+        acao = 'atualizados' if args.duplicados == 'atualizar' else 'ignorados'
+        print(f"Livros já cadastrados ({acao}): {resultado.duplicados}")
+    if resultado.rejeitados:
+        destino = f" (em {args.rejeitados})" if args.rejeitados else ''
+        print(f"Registros rejeitados: {resultado.rejeitados}{destino}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
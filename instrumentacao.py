@@ -0,0 +1,237 @@
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+# Limites superiores (em segundos) das faixas dos histogramas; a última faixa é aberta
+LIMITES_HISTOGRAMA = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                      0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def forma_parametros(parametros) -> str:
+    """
+    Descreve os parâmetros de uma consulta pelos tipos, sem os valores
+    Ex.: '(str, int)', '500×int' (listas longas do mesmo tipo) ou '{chave: str}'.
+    """
+    if parametros is None:
+        return '()'
+    if isinstance(parametros, dict):
+        return '{' + ', '.join(f'{chave}: {type(valor).__name__}'
+                               for chave, valor in parametros.items()) + '}'
+    if not isinstance(parametros, (list, tuple)):
+        return 'lote'  # iterável de executemany: inspecionar o consumiria
+    tipos = [type(valor).__name__ for valor in parametros]
+    if len(tipos) > 3 and len(set(tipos)) == 1:
+        return f'{len(tipos)}×{tipos[0]}'
+    return '(' + ', '.join(tipos) + ')'
+
+
+class EventoConsulta:
+    """
+    Execução de um comando SQL pelo DatabaseManager
+    linhas é o número de linhas lidas (consultas) ou alteradas (escritas), None se
+    desconhecido; conexao_reutilizada indica se a conexão já estava aberta (pool ou
+    transação em andamento); plano traz o EXPLAIN QUERY PLAN das consultas lentas.
+    """
+
+    __slots__ = ('operacao', 'sql', 'parametros', 'linhas', 'segundos', 'conexao_reutilizada',
+                 'erro', 'plano')
+
+    def __init__(self, operacao: str, sql: str, parametros: str, linhas: Optional[int],
+                 segundos: float, conexao_reutilizada: Optional[bool],
+                 erro: Optional[str] = None):
+        self.operacao = operacao
+        self.sql = sql
+        self.parametros = parametros
+        self.linhas = linhas
+        self.segundos = segundos
+        self.conexao_reutilizada = conexao_reutilizada
+        self.erro = erro
+        self.plano: Optional[List[str]] = None
+
+    def to_dict(self) -> dict:
+        return {nome: getattr(self, nome) for nome in self.__slots__}
+
+    def __str__(self):
+        return f"EventoConsulta({self.operacao}, {self.segundos * 1000:.2f} ms, linhas={self.linhas})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class Histograma:
+    """Histograma de durações em faixas fixas, com contagem, soma, mínimo e máximo"""
+
+    def __init__(self, limites: Sequence[float] = LIMITES_HISTOGRAMA):
+        self.limites = tuple(limites)
+        self.faixas = [0] * (len(self.limites) + 1)
+        self.contagem = 0
+        self.soma = 0.0
+        self.minimo: Optional[float] = None
+        self.maximo: Optional[float] = None
+
+    def registrar(self, segundos: float):
+        self.faixas[bisect_left(self.limites, segundos)] += 1
+        self.contagem += 1
+        self.soma += segundos
+        if self.minimo is None or segundos < self.minimo:
+            self.minimo = segundos
+        if self.maximo is None or segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, fracao: float) -> Optional[float]:
+        """
+        Estimativa do percentil: limite superior da faixa onde ele cai, limitado ao máximo
+        Ex.: percentil(0.95) é o p95.
+        """
+        if not self.contagem:
+            return None
+        alvo = max(1, int(fracao * self.contagem + 0.999999))
+        acumulado = 0
+        for indice, quantidade in enumerate(self.faixas):
+            acumulado += quantidade
+            if acumulado >= alvo:
+                limite = self.limites[indice] if indice < len(self.limites) else self.maximo
+                return min(limite, self.maximo)
+        return self.maximo
+
+    def resumo(self) -> dict:
+        return {
+            'contagem': self.contagem,
+            'soma': self.soma,
+            'media': self.soma / self.contagem if self.contagem else None,
+            'minimo': self.minimo,
+            'maximo': self.maximo,
+            'p50': self.percentil(0.50),
+            'p95': self.percentil(0.95),
+            'p99': self.percentil(0.99),
+            'faixas': [(limite, quantidade) for limite, quantidade
+                       in zip(self.limites + (None,), self.faixas) if quantidade],
+        }
+
+    def __str__(self):
+        return f"Histograma(contagem={self.contagem})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class Instrumentacao:
+    """
+    Coleta os tempos das consultas de um DatabaseManager
+    Mantém, por operação, um histograma de durações e contadores de chamadas, erros,
+    linhas e conexões reutilizadas (veja instantaneo()). Execuções que levam limiar_lento
+    segundos ou mais vão para o registro de consultas lentas, com o EXPLAIN QUERY PLAN,
+    limitado às max_lentas mais recentes (limiar_lento=None desativa o registro).
+    Observadores recebem cada EventoConsulta na thread que executou a consulta.
+    """
+
+    def __init__(self, limiar_lento: Optional[float] = 0.1, max_lentas: int = 100):
+        self.limiar_lento = limiar_lento
+        self._lentas = deque(maxlen=max_lentas)
+        self._operacoes: Dict[str, dict] = {}
+        self._observadores: List[Callable[[EventoConsulta], None]] = []
+        self._lock = threading.Lock()
+        self.iniciada_em = time.time()
+
+    def adicionar_observador(self, observador: Callable[[EventoConsulta], None]):
+        """Registra uma função chamada com cada EventoConsulta"""
+        self._observadores.append(observador)
+
+    def remover_observador(self, observador: Callable[[EventoConsulta], None]):
+        """Cancela o registro de um observador"""
+        if observador in self._observadores:
+            self._observadores.remove(observador)
+
+    def lenta(self, segundos: float) -> bool:
+        return self.limiar_lento is not None and segundos >= self.limiar_lento
+
+    def registrar(self, evento: EventoConsulta, conn: Optional[sqlite3.Connection] = None,
+                  parametros=None):
+        """
+        Contabiliza uma execução; se for lenta e conn for informada, captura o plano
+        da consulta com os mesmos parâmetros
+        """
+        if self.lenta(evento.segundos) and conn is not None:
+            evento.plano = planejar(conn, evento.sql, parametros)
+
+        with self._lock:
+            dados = self._operacoes.get(evento.operacao)
+            if dados is None:
+                dados = self._operacoes[evento.operacao] = {
+                    'histograma': Histograma(), 'erros': 0, 'linhas': 0,
+                    'reutilizadas': 0, 'novas': 0,
+                }
+            dados['histograma'].registrar(evento.segundos)
+            if evento.erro is not None:
+                dados['erros'] += 1
+            if evento.linhas is not None:
+                dados['linhas'] += evento.linhas
+            if evento.conexao_reutilizada is not None:
+                dados['reutilizadas' if evento.conexao_reutilizada else 'novas'] += 1
+            if self.lenta(evento.segundos):
+                self._lentas.append(evento)
+
+        for observador in list(self._observadores):
+            observador(evento)
+
+    def instantaneo(self) -> Dict[str, dict]:
+        """
+        Cópia dos números coletados, por operação: contagem, soma, média, mínimo,
+        máximo, p50, p95 e p99 (em segundos), faixas do histograma, erros, linhas e
+        conexões reutilizadas/novas
+        """
+        with self._lock:
+            return {
+                operacao: dict(dados['histograma'].resumo(), erros=dados['erros'],
+                               linhas=dados['linhas'], reutilizadas=dados['reutilizadas'],
+                               novas=dados['novas'])
+                for operacao, dados in sorted(self._operacoes.items())
+            }
+
+    def consultas_lentas(self) -> List[EventoConsulta]:
+        """Consultas lentas registradas, da mais antiga para a mais recente"""
+        with self._lock:
+            return list(self._lentas)
+
+    def zerar(self):
+        """Descarta os números e as consultas lentas coletados até agora"""
+        with self._lock:
+            self._operacoes.clear()
+            self._lentas.clear()
+            self.iniciada_em = time.time()
+
+    def relatorio(self) -> str:
+        """Tabela em texto com os números de cada operação, em milissegundos"""
+        linhas = [f"{'operação':<28}{'chamadas':>9}{'média':>9}{'p95':>9}{'máx':>9}"
+                  f"{'linhas':>10}{'erros':>7}"]
+        for operacao, dados in self.instantaneo().items():
+            linhas.append(
+                f"{operacao:<28}{dados['contagem']:>9}{dados['media'] * 1000:>9.2f}"
+                f"{dados['p95'] * 1000:>9.2f}{dados['maximo'] * 1000:>9.2f}"
+                f"{dados['linhas']:>10}{dados['erros']:>7}"
+            )
+        return '\n'.join(linhas)
+
+    def __str__(self):
+        return f"Instrumentacao(operacoes={len(self._operacoes)}, lentas={len(self._lentas)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def planejar(conn: sqlite3.Connection, sql: str, parametros=None) -> List[str]:
+    """
+    EXPLAIN QUERY PLAN da consulta, uma linha por passo do plano
+    Retorna lista vazia para comandos sem plano (PRAGMA, BEGIN) ou se não for possível
+    montá-lo (ex.: parâmetros de executemany).
+    """
+    if not isinstance(parametros, (tuple, list, dict)):
+        parametros = ()
+    try:
+        return [linha[3] for linha in conn.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)]
+    except sqlite3.Error:
+        return []
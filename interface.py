@@ -1,31 +1,108 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox
 from tkinter.ttk import Treeview
 from livro import Livro
-from database import DatabaseManager
+from database import VERSAO_INICIAL, ConflitoVersao, DatabaseManager, LivroDuplicado
+from instrumentacao import Instrumentacao
+from lista_virtual import FonteCatalogo, FonteFiltro, FonteLista, ListaVirtual
+from agendador_busca import AgendadorBusca
+from tarefas import DespachanteTarefas
+from texto import corresponde_prefixos
+
+
+# Opções da caixa de busca -> coluna pesquisada
+CAMPOS_BUSCA = {
+    'Título': 'titulo',
+    'Autor': 'autor',
+    'Título (aproximado)': 'titulo',
+    'Autor (aproximado)': 'autor',
+}
+BUSCAS_APROXIMADAS = ('Título (aproximado)', 'Autor (aproximado)')
+LIMITE_BUSCA_APROXIMADA = 100
+INTERVALO_TEMPOS_MS = 250
 
 
 class CatalogoInterface:
-    """Interface gráfica para o catálogo de livros"""
+    """
+    Interface gráfica para o catálogo de livros
+    A janela é montada sem acessar o banco: a verificação do esquema e a primeira página
+    rodam na thread de trabalho assim que o mainloop começa (veja iniciar_catalogo).
+    perfil_inicio, se informado, recebe marcar(etapa) ao fim de cada uma e concluir()
+    quando a primeira página é exibida.
+    """
     
-    def __init__(self, root):
+    def __init__(self, root, perfil_inicio=None):
         self.root = root
         self.root.title("Catálogo de Livros")
         self.root.geometry("900x700")
         self.root.resizable(True, True)
         
         try:
-            self.db_manager = DatabaseManager()
+            self.instrumentacao = Instrumentacao()
+            # O esquema é conferido em segundo plano, por iniciar_catalogo
+            self.db_manager = DatabaseManager(instrumentacao=self.instrumentacao,
+                                              verificar_esquema=False)
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao inicializar banco de dados: {e}")
             self.root.destroy()
             return
         
+        self.total_livros = 0
+        self.livro_selecionado = None
+        self.filtros_selecionados = {'genero': None, 'editora': None, 'decada': None}
+        self._rotulos_facetas = {}
+        self._filtro_pendente = None
+        self._busca_aproximada = None
+        self._ultimo_evento = None
+        self._exibindo_tempos = None
+        self.perfil_inicio = perfil_inicio
+        # Chamado na thread de trabalho: só guarda o evento, exibido por _exibir_tempos
+        self.instrumentacao.adicionar_observador(self._registrar_evento)
+        
+        # Operações de banco rodam fora da thread da interface, uma de cada vez
+        self.despachante = DespachanteTarefas(self.root, ao_mudar_ocupado=self.indicar_ocupado,
+                                              interromper=self.db_manager.interromper)
+        
         self.configurar_estilo()
         
         self.criar_interface()
         
-        self.atualizar_lista()
+        self.atualizar_status("Abrindo catálogo...")
+        self.root.after_idle(self.iniciar_catalogo)
+    
+    def iniciar_catalogo(self):
+        """
+        Confere o esquema do banco (aplicando migrações pendentes) e depois carrega a
+        primeira página, ambos na thread de trabalho; operações pedidas pelo usuário
+        enquanto isso ficam na fila do despachante, atrás da verificação
+        O perfil da inicialização é concluído na primeira lista exibida (a do catálogo
+        ou outra que a tenha substituído), no primeiro erro ou ao fechar, o que vier antes.
+        """
+        def verificar():
+            self.db_manager.criar_tabela()
+            self._marcar_inicio('verificar esquema')
+        
+        self.despachante.executar(
+            verificar, ao_concluir=lambda _: self.atualizar_lista(),
+            ao_falhar=self._erro_abertura, descricao="Abrindo catálogo", cancelavel=False
+        )
+    
+    def _marcar_inicio(self, etapa):
+        if self.perfil_inicio is not None:
+            self.perfil_inicio.marcar(etapa)
+    
+    def _concluir_inicio(self, etapa):
+        """Marca a última etapa da inicialização e imprime o perfil, só na primeira vez"""
+        perfil, self.perfil_inicio = self.perfil_inicio, None
+        if perfil is not None:
+            perfil.marcar(etapa)
+            perfil.concluir()
+    
+    def _erro_abertura(self, erro):
+        self._concluir_inicio('erro na abertura')
+        messagebox.showerror("Erro", f"Erro ao inicializar banco de dados: {erro}")
+        self.fechar()
+        self.root.destroy()
     
     def configurar_estilo(self):
         """Configura o estilo da interface"""
@@ -56,6 +133,8 @@ class CatalogoInterface:
         self.criar_frame_lista(main_frame)
         
         self.criar_frame_busca(main_frame)
+        
+        self.criar_frame_filtros(main_frame)
 
         self.criar_barra_status(main_frame)
     
@@ -122,21 +201,13 @@ class CatalogoInterface:
         frame_lista.grid_columnconfigure(0, weight=1)
         
         colunas = ('Código', 'Título', 'Autor', 'Gênero', 'Editora', 'Ano')
-        self.tree = ttk.Treeview(frame_lista, columns=colunas, show='headings', height=15)
-        
-        for col in colunas:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=100)
-        
-        scrollbar_v = ttk.Scrollbar(frame_lista, orient=tk.VERTICAL, command=self.tree.yview)
-        scrollbar_h = ttk.Scrollbar(frame_lista, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=scrollbar_v.set, xscrollcommand=scrollbar_h.set)
-
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar_v.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        scrollbar_h.grid(row=1, column=0, sticky=(tk.W, tk.E))
-
-        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        # As janelas da lista que não estão em memória são lidas na thread de trabalho
+        self.lista = ListaVirtual(
+            frame_lista, colunas, ao_selecionar=self.on_select, despachante=self.despachante,
+            ao_falhar=lambda erro: self.atualizar_status(f"Erro ao carregar a lista: {erro}")
+        )
+        self.lista.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.tree = self.lista.tree
     
     def criar_frame_busca(self, parent):
         """Cria o frame de busca"""
@@ -147,7 +218,7 @@ class CatalogoInterface:
 
         ttk.Label(frame_busca, text="Buscar por:").grid(row=0, column=0, sticky=tk.W)
 
-        self.combo_busca = ttk.Combobox(frame_busca, values=['Título', 'Autor'], state='readonly')
+        self.combo_busca = ttk.Combobox(frame_busca, values=list(CAMPOS_BUSCA), state='readonly')
         self.combo_busca.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 0))
         self.combo_busca.set('Título')
 
@@ -156,22 +227,122 @@ class CatalogoInterface:
         self.entry_busca.grid(row=0, column=2, sticky=(tk.W, tk.E), padx=(5, 0))
 
         ttk.Button(frame_busca, text="Buscar", command=self.buscar_livros).grid(row=0, column=3, padx=(5, 0))
-        ttk.Button(frame_busca, text="Mostrar Todos", command=self.atualizar_lista).grid(row=0, column=4, padx=(5, 0))
+        ttk.Button(frame_busca, text="Mostrar Todos", command=self.mostrar_todos).grid(row=0, column=4, padx=(5, 0))
 
+        self.agendador_busca = AgendadorBusca(
+            self.root, self.executar_busca, self.exibir_resultado_busca, self.erro_busca,
+            filtrar=self.filtrar_busca,
+            despachante=self.despachante, grupo='lista'
+        )
         self.var_busca.trace('w', self.buscar_automatico)
     
+    def criar_frame_filtros(self, parent):
+        """Cria o frame de filtros por gênero, editora e década, com as contagens de cada um"""
+        frame_filtros = ttk.LabelFrame(parent, text="Filtros", padding="10")
+        frame_filtros.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        self.combos_filtro = {}
+        for coluna, (faceta, rotulo) in enumerate((('genero', 'Gênero:'), ('editora', 'Editora:'),
+                                                   ('decada', 'Década:'))):
+            ttk.Label(frame_filtros, text=rotulo).grid(row=0, column=coluna * 2, sticky=tk.W,
+                                                       padx=(10 if coluna else 0, 0))
+            combo = ttk.Combobox(frame_filtros, values=['Todos'], state='readonly')
+            combo.grid(row=0, column=coluna * 2 + 1, sticky=(tk.W, tk.E), padx=(5, 0))
+            combo.set('Todos')
+            combo.bind('<<ComboboxSelected>>', lambda event, faceta=faceta: self.selecionar_filtro(faceta))
+            frame_filtros.grid_columnconfigure(coluna * 2 + 1, weight=1)
+            self.combos_filtro[faceta] = combo
+        
+        ttk.Button(frame_filtros, text="Limpar Filtros", command=self.limpar_filtros).grid(
+            row=0, column=6, padx=(10, 0))
+    
     def criar_barra_status(self, parent):
         """Cria a barra de status"""
         self.status_var = tk.StringVar()
         self.status_var.set("Pronto")
         
-        status_bar = ttk.Label(parent, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        frame_status = ttk.Frame(parent)
+        frame_status.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        frame_status.grid_columnconfigure(0, weight=1)
+        
+        status_bar = ttk.Label(frame_status, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
+        status_bar.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        
+        # Exibidos só enquanto há operações de banco em andamento
+        self.barra_progresso = ttk.Progressbar(frame_status, mode='indeterminate', length=120)
+        self.botao_cancelar = ttk.Button(frame_status, text="Cancelar", command=self.cancelar_operacoes)
+        
+        # Tempo da última consulta ao banco, exibido sob demanda
+        self.var_tempos = tk.BooleanVar(value=False)
+        self.tempos_var = tk.StringVar()
+        ttk.Checkbutton(frame_status, text="Tempos", variable=self.var_tempos,
+                        command=self.alternar_tempos).grid(row=0, column=3, padx=(5, 0))
+        self.label_tempos = ttk.Label(frame_status, textvariable=self.tempos_var,
+                                      relief=tk.SUNKEN, anchor=tk.W, width=42)
     
     def atualizar_status(self, mensagem):
         """Atualiza a barra de status"""
         self.status_var.set(mensagem)
-        self.root.update_idletasks()
+    
+    def indicar_ocupado(self, ocupado, descricao):
+        """Mostra (ou esconde) o progresso e o botão Cancelar enquanto o banco trabalha"""
+        if ocupado:
+            if descricao:
+                self.atualizar_status(f"{descricao}...")
+            self.barra_progresso.grid(row=0, column=1, padx=(5, 0))
+            self.barra_progresso.start(10)
+            self.botao_cancelar.grid(row=0, column=2, padx=(5, 0))
+            self.root.configure(cursor='watch')
+        else:
+            self.barra_progresso.stop()
+            self.barra_progresso.grid_remove()
+            self.botao_cancelar.grid_remove()
+            self.root.configure(cursor='')
+    
+    def _registrar_evento(self, evento):
+        self._ultimo_evento = evento
+    
+    def alternar_tempos(self):
+        """Mostra (ou esconde) na barra de status o tempo da última consulta ao banco"""
+        if self.var_tempos.get():
+            self.label_tempos.grid(row=0, column=4, padx=(5, 0))
+            self._exibir_tempos()
+        else:
+            if self._exibindo_tempos is not None:
+                self.root.after_cancel(self._exibindo_tempos)
+                self._exibindo_tempos = None
+            self.label_tempos.grid_remove()
+    
+    def _exibir_tempos(self):
+        evento = self._ultimo_evento
+        if evento is None:
+            self.tempos_var.set("Nenhuma consulta ainda")
+        else:
+            p95 = self.instrumentacao.instantaneo().get(evento.operacao, {}).get('p95')
+            texto = f"{evento.operacao}: {evento.segundos * 1000:.1f} ms"
+            if evento.linhas is not None:
+                texto += f", {evento.linhas} linhas"
+            if p95 is not None:
+                texto += f" (p95 {p95 * 1000:.1f} ms)"
+            self.tempos_var.set(texto)
+        self._exibindo_tempos = self.root.after(INTERVALO_TEMPOS_MS, self._exibir_tempos)
+    
+    def cancelar_operacoes(self):
+        """Cancela as leituras em andamento; gravações já enviadas não são desfeitas"""
+        self.agendador_busca.cancelar()
+        if self.despachante.cancelar_todas():
+            self.atualizar_status("Operação cancelada")
+    
+    def fechar(self):
+        """Descarta as leituras pendentes, espera as gravações em andamento e fecha o banco"""
+        self._concluir_inicio('fechar')
+        if self._exibindo_tempos is not None:
+            self.root.after_cancel(self._exibindo_tempos)
+            self._exibindo_tempos = None
+        self.agendador_busca.fechar()
+        self.despachante.fechar()
+        self.despachante.aguardar(timeout=10)
+        self.db_manager.fechar()
     
     def validar_campos(self):
         """Valida os campos de entrada"""
@@ -210,46 +381,79 @@ class CatalogoInterface:
         return livro
     
     def adicionar_livro(self):
-        """Adiciona um novo livro"""
+        """Adiciona um novo livro (a gravação roda fora da thread da interface)"""
         try:
             livro = self.criar_livro_from_campos()
-            codigo = self.db_manager.criar_livro(livro)
-            
-            self.atualizar_lista()
-            self.limpar_campos()
-            self.atualizar_status(f"Livro adicionado com sucesso! Código: {codigo}")
-            messagebox.showinfo("Sucesso", f"Livro adicionado com código {codigo}")
-            
         except ValueError as e:
             messagebox.showerror("Erro de Validação", str(e))
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao adicionar livro: {e}")
+            return
+        
+        self.despachante.executar(
+            lambda: self.db_manager.criar_livro(livro),
+            ao_concluir=lambda codigo: self._livro_adicionado(livro, codigo),
+            ao_falhar=lambda erro: self._erro_gravacao(erro, "Erro ao adicionar livro"),
+            descricao="Adicionando livro", cancelavel=False
+        )
+    
+    def _livro_adicionado(self, livro, codigo):
+        livro.codigo = codigo
+        livro.versao = VERSAO_INICIAL
+        
+        # Resultados de busca só mudam ao buscar de novo
+        if isinstance(self.lista.fonte, FonteCatalogo):
+            self.lista.inserir_livro(livro)
+        elif isinstance(self.lista.fonte, FonteFiltro):
+            self.recarregar_lista()
+        self.total_livros += 1
+        self.agendador_busca.invalidar()
+        self.atualizar_facetas()
+        self.limpar_campos()
+        self.atualizar_status(
+            f"Livro adicionado com sucesso! Código: {codigo} | Total de livros: {self.total_livros}"
+        )
+        messagebox.showinfo("Sucesso", f"Livro adicionado com código {codigo}")
     
     def atualizar_livro(self):
-        """Atualiza um livro existente"""
+        """Atualiza um livro existente (a gravação roda fora da thread da interface)"""
         if not self.var_codigo.get():
             messagebox.showwarning("Aviso", "Selecione um livro para atualizar")
             return
         
         try:
             livro = self.criar_livro_from_campos()
-            sucesso = self.db_manager.atualizar_livro(livro)
-            
-            if sucesso:
-                self.atualizar_lista()
-                self.limpar_campos()
-                self.atualizar_status("Livro atualizado com sucesso!")
-                messagebox.showinfo("Sucesso", "Livro atualizado com sucesso!")
-            else:
-                messagebox.showerror("Erro", "Livro não encontrado para atualização")
-                
         except ValueError as e:
             messagebox.showerror("Erro de Validação", str(e))
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao atualizar livro: {e}")
+            return
+        
+        anterior = self.livro_selecionado
+        # Com a versão lida, a gravação falha se outro usuário alterou o livro nesse meio tempo
+        if anterior is not None and anterior.codigo == livro.codigo:
+            livro.versao = anterior.versao
+        self.despachante.executar(
+            lambda: self.db_manager.atualizar_livro(livro),
+            ao_concluir=lambda sucesso: self._livro_atualizado(anterior, livro, sucesso),
+            ao_falhar=lambda erro: self._erro_gravacao(erro, "Erro ao atualizar livro"),
+            descricao="Atualizando livro", cancelavel=False
+        )
+    
+    def _livro_atualizado(self, anterior, livro, sucesso):
+        if not sucesso:
+            messagebox.showerror("Erro", "Livro não encontrado para atualização")
+            return
+        
+        if anterior is not None and anterior.codigo == livro.codigo \
+                and not isinstance(self.lista.fonte, FonteFiltro):
+            self.lista.atualizar_livro(anterior, livro)
+        else:
+            self.recarregar_lista()
+        self.agendador_busca.invalidar()
+        self.atualizar_facetas()
+        self.limpar_campos()
+        self.atualizar_status("Livro atualizado com sucesso!")
+        messagebox.showinfo("Sucesso", "Livro atualizado com sucesso!")
     
     def deletar_livro(self):
-        """Deleta um livro"""
+        """Deleta um livro (a exclusão roda fora da thread da interface)"""
         if not self.var_codigo.get():
             messagebox.showwarning("Aviso", "Selecione um livro para deletar")
             return
@@ -260,18 +464,79 @@ class CatalogoInterface:
         
         try:
             codigo = int(self.var_codigo.get())
-            sucesso = self.db_manager.deletar_livro(codigo)
-            
-            if sucesso:
-                self.atualizar_lista()
-                self.limpar_campos()
-                self.atualizar_status("Livro deletado com sucesso!")
-                messagebox.showinfo("Sucesso", "Livro deletado com sucesso!")
-            else:
-                messagebox.showerror("Erro", "Livro não encontrado para exclusão")
-                
-        except Exception as e:
+        except ValueError as e:
             messagebox.showerror("Erro", f"Erro ao deletar livro: {e}")
+            return
+        
+        anterior = self.livro_selecionado
+        versao = anterior.versao if anterior is not None and anterior.codigo == codigo else None
+        self.despachante.executar(
+            lambda: self.db_manager.deletar_livro(codigo, versao),
+            ao_concluir=lambda sucesso: self._livro_deletado(anterior, codigo, sucesso),
+            ao_falhar=lambda erro: self._erro_gravacao(erro, "Erro ao deletar livro"),
+            descricao="Deletando livro", cancelavel=False
+        )
+    
+    def _livro_deletado(self, anterior, codigo, sucesso):
+        if not sucesso:
+            messagebox.showerror("Erro", "Livro não encontrado para exclusão")
+            return
+        
+        if anterior is not None and anterior.codigo == codigo \
+                and not isinstance(self.lista.fonte, FonteFiltro):
+            self.lista.remover_livro(anterior)
+        else:
+            self.recarregar_lista()
+        self.total_livros = max(self.total_livros - 1, 0)
+        self.agendador_busca.invalidar()
+        self.atualizar_facetas()
+        self.limpar_campos()
+        self.atualizar_status(f"Livro deletado com sucesso! | Total de livros: {self.total_livros}")
+        messagebox.showinfo("Sucesso", "Livro deletado com sucesso!")
+    
+    def _erro_gravacao(self, erro, mensagem):
+        """Exibe o erro de uma gravação, separando os de validação, conflitos de versão e duplicatas"""
+        if isinstance(erro, ConflitoVersao):
+            self._conflito_versao(erro)
+        elif isinstance(erro, LivroDuplicado):
+            messagebox.showwarning(
+                "Livro Duplicado",
+                f"Este livro já está cadastrado com o código {erro.codigo_existente}."
+            )
+        elif isinstance(erro, ValueError):
+            messagebox.showerror("Erro de Validação", str(erro))
+        else:
+            messagebox.showerror("Erro", f"{mensagem}: {erro}")
+    
+    def _conflito_versao(self, erro):
+        """Avisa que o livro mudou desde a seleção e exibe na lista a versão atual dele"""
+        anterior = self.livro_selecionado
+        messagebox.showwarning(
+            "Conflito",
+            "Este livro foi alterado por outro usuário depois de selecionado. "
+            "Selecione-o novamente para ver os dados atuais antes de alterá-lo."
+        )
+        self.limpar_campos()
+        self.despachante.executar(
+            lambda: self.db_manager.buscar_livro_por_codigo(erro.codigo),
+            ao_concluir=lambda atual: self._livro_recarregado(anterior, erro.codigo, atual),
+            ao_falhar=lambda e: self._erro_gravacao(e, "Erro ao recarregar livro"),
+            descricao="Recarregando livro"
+        )
+    
+    def _livro_recarregado(self, anterior, codigo, atual):
+        if atual is None:
+            self.total_livros = max(self.total_livros - 1, 0)
+        if anterior is not None and anterior.codigo == codigo \
+                and not isinstance(self.lista.fonte, FonteFiltro):
+            if atual is not None:
+                self.lista.atualizar_livro(anterior, atual)
+            else:
+                self.lista.remover_livro(anterior)
+        else:
+            self.recarregar_lista()
+        self.agendador_busca.invalidar()
+        self.atualizar_facetas()
     
     def limpar_campos(self):
         """Limpa todos os campos de entrada"""
@@ -283,78 +548,223 @@ class CatalogoInterface:
         self.var_ano.set("")
         
         self.entry_codigo.config(state='readonly')
+        self.livro_selecionado = None
+        self.lista.limpar_selecao()
     
     def atualizar_lista(self):
-        """Atualiza a lista de livros"""
-        try:
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            livros = self.db_manager.listar_livros()
-            
-            for livro in livros:
-                self.tree.insert('', 'end', values=(
-                    livro.codigo,
-                    livro.titulo,
-                    livro.autor,
-                    livro.genero,
-                    livro.editora,
-                    livro.ano_publicacao
-                ))
-            
-            total = len(livros)
-            self.atualizar_status(f"Total de livros: {total}")
-            
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao carregar livros: {e}")
-    
-    def on_select(self, event):
-        """Manipula a seleção de um item na lista"""
-        selection = self.tree.selection()
-        if selection:
-            item = self.tree.item(selection[0])
-            values = item['values']
-            
-            self.var_codigo.set(values[0])
-            self.var_titulo.set(values[1])
-            self.var_autor.set(values[2])
-            self.var_genero.set(values[3])
-            self.var_editora.set(values[4])
-            self.var_ano.set(values[5])
+        """Atualiza a lista de livros (a leitura roda fora da thread da interface)"""
+        def exibir(fonte):
+            self.total_livros = self.lista.total
+            self.atualizar_facetas()
+            self.atualizar_status(f"Total de livros: {self.total_livros}")
+        
+        self._carregar_fonte(FonteCatalogo(self.db_manager), 0, exibir,
+                             "Carregando livros", "Erro ao carregar livros")
+    
+    def recarregar_lista(self):
+        """Relê a lista exibida mantendo a posição, após alterações no catálogo"""
+        fonte = self.lista.fonte
+        if isinstance(fonte, FonteCatalogo):
+            nova = FonteCatalogo(self.db_manager)
+        elif isinstance(fonte, FonteFiltro):
+            nova = FonteFiltro(self.db_manager, **fonte.filtros)
+        else:
+            self.lista.recarregar()  # resultado de busca, já em memória
+            return
+        
+        def exibir(fonte):
+            if isinstance(fonte, FonteFiltro):
+                self.atualizar_facetas(fonte.resultado)
+        
+        self._carregar_fonte(nova, self.lista.topo, exibir,
+                             "Recarregando livros", "Erro ao carregar livros")
+    
+    def _carregar_fonte(self, fonte, topo, ao_exibir, descricao, mensagem_erro):
+        """
+        Conta os livros da fonte e lê a janela visível na thread de trabalho, depois a
+        exibe na lista; uma carga nova cancela a anterior que ainda não terminou
+        """
+        visiveis = self.lista.visiveis
+        
+        def preparar():
+            total = fonte.contar()
+            inicio = max(0, min(topo, total - visiveis))
+            if total:
+                fonte.janela(inicio, visiveis)
+            return total, inicio
+        
+        def exibir(resultado):
+            total, inicio = resultado
+            self.lista.exibir(fonte, total, inicio)
+            self._concluir_inicio('primeira página')
+            ao_exibir(fonte)
+        
+        def falhar(erro):
+            self._concluir_inicio('erro na primeira página')
+            messagebox.showerror("Erro", f"{mensagem_erro}: {erro}")
+        
+        self.despachante.executar(
+            preparar, ao_concluir=exibir, ao_falhar=falhar, descricao=descricao, grupo='lista'
+        )
+    
+    def mostrar_todos(self):
+        """Descarta a busca em andamento e os filtros e volta a exibir o catálogo completo"""
+        self.agendador_busca.cancelar()
+        for faceta in self.filtros_selecionados:
+            self.filtros_selecionados[faceta] = None
+        self.atualizar_lista()
+    
+    def filtros_ativos(self):
+        """Retorna os filtros escolhidos no formato de DatabaseManager.filtrar"""
+        filtros = {'genero': self.filtros_selecionados['genero'],
+                   'editora': self.filtros_selecionados['editora']}
+        decada = self.filtros_selecionados['decada']
+        if decada is not None:
+            filtros['ano_min'], filtros['ano_max'] = decada, decada + 9
+        return {chave: valor for chave, valor in filtros.items() if valor is not None}
+    
+    def selecionar_filtro(self, faceta):
+        """Guarda o valor escolhido em um dos filtros e atualiza a lista"""
+        rotulo = self.combos_filtro[faceta].get()
+        self.filtros_selecionados[faceta] = self._rotulos_facetas.get(faceta, {}).get(rotulo)
+        self.aplicar_filtros()
+    
+    def limpar_filtros(self):
+        """Remove todos os filtros e volta a exibir o catálogo (ou a busca atual)"""
+        for faceta in self.filtros_selecionados:
+            self.filtros_selecionados[faceta] = None
+        self.aplicar_filtros()
+    
+    def aplicar_filtros(self):
+        """Exibe os livros que atendem aos filtros e ao termo de busca, com as contagens"""
+        self._filtro_pendente = None
+        filtros = self.filtros_ativos()
+        termo_busca = self.var_busca.get().strip()
+        if not filtros:
+            if termo_busca:
+                self.buscar_livros()
+                self.atualizar_facetas()
+            else:
+                self.atualizar_lista()
+            return
+        
+        self.agendador_busca.cancelar()
+        campos = [CAMPOS_BUSCA[self.combo_busca.get()]]
+        fonte = FonteFiltro(self.db_manager, termo=termo_busca or None, campos=campos, **filtros)
+        
+        def exibir(fonte):
+            self.atualizar_facetas(fonte.resultado)
+            self.atualizar_status(f"Filtrados {self.lista.total} livro(s)")
+        
+        self._carregar_fonte(fonte, 0, exibir, "Filtrando livros", "Erro ao filtrar livros")
+    
+    def atualizar_facetas(self, resultado=None):
+        """
+        Preenche os filtros com os valores existentes e a quantidade de livros de cada um
+        Sem resultado, as contagens do catálogo são lidas na thread de trabalho.
+        """
+        if resultado is None:
+            if self.filtros_ativos() and isinstance(self.lista.fonte, FonteFiltro):
+                resultado = self.lista.fonte.resultado
+            else:
+                self.despachante.executar(
+                    lambda: self.db_manager.filtrar(limite=0), ao_concluir=self.atualizar_facetas,
+                    ao_falhar=lambda erro: self.atualizar_status(f"Erro ao contar filtros: {erro}"),
+                    descricao="Contando filtros", grupo='facetas'
+                )
+                return
+        
+        for faceta, combo in self.combos_filtro.items():
+            rotulos = {'Todos': None}
+            selecionado = 'Todos'
+            for valor, quantidade in resultado.facetas[faceta]:
+                nome = f"{valor}–{valor + 9}" if faceta == 'decada' else valor
+                rotulo = f"{nome} ({quantidade})"
+                rotulos[rotulo] = valor
+                if valor == self.filtros_selecionados[faceta]:
+                    selecionado = rotulo
+            if selecionado == 'Todos' and self.filtros_selecionados[faceta] is not None:
+                # Valor escolhido sem nenhum livro após os outros filtros
+                valor = self.filtros_selecionados[faceta]
+                nome = f"{valor}–{valor + 9}" if faceta == 'decada' else valor
+                selecionado = f"{nome} (0)"
+                rotulos[selecionado] = valor
+            self._rotulos_facetas[faceta] = rotulos
+            combo.configure(values=list(rotulos))
+            combo.set(selecionado)
+    
+    def on_select(self, livro):
+        """Preenche os campos com o livro selecionado na lista"""
+        self.livro_selecionado = livro
+        self.var_codigo.set(livro.codigo)
+        self.var_titulo.set(livro.titulo)
+        self.var_autor.set(livro.autor)
+        self.var_genero.set(livro.genero)
+        self.var_editora.set(livro.editora)
+        self.var_ano.set(livro.ano_publicacao)
     
     def buscar_livros(self):
         """Busca livros por título ou autor"""
+        if self.filtros_ativos():
+            self.aplicar_filtros()
+            return
+        
         termo_busca = self.var_busca.get().strip()
         if not termo_busca:
+            self.agendador_busca.cancelar()
             self.atualizar_lista()
             return
         
-        try:
-            tipo_busca = self.combo_busca.get()
-            
-            if tipo_busca == 'Título':
-                livros = self.db_manager.buscar_livros_por_titulo(termo_busca)
-            else:
-                livros = self.db_manager.buscar_livros_por_autor(termo_busca)
-            
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            for livro in livros:
-                self.tree.insert('', 'end', values=(
-                    livro.codigo,
-                    livro.titulo,
-                    livro.autor,
-                    livro.genero,
-                    livro.editora,
-                    livro.ano_publicacao
-                ))
-            
-            self.atualizar_status(f"Encontrados {len(livros)} livro(s) para '{termo_busca}'")
-            
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro na busca: {e}")
+        self.agendador_busca.buscar_agora(self.combo_busca.get(), termo_busca)
     
     def buscar_automatico(self, *args):
-        """Busca automática conforme o usuário digita"""
-        self.root.after(500, self.buscar_livros) 
\ No newline at end of file
+        """Busca automática conforme o usuário digita (só a última digitação é buscada)"""
+        if self.filtros_ativos():
+            # Com filtros, o termo entra na busca facetada, também só após a última digitação
+            if self._filtro_pendente is not None:
+                self.root.after_cancel(self._filtro_pendente)
+            self._filtro_pendente = self.root.after(self.agendador_busca.atraso_ms, self.aplicar_filtros)
+            return
+        
+        termo_busca = self.var_busca.get().strip()
+        if not termo_busca:
+            self.agendador_busca.cancelar()
+            self.atualizar_lista()
+            return
+        
+        self.agendador_busca.agendar(self.combo_busca.get(), termo_busca)
+    
+    def executar_busca(self, tipo_busca, termo_busca):
+        """Executa a consulta de busca (roda na thread de trabalho do despachante)"""
+        if tipo_busca in BUSCAS_APROXIMADAS:
+            if self._busca_aproximada is None:
+                # Criada (e importada) só no primeiro uso: a carga do índice lê o
+                # catálogo inteiro
+                from trigramas import BuscaAproximada
+                self._busca_aproximada = BuscaAproximada(self.db_manager)
+            resultados = self._busca_aproximada.buscar(termo_busca, CAMPOS_BUSCA[tipo_busca],
+                                                       limite=LIMITE_BUSCA_APROXIMADA)
+            return [livro for livro, _ in resultados]
+        if tipo_busca == 'Título':
+            return self.db_manager.buscar_livros_por_titulo(termo_busca)
+        return self.db_manager.buscar_livros_por_autor(termo_busca)
+    
+    def filtrar_busca(self, livros, tipo_busca, termo_busca):
+        """Refina em memória um resultado anterior quando o termo apenas foi estendido"""
+        if tipo_busca in BUSCAS_APROXIMADAS:
+            return None  # a similaridade muda com o termo: refaz a busca
+        if not self.db_manager.fts_disponivel:
+            return None  # a regra de prefixos é a da busca textual (FTS5)
+        campo = CAMPOS_BUSCA[tipo_busca]
+        return [livro for livro in livros
+                if corresponde_prefixos(getattr(livro, campo), termo_busca)]
+    
+    def exibir_resultado_busca(self, termo_busca, livros):
+        """Mostra o resultado de uma busca na lista"""
+        self.lista.definir_fonte(FonteLista(livros))
+        self._concluir_inicio('primeira página')
+        self.atualizar_status(f"Encontrados {len(livros)} livro(s) para '{termo_busca}'")
+    
+    def erro_busca(self, erro):
+        """Exibe um erro ocorrido durante a busca"""
+        messagebox.showerror("Erro", f"Erro na busca: {erro}")
@@ -0,0 +1,621 @@
+import tkinter as tk
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from tkinter import ttk
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+from livro import Livro
+
+
+def chave_ordenacao(livro: Livro) -> tuple:
+    """Chave da ordem de exibição da lista (a mesma da paginação do banco)"""
+    return (livro.titulo, livro.codigo)
+
+
+class FonteLista:
+    """Fonte de dados da lista virtual a partir de livros já carregados (ex.: resultado de busca)"""
+
+    def __init__(self, livros: Iterable[Livro]):
+        self.livros = list(livros)
+
+    def contar(self) -> int:
+        return len(self.livros)
+
+    def janela(self, inicio: int, limite: int) -> List[Livro]:
+        return self.livros[inicio:inicio + limite]
+
+    def em_memoria(self, inicio: int, limite: int) -> Optional[List[Livro]]:
+        return self.janela(inicio, limite)
+
+    def invalidar(self):
+        pass
+
+    def inserir(self, livro: Livro):
+        chaves = [chave_ordenacao(item) for item in self.livros]
+        self.livros.insert(bisect_left(chaves, chave_ordenacao(livro)), livro)
+
+    def substituir(self, livro: Livro):
+        for indice, item in enumerate(self.livros):
+            if item.codigo == livro.codigo:
+                self.livros[indice] = livro
+                return
+
+    def remover(self, codigo: int):
+        self.livros = [item for item in self.livros if item.codigo != codigo]
+
+
+class FontePaginada(ABC):
+    """
+    Base das fontes que leem do banco só a janela pedida, mais uma folga de cada lado
+    A leitura é dividida para não consultar o banco na thread da interface: preparar()
+    devolve uma função que lê a janela a partir de uma cópia do estado (na thread de
+    trabalho) e aplicar() guarda o resultado; em_memoria() nunca consulta o banco.
+    Rolagens curtas continuam a partir da janela atual por paginação (titulo, codigo);
+    saltos longos usam a posição absoluta.
+    """
+
+    def __init__(self, db_manager, folga: int = 100):
+        self.db_manager = db_manager
+        self.folga = folga
+        self._geracao = 0
+        self.invalidar()
+
+    def invalidar(self):
+        """Descarta a janela em memória (usar após alterações no catálogo)"""
+        self._geracao += 1
+        self._carregada = False
+        self._inicio = 0
+        self._livros: List[Livro] = []
+        self._chegou_ao_fim = False
+
+    def em_memoria(self, inicio: int, limite: int) -> Optional[List[Livro]]:
+        """Livros das posições [inicio, inicio + limite), ou None se não estão em memória"""
+        fim_cache = self._inicio + len(self._livros)
+        coberto = (self._carregada and self._inicio <= inicio
+                   and (inicio + limite <= fim_cache or self._chegou_ao_fim))
+        if not coberto:
+            return None
+        deslocamento = inicio - self._inicio
+        return self._livros[deslocamento:deslocamento + limite]
+
+    def janela(self, inicio: int, limite: int) -> List[Livro]:
+        """Retorna os livros das posições [inicio, inicio + limite), lendo do banco se preciso"""
+        livros = self.em_memoria(inicio, limite)
+        if livros is None:
+            self.aplicar(self.preparar(inicio, limite)())
+            livros = self.em_memoria(inicio, limite) or []
+        return livros
+
+    def preparar(self, inicio: int, limite: int) -> Callable[[], tuple]:
+        """
+        Função que busca no banco a janela pedida com folga, reaproveitando o que já está
+        em memória; pode rodar em outra thread, e o resultado vai para aplicar()
+        """
+        geracao = self._geracao
+        base = (self._inicio, list(self._livros) if self._carregada else [], self._chegou_ao_fim)
+        return lambda: (geracao, self._buscar(inicio, limite, *base))
+
+    def aplicar(self, resultado: tuple) -> bool:
+        """
+        Guarda a janela lida por preparar(); retorna False (e a descarta) se a janela em
+        memória mudou desde o preparo
+        """
+        geracao, (inicio, livros, chegou_ao_fim) = resultado
+        if geracao != self._geracao:
+            return False
+        self._geracao += 1
+        self._carregada = True
+        self._inicio, self._livros, self._chegou_ao_fim = inicio, livros, chegou_ao_fim
+        return True
+
+    def _buscar(self, inicio: int, limite: int, base_inicio: int, livros: List[Livro],
+                chegou_ao_fim: bool) -> Tuple[int, List[Livro], bool]:
+        """Nova janela (início, livros, chegou ao fim) a partir da janela base informada"""
+        desejado_inicio = max(0, inicio - self.folga)
+        desejado_fim = inicio + limite + self.folga
+        fim_base = base_inicio + len(livros)
+
+        if livros and base_inicio <= inicio <= fim_base:
+            # Rolagem para baixo: continua a partir do último livro em memória
+            manter = livros[max(desejado_inicio - base_inicio, 0):]
+            faltam = desejado_fim - fim_base
+            novos = self._pagina_apos(livros[-1], faltam)
+            return max(desejado_inicio, base_inicio), manter + novos, len(novos) < faltam
+        if (livros and inicio < base_inicio <= inicio + limite
+                and (inicio + limite <= fim_base or chegou_ao_fim)):
+            # Rolagem para cima: busca os livros anteriores ao primeiro em memória
+            manter = livros[:max(desejado_fim - base_inicio, 0)]
+            faltam = base_inicio - desejado_inicio
+            novos = self._pagina_antes(livros[0], desejado_inicio, faltam)
+            # Menos livros que o pedido: chegou ao primeiro, mesmo se outro processo
+            # excluiu livros antes da janela
+            novo_inicio = base_inicio - len(novos) if len(novos) == faltam else 0
+            return novo_inicio, novos + manter, chegou_ao_fim and len(manter) == len(livros)
+
+        quantidade = desejado_fim - desejado_inicio
+        novos = self._pagina_por_posicao(desejado_inicio, quantidade)
+        return desejado_inicio, novos, len(novos) < quantidade
+
+    @abstractmethod
+    def _pagina_apos(self, livro: Livro, limite: int) -> List[Livro]:
+        """Até limite livros seguintes ao livro informado, na ordem da lista"""
+
+    @abstractmethod
+    def _pagina_antes(self, livro: Livro, inicio: int, limite: int) -> List[Livro]:
+        """Até limite livros anteriores ao livro informado; inicio é a posição do primeiro"""
+
+    @abstractmethod
+    def _pagina_por_posicao(self, inicio: int, limite: int) -> List[Livro]:
+        """Até limite livros a partir da posição inicio"""
+
+
+class FonteCatalogo(FontePaginada):
+    """
+    Fonte de dados da lista virtual que lê o catálogo completo sob demanda
+    Alterações feitas pela interface são aplicadas na janela em memória, sem relê-la.
+    """
+
+    def contar(self) -> int:
+        return self.db_manager.contar_livros()
+
+    def inserir(self, livro: Livro):
+        """Insere o livro na janela em memória, ou desloca a janela se ele entrou antes dela"""
+        if not self._carregada:
+            return
+        self._geracao += 1
+        chave = chave_ordenacao(livro)
+        indice = bisect_left([chave_ordenacao(item) for item in self._livros], chave)
+        if indice == 0 and self._inicio > 0:
+            self._inicio += 1
+        elif indice < len(self._livros) or self._chegou_ao_fim:
+            self._livros.insert(indice, livro)
+
+    def substituir(self, livro: Livro):
+        """
+        Troca o livro na janela em memória, movendo-o se mudou de posição; um livro que
+        não está na janela relê a janela
+        """
+        for indice, item in enumerate(self._livros):
+            if item.codigo == livro.codigo:
+                if chave_ordenacao(item) == chave_ordenacao(livro):
+                    self._geracao += 1
+                    self._livros[indice] = livro
+                else:
+                    self.remover(livro.codigo)
+                    self.inserir(livro)
+                return
+        # Fora da janela não se sabe de onde o livro saiu nem para onde foi
+        self.invalidar()
+
+    def remover(self, codigo: int):
+        """
+        Remove o livro da janela em memória; fora dela não se sabe se ele estava antes
+        ou depois da janela, então a janela é relida
+        """
+        for indice, item in enumerate(self._livros):
+            if item.codigo == codigo:
+                self._geracao += 1
+                del self._livros[indice]
+                return
+        self.invalidar()
+
+    def _pagina_apos(self, livro: Livro, limite: int) -> List[Livro]:
+        return self.db_manager.pagina_apos(livro.titulo, livro.codigo, limite)
+
+    def _pagina_antes(self, livro: Livro, inicio: int, limite: int) -> List[Livro]:
+        return self.db_manager.pagina_antes(livro.titulo, livro.codigo, limite)
+
+    def _pagina_por_posicao(self, inicio: int, limite: int) -> List[Livro]:
+        return self.db_manager.pagina_por_posicao(inicio, limite)
+
+
+class FonteFiltro(FontePaginada):
+    """
+    Fonte de dados da lista virtual com os livros de uma busca facetada
+    (DatabaseManager.filtrar), lidos do banco conforme a rolagem: para baixo a partir
+    do último livro em memória, nos saltos e para cima por posição.
+    O último resultado completo fica em resultado, com as contagens das facetas.
+    """
+
+    def __init__(self, db_manager, folga: int = 100, **filtros):
+        self.filtros = filtros
+        self.resultado = None
+        super().__init__(db_manager, folga)
+
+    def contar(self) -> int:
+        self.resultado = self.db_manager.filtrar(limite=0, **self.filtros)
+        return self.resultado.total
+
+    def inserir(self, livro: Livro):
+        self.invalidar()
+
+    def substituir(self, livro: Livro):
+        self.invalidar()
+
+    def remover(self, codigo: int):
+        self.invalidar()
+
+    def _pagina_apos(self, livro: Livro, limite: int) -> List[Livro]:
+        return self.db_manager.filtrar_livros(limite=limite, apos=(livro.titulo, livro.codigo),
+                                              **self.filtros)
+
+    def _pagina_antes(self, livro: Livro, inicio: int, limite: int) -> List[Livro]:
+        return self.db_manager.filtrar_livros(limite=limite, inicio=inicio, **self.filtros)
+
+    def _pagina_por_posicao(self, inicio: int, limite: int) -> List[Livro]:
+        return self.db_manager.filtrar_livros(limite=limite, inicio=inicio, **self.filtros)
+
+
+class ListaVirtual:
+    """
+    Lista de livros em Treeview que mantém apenas as linhas visíveis
+    As linhas são pedidas à fonte de dados conforme a barra de rolagem se move,
+    então o custo de exibir o catálogo não depende do número de livros.
+    Com um despachante (DespachanteTarefas), a thread da interface só lê a janela em
+    memória da fonte: o que falta é lido na thread de trabalho, com linhas provisórias
+    enquanto isso, e a janela é estendida antes de a rolagem chegar à borda dela.
+    ao_falhar recebe o erro de uma dessas leituras.
+    """
+
+    ALTURA_LINHA_PADRAO = 20
+    ALTURA_CABECALHO_PADRAO = 24
+    # Linhas visíveis de antecedência com que a janela em memória é estendida
+    TELAS_ANTECIPADAS = 2
+    VALORES_PROVISORIOS = ('', 'Carregando...', '', '', '', '')
+
+    def __init__(self, parent, colunas: Sequence[str],
+                 ao_selecionar: Optional[Callable[[Livro], None]] = None,
+                 despachante=None, grupo: str = 'janela',
+                 ao_falhar: Optional[Callable[[Exception], None]] = None):
+        self.ao_selecionar = ao_selecionar
+        self.despachante = despachante
+        self.grupo = grupo
+        self.ao_falhar = ao_falhar
+        self._leitura = None
+        self.fonte = FonteLista([])
+        self.total = 0
+        self.topo = 0
+        self.visiveis = 15
+        self.linhas: List[Livro] = []
+        self.itens = {}
+        self.codigo_selecionado = None
+        self._altura_linha = self.ALTURA_LINHA_PADRAO
+        self._altura_cabecalho = self.ALTURA_CABECALHO_PADRAO
+
+        self.frame = ttk.Frame(parent)
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(self.frame, columns=colunas, show='headings',
+                                 height=self.visiveis, selectmode='browse')
+        for col in colunas:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=100)
+
+        self.scrollbar_v = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self._rolar)
+        self.scrollbar_h = ttk.Scrollbar(self.frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.scrollbar_h.set)
+
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar_v.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.scrollbar_h.grid(row=1, column=0, sticky=(tk.W, tk.E))
+
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<MouseWheel>', self._on_roda)
+        self.tree.bind('<Button-4>', lambda event: self._rolar_passos(-3))
+        self.tree.bind('<Button-5>', lambda event: self._rolar_passos(3))
+        self.tree.bind('<Up>', lambda event: self._mover_selecao(-1))
+        self.tree.bind('<Down>', lambda event: self._mover_selecao(1))
+        self.tree.bind('<Prior>', lambda event: self._mover_selecao(-self.visiveis))
+        self.tree.bind('<Next>', lambda event: self._mover_selecao(self.visiveis))
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def definir_fonte(self, fonte):
+        """Troca a fonte de dados exibida; uma fonte nova começa do topo"""
+        if fonte is not self.fonte:
+            self.fonte = fonte
+            self.topo = 0
+        self.recarregar()
+
+    def exibir(self, fonte, total: int, topo: int = 0):
+        """
+        Exibe uma fonte já contada (e com a janela a partir de topo já lida), sem
+        consultar o total de novo; usado quando a fonte foi preparada em outra thread
+        """
+        self._cancelar_leitura()
+        self.fonte = fonte
+        self.total = total
+        self.topo = topo
+        self._renderizar()
+
+    def recarregar(self):
+        """Relê o total e a janela visível da fonte atual, mantendo a posição"""
+        self._cancelar_leitura()
+        self.fonte.invalidar()
+        self.total = self.fonte.contar()
+        self._renderizar()
+
+    def rolar_para(self, posicao: int):
+        """Rola a lista para que a posição informada seja a primeira visível"""
+        posicao = max(0, min(posicao, self.total - self.visiveis))
+        if posicao != self.topo:
+            self.topo = posicao
+            self._renderizar()
+
+    def limpar_selecao(self):
+        """Remove a seleção atual"""
+        self.codigo_selecionado = None
+        selecao = self.tree.selection()
+        if selecao:
+            self.tree.selection_remove(*selecao)
+
+    def inserir_livro(self, livro: Livro):
+        """Insere um livro novo na sua posição ordenada, sem recarregar a lista"""
+        self.fonte.inserir(livro)
+        self._inserir_visivel(livro)
+        self._completar()
+        self._atualizar_scrollbar()
+
+    def atualizar_livro(self, anterior: Livro, livro: Livro):
+        """Atualiza um livro editado, no lugar se a ordem não mudar"""
+        item = self.itens.get(livro.codigo)
+        if item is not None and anterior.titulo == livro.titulo:
+            self.fonte.substituir(livro)
+            self.linhas[self.tree.index(item)] = livro
+            self.tree.item(item, values=self._valores(livro))
+            return
+
+        self.fonte.remover(anterior.codigo)
+        self.fonte.inserir(livro)
+        self._remover_visivel(anterior)
+        self._inserir_visivel(livro)
+        self._completar()
+        self._atualizar_scrollbar()
+
+    def remover_livro(self, livro: Livro):
+        """Remove um livro excluído, completando a janela com os vizinhos da fonte"""
+        self.fonte.remover(livro.codigo)
+        self._remover_visivel(livro)
+        self._completar()
+        self._atualizar_scrollbar()
+
+    def _inserir_visivel(self, livro: Livro):
+        fim_dos_dados = self.topo + len(self.linhas) >= self.total
+        self.total += 1
+
+        indice = bisect_left([chave_ordenacao(item) for item in self.linhas], chave_ordenacao(livro))
+        if indice == 0 and self.topo > 0:
+            # Entrou antes da janela: as linhas visíveis descem uma posição
+            self.topo += 1
+        elif indice < len(self.linhas) or fim_dos_dados:
+            self.linhas.insert(indice, livro)
+            self.tree.insert('', indice, values=self._valores(livro))
+            if len(self.linhas) > self.visiveis:
+                self.linhas.pop()
+                self.tree.delete(self.tree.get_children()[-1])
+            self._reindexar()
+
+    def _remover_visivel(self, livro: Livro):
+        self.total = max(self.total - 1, 0)
+
+        item = self.itens.get(livro.codigo)
+        if item is not None:
+            self.linhas.pop(self.tree.index(item))
+            self.tree.delete(item)
+            if self.codigo_selecionado == livro.codigo:
+                self.codigo_selecionado = None
+            self._reindexar()
+        elif self.linhas and chave_ordenacao(livro) < chave_ordenacao(self.linhas[0]):
+            # Saiu de antes da janela: as linhas visíveis sobem uma posição
+            self.topo = max(self.topo - 1, 0)
+
+    def _completar(self):
+        """Completa a janela com livros da fonte quando ela ficou com menos linhas que o visível"""
+        faltam = min(self.visiveis, self.total) - len(self.linhas)
+        if faltam <= 0 or self._lendo():
+            # Com uma leitura pendente, a janela é redesenhada quando ela terminar
+            return
+
+        fim = self.topo + len(self.linhas)
+        novos = self._ler(fim, faltam) if fim < self.total else []
+        if novos is None:
+            return
+        for livro in novos:
+            self.linhas.append(livro)
+            self.tree.insert('', 'end', values=self._valores(livro))
+            faltam -= 1
+
+        if faltam > 0 and self.topo > 0:
+            # Fim dos dados: a janela sobe para continuar cheia
+            quantidade = min(faltam, self.topo)
+            anteriores = self._ler(self.topo - quantidade, quantidade)
+            if anteriores is None:
+                self._reindexar()
+                return
+            self.topo -= quantidade
+            for indice, livro in enumerate(anteriores):
+                self.linhas.insert(indice, livro)
+                self.tree.insert('', indice, values=self._valores(livro))
+        self._reindexar()
+
+    def _ler(self, inicio: int, limite: int) -> Optional[List[Livro]]:
+        """
+        Livros das posições pedidas; sem despachante lê da fonte, com despachante só da
+        memória, pedindo a leitura à thread de trabalho e retornando None se faltarem
+        """
+        livros = self.fonte.em_memoria(inicio, limite)
+        if livros is None:
+            if self.despachante is None:
+                return self.fonte.janela(inicio, limite)
+            self._pedir_leitura(inicio, limite)
+        return livros
+
+    def _pedir_leitura(self, inicio: int, limite: int):
+        """Lê a janela na thread de trabalho e redesenha a lista quando ela chegar"""
+        fonte = self.fonte
+
+        def lida(resultado):
+            self._leitura = None
+            if fonte is self.fonte:
+                # Resultado obsoleto (a janela mudou nesse meio tempo) é descartado e
+                # pedido de novo pelo redesenho, se ainda faltar
+                fonte.aplicar(resultado)
+                self._renderizar()
+
+        def falhou(erro):
+            self._leitura = None
+            if self.ao_falhar is not None:
+                self.ao_falhar(erro)
+
+        self._leitura = self.despachante.executar(
+            fonte.preparar(inicio, limite), ao_concluir=lida, ao_falhar=falhou,
+            descricao="Carregando lista", grupo=self.grupo
+        )
+
+    def _lendo(self) -> bool:
+        leitura = self._leitura
+        return leitura is not None and not (leitura.cancelada or leitura.concluida)
+
+    def _cancelar_leitura(self):
+        if self._lendo():
+            self._leitura.cancelar()
+        self._leitura = None
+
+    def _antecipar(self):
+        """Estende em segundo plano a janela em memória quando a rolagem se aproxima da borda"""
+        if self.despachante is None or self._lendo() or not self.total:
+            return
+        margem = self.visiveis * self.TELAS_ANTECIPADAS
+        inicio = max(0, self.topo - margem)
+        fim = min(self.total, self.topo + self.visiveis + margem)
+        if self.fonte.em_memoria(inicio, fim - inicio) is None:
+            self._pedir_leitura(inicio, fim - inicio)
+
+    def _reindexar(self):
+        """Refaz o mapa codigo -> item do Treeview após inserções e remoções"""
+        self.itens = {livro.codigo: item
+                      for livro, item in zip(self.linhas, self.tree.get_children())}
+
+    def _valores(self, livro: Livro) -> tuple:
+        return (livro.codigo, livro.titulo, livro.autor, livro.genero,
+                livro.editora, livro.ano_publicacao)
+
+    def _renderizar(self):
+        """Preenche o Treeview com as linhas visíveis, reaproveitando os itens existentes"""
+        self.topo = max(0, min(self.topo, self.total - self.visiveis))
+        linhas = self._ler(self.topo, self.visiveis) if self.total else []
+        if linhas is None:
+            # Janela ainda em leitura: linhas provisórias, substituídas quando ela chegar
+            self.linhas = []
+            valores = [self.VALORES_PROVISORIOS] * min(self.visiveis, self.total - self.topo)
+        else:
+            self.linhas = linhas
+            valores = [self._valores(livro) for livro in linhas]
+
+        filhos = self.tree.get_children()
+        for indice, valor in enumerate(valores):
+            if indice < len(filhos):
+                self.tree.item(filhos[indice], values=valor)
+            else:
+                self.tree.insert('', 'end', values=valor)
+        if len(filhos) > len(valores):
+            self.tree.delete(*filhos[len(valores):])
+        self._reindexar()
+
+        self._restaurar_selecao()
+        self._atualizar_scrollbar()
+        self._medir_linhas()
+        if linhas is not None:
+            self._antecipar()
+
+    def _restaurar_selecao(self):
+        """Mantém selecionado o livro escolhido, se ele estiver na janela visível"""
+        item = self.itens.get(self.codigo_selecionado)
+        selecao = self.tree.selection()
+        if item is not None:
+            if selecao != (item,):
+                self.tree.selection_set(item)
+        elif selecao:
+            self.tree.selection_remove(*selecao)
+
+    def _atualizar_scrollbar(self):
+        if self.total == 0:
+            self.scrollbar_v.set(0.0, 1.0)
+            return
+        inicio = self.topo / self.total
+        fim = min(1.0, (self.topo + len(self.linhas)) / self.total)
+        self.scrollbar_v.set(inicio, fim)
+
+    def _medir_linhas(self):
+        """Mede a altura real das linhas e do cabeçalho a partir do primeiro item"""
+        filhos = self.tree.get_children()
+        if not filhos:
+            return
+        caixa = self.tree.bbox(filhos[0])
+        if caixa:
+            self._altura_cabecalho = caixa[1]
+            self._altura_linha = max(caixa[3], 1)
+
+    def _on_configure(self, event):
+        visiveis = max(1, (event.height - self._altura_cabecalho) // self._altura_linha)
+        if visiveis != self.visiveis:
+            self.visiveis = visiveis
+            self._renderizar()
+
+    def _rolar(self, *args):
+        """Comando da barra de rolagem vertical"""
+        if args[0] == 'moveto':
+            self.rolar_para(int(float(args[1]) * self.total))
+        elif args[0] == 'scroll':
+            passos = int(args[1])
+            if args[2] == 'pages':
+                passos *= self.visiveis
+            self._rolar_passos(passos)
+
+    def _rolar_passos(self, passos: int):
+        self.rolar_para(self.topo + passos)
+        return 'break'
+
+    def _on_roda(self, event):
+        return self._rolar_passos(-3 if event.delta > 0 else 3)
+
+    def _mover_selecao(self, deslocamento: int):
+        """Move a seleção pelo teclado, rolando a lista quando ela sai da janela visível"""
+        if self.total == 0:
+            return 'break'
+
+        selecao = self.tree.selection()
+        atual = self.topo + self.tree.index(selecao[0]) if selecao else self.topo - 1
+        alvo = max(0, min(atual + deslocamento, self.total - 1))
+
+        if alvo < self.topo:
+            self.rolar_para(alvo)
+        elif alvo >= self.topo + self.visiveis:
+            self.rolar_para(alvo - self.visiveis + 1)
+
+        filhos = self.tree.get_children()
+        indice = alvo - self.topo
+        if 0 <= indice < len(filhos):
+            self.tree.selection_set(filhos[indice])
+            self.tree.focus(filhos[indice])
+        return 'break'
+
+    def _on_select(self, event):
+        selecao = self.tree.selection()
+        if not selecao:
+            return
+
+        indice = self.tree.index(selecao[0])
+        if indice >= len(self.linhas):
+            return
+
+        livro = self.linhas[indice]
+        # Reselecionar o mesmo livro após uma rolagem não deve sobrescrever o formulário
+        if livro.codigo == self.codigo_selecionado:
+            return
+
+        self.codigo_selecionado = livro.codigo
+        if self.ao_selecionar:
+            self.ao_selecionar(livro)
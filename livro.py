@@ -1,13 +1,23 @@
 class Livro:
     """Classe que representa um livro no catálogo"""
     
-    def __init__(self, codigo=None, titulo="", autor="", genero="", editora="", ano_publicacao=0):
+    __slots__ = ('_codigo', '_titulo', '_autor', '_genero', '_editora', '_ano_publicacao',
+                 '_versao')
+    
+    def __init__(self, codigo=None, titulo="", autor="", genero="", editora="", ano_publicacao=0,
+                 versao=None):
+        """
+        Construtor rápido, sem validação: usado para linhas vindas do banco de dados
+        Dados informados pelo usuário devem passar pelos setters ou por from_dict
+        versao é a versão da linha lida do banco (None para livros ainda não gravados)
+        """
         self._codigo = codigo
         self._titulo = titulo
         self._autor = autor
         self._genero = genero
         self._editora = editora
         self._ano_publicacao = ano_publicacao
+        self._versao = versao
     
     @property
     def codigo(self):
@@ -81,6 +91,18 @@ class Livro:
             raise ValueError("Ano de publicação deve estar entre 1000 e 2030")
         self._ano_publicacao = valor
     
+    @property
+    def versao(self):
+        return self._versao
+    
+    @versao.setter
+    def versao(self, valor):
+        if valor is not None and not isinstance(valor, int):
+            raise ValueError("Versão deve ser um número inteiro")
+        if valor is not None and valor <= 0:
+            raise ValueError("Versão deve ser um número positivo")
+        self._versao = valor
+    
     def __str__(self):
         return f"Livro(código={self.codigo}, título='{self.titulo}', autor='{self.autor}')"
     
@@ -95,7 +117,8 @@ class Livro:
             'autor': self.autor,
             'genero': self.genero,
             'editora': self.editora,
-            'ano_publicacao': self.ano_publicacao
+            'ano_publicacao': self.ano_publicacao,
+            'versao': self.versao
         }
     
     @classmethod
@@ -109,4 +132,8 @@ class Livro:
         livro.genero = dados['genero']
         livro.editora = dados['editora']
         livro.ano_publicacao = dados['ano_publicacao']
+        # Versão vazia (ex.: coluna em branco de um CSV exportado) equivale a ausente
+        versao = dados.get('versao')
+        if versao is not None and not (isinstance(versao, str) and not versao.strip()):
+            livro.versao = versao
         return livro 
\ No newline at end of file
@@ -11,31 +11,86 @@ Curso: CSI-22
 Disciplina: Programação Orientada a Objetos
 Professor: Prof. Karla D. Fook
 Data: 20/06/2025
+
+Uso:
+    python main.py
+    python main.py --profile-startup
 """
 
-import tkinter as tk
-from tkinter import messagebox
-import sys
+import argparse
 import os
+import sys
+import time
+from typing import List, Tuple
+
+# Referência dos tempos de --profile-startup
+INICIO = time.perf_counter()
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-try:
-    from interface import CatalogoInterface
-except ImportError as e:
-    print(f"Erro ao importar módulos: {e}")
-    sys.exit(1)
+
+class PerfilInicializacao:
+    """
+    Tempos das etapas da inicialização, medidos desde o carregamento deste módulo
+    marcar() pode ser chamado de qualquer thread (a verificação do esquema termina na
+    thread de trabalho); concluir() imprime o relatório.
+    """
+
+    def __init__(self, inicio: float):
+        self.inicio = inicio
+        self.etapas: List[Tuple[str, float]] = []
+
+    def marcar(self, etapa: str):
+        self.etapas.append((etapa, time.perf_counter()))
+
+    def relatorio(self) -> str:
+        """Duração de cada etapa (desde a anterior) e o tempo acumulado, em ms"""
+        linhas = [f"{'Etapa':<22}{'Duração':>12}{'Acumulado':>12}"]
+        anterior = self.inicio
+        for etapa, instante in sorted(self.etapas, key=lambda item: item[1]):
+            linhas.append(f"{etapa:<22}{(instante - anterior) * 1000:>9.1f} ms"
+                          f"{(instante - self.inicio) * 1000:>9.1f} ms")
+            anterior = instante
+        return '\n'.join(linhas)
+
+    def concluir(self):
+        print("Tempos da inicialização:")
+        print(self.relatorio())
+
+    def __str__(self):
+        return f"PerfilInicializacao(etapas={len(self.etapas)})"
+
+    def __repr__(self):
+        return self.__str__()
 
 
-def main():
-    """Função principal que executa a aplicação"""
+def main(argv=None):
+    """
+    Função principal que executa a aplicação
+    A janela é exibida antes de importar e montar a interface; o esquema do banco e a
+    primeira página são carregados depois, com o mainloop já rodando.
+    """
+    parser = argparse.ArgumentParser(description="Catálogo de Livros")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Imprime o tempo de cada etapa da inicialização")
+    args = parser.parse_args(argv)
+    perfil = PerfilInicializacao(INICIO) if args.profile_startup else None
+
+    def marcar(etapa):
+        if perfil is not None:
+            perfil.marcar(etapa)
+
+    try:
+        import tkinter as tk
+        from tkinter import messagebox
+    except ImportError as e:
+        print(f"Erro ao importar módulos: {e}")
+        sys.exit(1)
+    marcar('importar tkinter')
+
     try:
         root = tk.Tk()
-        
-        try:
-            pass
-        except:
-            pass
+        root.title("Catálogo de Livros")
         
         root.update_idletasks()
         width = 900
@@ -45,12 +100,28 @@ def main():
         root.geometry(f'{width}x{height}+{x}+{y}')
         
         root.minsize(800, 600)
+        marcar('criar janela')
+        
+        # Janela na tela antes de carregar o restante da aplicação
+        root.update()
+        marcar('exibir janela')
+        
+        try:
+            from interface import CatalogoInterface
+        except ImportError as e:
+            print(f"Erro ao importar módulos: {e}")
+            sys.exit(1)
+        marcar('importar interface')
         
-        app = CatalogoInterface(root)
+        app = CatalogoInterface(root, perfil_inicio=perfil)
+        marcar('montar interface')
+        root.after_idle(marcar, 'iniciar mainloop')
         
         def on_closing():
             """Manipula o fechamento da aplicação"""
             if messagebox.askokcancel("Sair", "Deseja realmente sair do catálogo?"):
+                if hasattr(app, 'db_manager'):
+                    app.fechar()
                 root.destroy()
         
         root.protocol("WM_DELETE_WINDOW", on_closing)
@@ -77,4 +148,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
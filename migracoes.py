@@ -0,0 +1,334 @@
+import sqlite3
+from typing import Callable, List, Sequence
+from texto import impressao_digital
+
+
+# Versão das linhas recém-inseridas em livros
+VERSAO_INICIAL = 1
+
+# Colunas com os dados de cada livro; os triggers de atualização só disparam quando uma
+# delas muda, então gravar uma coluna derivada (impressao) não conta como alteração
+COLUNAS_DADOS = 'titulo, autor, genero, editora, ano_publicacao, versao'
+
+
+class Migracao:
+    """Passo de evolução do esquema, identificado por um número de versão crescente"""
+
+    def __init__(self, versao: int, descricao: str, aplicar: Callable[[sqlite3.Connection], None]):
+        self.versao = versao
+        self.descricao = descricao
+        self.aplicar = aplicar
+
+    def __str__(self):
+        return f"Migracao({self.versao}: {self.descricao})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def _criar_tabela_livros(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS livros (
+            codigo INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL,
+            autor TEXT NOT NULL,
+            genero TEXT NOT NULL,
+            editora TEXT NOT NULL,
+            ano_publicacao INTEGER NOT NULL
+        )
+    ''')
+
+
+def _criar_indice_titulo(conn: sqlite3.Connection):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_livros_titulo_codigo ON livros (titulo, codigo)')
+
+
+def criar_indice_busca(conn: sqlite3.Connection) -> bool:
+    """
+    Cria o índice de texto completo (FTS5) sincronizado com a tabela livros por triggers
+    Bancos existentes têm o índice preenchido na criação.
+    Retorna False se o SQLite não tiver suporte a FTS5.
+    """
+    existia = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'livros_fts'"
+    ).fetchone() is not None
+
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS livros_fts USING fts5(
+                titulo, autor, genero, editora,
+                content='livros', content_rowid='codigo',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        if 'fts5' in str(e):
+            return False
+        raise
+
+    # Um comando por execute (executescript faria commit no meio da migração)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS livros_fts_insercao AFTER INSERT ON livros BEGIN
+            INSERT INTO livros_fts (rowid, titulo, autor, genero, editora)
+            VALUES (new.codigo, new.titulo, new.autor, new.genero, new.editora);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS livros_fts_remocao AFTER DELETE ON livros BEGIN
+            INSERT INTO livros_fts (livros_fts, rowid, titulo, autor, genero, editora)
+            VALUES ('delete', old.codigo, old.titulo, old.autor, old.genero, old.editora);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS livros_fts_atualizacao
+        AFTER UPDATE OF titulo, autor, genero, editora ON livros BEGIN
+            INSERT INTO livros_fts (livros_fts, rowid, titulo, autor, genero, editora)
+            VALUES ('delete', old.codigo, old.titulo, old.autor, old.genero, old.editora);
+            INSERT INTO livros_fts (rowid, titulo, autor, genero, editora)
+            VALUES (new.codigo, new.titulo, new.autor, new.genero, new.editora);
+        END
+    ''')
+
+    if not existia:
+        conn.execute("INSERT INTO livros_fts (livros_fts) VALUES ('rebuild')")
+    return True
+
+
+def _criar_indices_filtros(conn: sqlite3.Connection):
+    # Cada índice termina em titulo (e no codigo, implícito como rowid): o filtro por
+    # igualdade já sai na ordem da listagem, sem ordenação em B-tree temporária
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_livros_autor ON livros (autor, titulo)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_livros_genero ON livros (genero, titulo)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_livros_editora ON livros (editora, titulo)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_livros_ano ON livros (ano_publicacao, titulo)')
+
+
+# Facetas contadas em contagens_facetas: nome -> expressão sobre a linha ({p} é o prefixo
+# new. ou old. nos triggers, ou vazio nas consultas)
+FACETAS = {
+    'genero': '{p}genero',
+    'editora': '{p}editora',
+    'decada': '({p}ano_publicacao / 10) * 10',
+}
+
+
+def _criar_contagens_facetas(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS contagens_facetas (
+            faceta TEXT NOT NULL,
+            valor NOT NULL,
+            quantidade INTEGER NOT NULL,
+            PRIMARY KEY (faceta, valor)
+        ) WITHOUT ROWID
+    ''')
+
+    incrementos = '\n'.join(f'''
+            INSERT INTO contagens_facetas (faceta, valor, quantidade)
+            VALUES ('{nome}', {expressao.format(p='new.')}, 1)
+            ON CONFLICT (faceta, valor) DO UPDATE SET quantidade = quantidade + 1;'''
+        for nome, expressao in FACETAS.items())
+    decrementos = '\n'.join(f'''
+            UPDATE contagens_facetas SET quantidade = quantidade - 1
+            WHERE faceta = '{nome}' AND valor = {expressao.format(p='old.')};
+            DELETE FROM contagens_facetas
+            WHERE faceta = '{nome}' AND valor = {expressao.format(p='old.')} AND quantidade <= 0;'''
+        for nome, expressao in FACETAS.items())
+
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contagens_facetas_insercao AFTER INSERT ON livros BEGIN
+            {incrementos}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contagens_facetas_remocao AFTER DELETE ON livros BEGIN
+            {decrementos}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contagens_facetas_atualizacao
+        AFTER UPDATE OF genero, editora, ano_publicacao ON livros BEGIN
+            {decrementos}
+            {incrementos}
+        END
+    ''')
+
+    # Contagem inicial dos livros já cadastrados
+    conn.execute('DELETE FROM contagens_facetas')
+    for nome, expressao in FACETAS.items():
+        coluna = expressao.format(p='')
+        conn.execute(f'''
+            INSERT INTO contagens_facetas (faceta, valor, quantidade)
+            SELECT '{nome}', {coluna}, COUNT(*) FROM livros GROUP BY {coluna}
+        ''')
+
+
+def _evento_trigger(evento: str) -> str:
+    return f'UPDATE OF {COLUNAS_DADOS}' if evento == 'UPDATE' else evento
+
+
+def _criar_versao_catalogo(conn: sqlite3.Connection):
+    # Incrementada a cada escrita em livros, por qualquer processo; permite saber se o
+    # catálogo mudou sem reler os livros
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS metadados (
+            chave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("INSERT OR IGNORE INTO metadados (chave, valor) VALUES ('versao_catalogo', 0)")
+    for evento in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS versao_catalogo_{evento.lower()}
+            AFTER {_evento_trigger(evento)} ON livros BEGIN
+                UPDATE metadados SET valor = valor + 1 WHERE chave = 'versao_catalogo';
+            END
+        ''')
+
+
+def _criar_versao_livros(conn: sqlite3.Connection):
+    # Versão de cada linha, incrementada a cada atualização: permite UPDATE/DELETE
+    # condicionados à versão lida (concorrência otimista)
+    colunas = [linha[1] for linha in conn.execute('PRAGMA table_info(livros)')]
+    if 'versao' not in colunas:
+        conn.execute(f'ALTER TABLE livros ADD COLUMN versao INTEGER NOT NULL '
+                     f'DEFAULT {VERSAO_INICIAL}')
+
+
+def _criar_registro_alteracoes(conn: sqlite3.Connection):
+    # Registro das escritas em livros, por qualquer processo, em ordem de seq: quem guarda
+    # a última seq lida (réplicas, snapshots) relê só os livros alterados desde então.
+    # AUTOINCREMENT garante seq crescente mesmo depois de linhas antigas serem descartadas.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo INTEGER NOT NULL,
+            operacao TEXT NOT NULL CHECK (operacao IN ('I', 'U', 'D'))
+        )
+    ''')
+    # Maior seq já descartada do registro; quem leu até antes dela precisa recarregar tudo
+    conn.execute("INSERT OR IGNORE INTO metadados (chave, valor) VALUES ('alteracoes_descartadas_ate', 0)")
+    for evento, linha in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS alteracoes_{evento.lower()}
+            AFTER {_evento_trigger(evento)} ON livros BEGIN
+                INSERT INTO alteracoes (codigo, operacao) VALUES ({linha}.codigo, '{evento[0]}');
+            END
+        ''')
+
+
+def _criar_controle_replicacao(conn: sqlite3.Connection):
+    # Sorteado uma vez por banco: a réplica guarda o identificador da origem que copiou
+    conn.execute('''
+        INSERT OR IGNORE INTO metadados (chave, valor)
+        VALUES ('identificador', random() & 9223372036854775807)
+    ''')
+    # Livros recebidos de outro banco; os demais foram criados localmente
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS livros_replicados (
+            codigo INTEGER PRIMARY KEY
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS livros_replicados_remocao AFTER DELETE ON livros BEGIN
+            DELETE FROM livros_replicados WHERE codigo = old.codigo;
+        END
+    ''')
+
+
+def preencher_impressoes(conn: sqlite3.Connection, tamanho_lote: int = 5000) -> int:
+    """
+    Calcula a impressão digital (texto.impressao_digital) dos livros que ainda não a têm:
+    gravados antes da coluna existir ou por programas que não a preenchem
+    Retorna quantos livros foram preenchidos.
+    """
+    preenchidos = 0
+    codigo = 0
+    while True:
+        linhas = conn.execute('''
+            SELECT codigo, titulo, autor, editora, ano_publicacao FROM livros
+            WHERE codigo > ? AND impressao IS NULL
+            ORDER BY codigo LIMIT ?
+        ''', (codigo, tamanho_lote)).fetchall()
+        if not linhas:
+            return preenchidos
+        conn.executemany('UPDATE livros SET impressao = ? WHERE codigo = ?',
+                         [(impressao_digital(*linha[1:]), linha[0]) for linha in linhas])
+        preenchidos += len(linhas)
+        codigo = linhas[-1][0]
+
+
+def _criar_impressao_digital(conn: sqlite3.Connection):
+    # Chave de duplicatas consultada a cada inclusão. O índice não é UNIQUE: bancos
+    # existentes podem ter duplicatas, que deduplicacao.py encontra e mescla
+    colunas = [linha[1] for linha in conn.execute('PRAGMA table_info(livros)')]
+    if 'impressao' not in colunas:
+        conn.execute('ALTER TABLE livros ADD COLUMN impressao TEXT')
+
+    # Triggers de atualização criados antes de COLUNAS_DADOS disparavam em qualquer
+    # UPDATE: preencher a impressão reindexaria o FTS e registraria todos os livros
+    for nome in ('versao_catalogo_update', 'alteracoes_update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {nome}')
+    _criar_versao_catalogo(conn)
+    _criar_registro_alteracoes(conn)
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'livros_fts'"
+    ).fetchone() is not None:
+        conn.execute('DROP TRIGGER IF EXISTS livros_fts_atualizacao')
+        criar_indice_busca(conn)
+
+    preencher_impressoes(conn)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_livros_impressao ON livros (impressao)')
+
+
+# Toda migração precisa ser idempotente: bancos anteriores ao controle de versão
+# (user_version 0) já têm parte do esquema e passam por todas elas
+MIGRACOES = (
+    Migracao(1, "Tabela livros", _criar_tabela_livros),
+    Migracao(2, "Índice (titulo, codigo) para ordenação e paginação", _criar_indice_titulo),
+    Migracao(3, "Índice de texto completo FTS5", criar_indice_busca),
+    Migracao(4, "Índices de autor, gênero, editora e ano", _criar_indices_filtros),
+    Migracao(5, "Contagens por gênero, editora e década mantidas por triggers",
+             _criar_contagens_facetas),
+    Migracao(6, "Versão do catálogo incrementada a cada escrita", _criar_versao_catalogo),
+    Migracao(7, "Versão de cada livro para atualizações condicionais", _criar_versao_livros),
+    Migracao(8, "Registro de alterações em livros mantido por triggers", _criar_registro_alteracoes),
+    Migracao(9, "Identificador do banco e livros recebidos por replicação",
+             _criar_controle_replicacao),
+    Migracao(10, "Impressão digital dos livros para detectar duplicatas", _criar_impressao_digital),
+)
+
+VERSAO_ESQUEMA = MIGRACOES[-1].versao
+
+
+def versao_esquema(conn: sqlite3.Connection) -> int:
+    """Versão do esquema gravada no banco (PRAGMA user_version)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrar(conn: sqlite3.Connection, migracoes: Sequence[Migracao] = MIGRACOES) -> List[Migracao]:
+    """
+    Aplica as migrações ainda não registradas no banco, em ordem de versão
+    Cada migração roda em sua própria transação junto com a atualização de
+    user_version, então uma falha não deixa o esquema pela metade. Processos que
+    abram o mesmo banco ao mesmo tempo esperam o lock e não repetem o trabalho.
+    Retorna as migrações aplicadas.
+    """
+    if versao_esquema(conn) >= migracoes[-1].versao:
+        return []
+
+    if conn.in_transaction:
+        conn.commit()
+
+    aplicadas = []
+    for migracao in migracoes:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if versao_esquema(conn) < migracao.versao:
+                migracao.aplicar(conn)
+                conn.execute(f'PRAGMA user_version = {int(migracao.versao)}')
+                aplicadas.append(migracao)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return aplicadas
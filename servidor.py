@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Catálogo de Livros - Servidor HTTP/JSON
+Expõe o catálogo para leitura por outros serviços, sem abrir a interface gráfica
+
+Uso:
+    python servidor.py
+    python servidor.py --porta 8080 --banco catalogo_livros.db --pool 8
+
+Endpoints (GET):
+    /livros?limite=50&apos_titulo=...&apos_codigo=...   página em ordem de título
+    /livros?inicio=1000&limite=50                       página por posição
+    /livros/<codigo>                                    um livro
+    /busca?q=termo&campos=titulo,autor&limite=20        busca textual por relevância
+    /busca?q=termo&modo=aproximado&campo=autor&limiar=0.5
+                                                        busca tolerante a erros de digitação
+    /filtro?genero=...&editora=...&autor=...&ano_min=...&ano_max=...&inicio=0&limite=50
+                                                        página filtrada com total e facetas
+    /contagem                                           total de livros
+
+Com --snapshot, /livros, /livros/<codigo>, /filtro e /contagem são atendidos por uma
+cópia do catálogo em memória (snapshot.py), atualizada quando a versão do catálogo muda.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import DatabaseManager
+from snapshot import SnapshotCatalogo
+from trigramas import BuscaAproximada
+
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 1000
+
+# Respostas menores que isso não compensam a compressão
+TAMANHO_MINIMO_GZIP = 1024
+
+
+class ErroRequisicao(Exception):
+    """Erro causado pela requisição (parâmetro inválido, recurso inexistente)"""
+
+    def __init__(self, status: HTTPStatus, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class ServidorCatalogo(ThreadingHTTPServer):
+    """
+    Servidor HTTP com uma thread por conexão, todas usando o mesmo DatabaseManager
+    (e portanto o mesmo pool de conexões)
+    A versão do catálogo, usada nas ETags, é relida do banco no máximo uma vez a cada
+    validade_versao segundos; nesse intervalo, requisições condicionais são respondidas
+    com 304 sem nenhuma consulta.
+    O índice de trigramas da busca aproximada é carregado na primeira busca desse tipo
+    e recarregado quando a versão do catálogo muda. Da mesma forma, o snapshot (se
+    informado) recebe as alterações do banco quando a versão muda.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, endereco, db_manager: DatabaseManager, validade_versao: float = 1.0,
+                 silencioso: bool = False, snapshot: Optional[SnapshotCatalogo] = None):
+        super().__init__(endereco, ManipuladorCatalogo)
+        self.db_manager = db_manager
+        self.validade_versao = validade_versao
+        self.silencioso = silencioso
+        self._versao = None
+        self._versao_lida_em = 0.0
+        self._lock_versao = threading.Lock()
+        self._busca_aproximada = None
+        self._versao_aproximada = None
+        self._lock_aproximada = threading.Lock()
+        self.snapshot = snapshot
+        self._versao_snapshot = None
+        self._lock_snapshot = threading.Lock()
+
+    def versao_catalogo(self) -> int:
+        """Versão do catálogo, relida do banco quando a última leitura expirou"""
+        with self._lock_versao:
+            agora = time.monotonic()
+            if self._versao is None or agora - self._versao_lida_em >= self.validade_versao:
+                self._versao = self.db_manager.versao_catalogo()
+                self._versao_lida_em = agora
+            return self._versao
+
+    def busca_aproximada(self) -> BuscaAproximada:
+        """Busca aproximada com o índice atualizado para a versão corrente do catálogo"""
+        with self._lock_aproximada:
+            versao = self.versao_catalogo()
+            if self._busca_aproximada is None:
+                self._busca_aproximada = BuscaAproximada(self.db_manager)
+            elif versao != self._versao_aproximada:
+                # As escritas vêm de outros processos, que o observador não enxerga
+                self._busca_aproximada.recarregar()
+            self._versao_aproximada = versao
+            return self._busca_aproximada
+
+    def leitura(self):
+        """
+        Fonte das leituras de páginas, livros, filtros e contagem: o snapshot atualizado
+        para a versão corrente do catálogo, ou o próprio DatabaseManager
+        """
+        if self.snapshot is None:
+            return self.db_manager
+        with self._lock_snapshot:
+            versao = self.versao_catalogo()
+            if versao != self._versao_snapshot:
+                self.snapshot.atualizar()
+                self._versao_snapshot = versao
+        return self.snapshot
+
+
+class ManipuladorCatalogo(BaseHTTPRequestHandler):
+    """Atende as requisições GET/HEAD dos endpoints do catálogo"""
+
+    # HTTP/1.1 mantém a conexão aberta entre requisições (keep-alive)
+    protocol_version = 'HTTP/1.1'
+    server_version = 'CatalogoLivros/1.0'
+    # Conexões ociosas são encerradas após este tempo, liberando a thread
+    timeout = 30
+
+    def do_GET(self):
+        self._responder(incluir_corpo=True)
+
+    def do_HEAD(self):
+        self._responder(incluir_corpo=False)
+
+    def _responder(self, incluir_corpo: bool):
+        url = urlsplit(self.path)
+        parametros = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+        try:
+            rota = self._rota(url.path)
+            etag = f'W/"{self.server.versao_catalogo()}"'
+            if etag in self._etags_aceitas():
+                self._enviar(HTTPStatus.NOT_MODIFIED, None, etag, incluir_corpo)
+                return
+            self._enviar(HTTPStatus.OK, rota(parametros), etag, incluir_corpo)
+        except ErroRequisicao as e:
+            self._enviar(e.status, {'erro': str(e)}, None, incluir_corpo)
+        except Exception as e:
+            self.log_error("Erro ao atender %s: %s", self.path, e)
+            self._enviar(HTTPStatus.INTERNAL_SERVER_ERROR, {'erro': str(e)}, None, incluir_corpo)
+
+    def _rota(self, caminho: str):
+        """Retorna a função que atende o caminho pedido"""
+        partes = [parte for parte in caminho.split('/') if parte]
+        if partes == ['livros']:
+            return self._listar
+        if len(partes) == 2 and partes[0] == 'livros':
+            codigo = self._inteiro({'codigo': partes[1]}, 'codigo', None)
+            return lambda parametros: self._obter(codigo)
+        if partes == ['busca']:
+            return self._buscar
+        if partes == ['filtro']:
+            return self._filtrar
+        if partes == ['contagem']:
+            return lambda parametros: {'total': self.server.leitura().contar_livros()}
+        raise ErroRequisicao(HTTPStatus.NOT_FOUND, f"Recurso não encontrado: {caminho}")
+
+    def _listar(self, parametros: dict) -> dict:
+        db = self.server.leitura()
+        limite = self._limite(parametros)
+        if 'inicio' in parametros:
+            livros = db.pagina_por_posicao(self._inteiro(parametros, 'inicio', 0), limite)
+        else:
+            titulo = parametros.get('apos_titulo')
+            codigo = self._inteiro(parametros, 'apos_codigo', None)
+            livros = db.pagina_apos(titulo, codigo, limite)
+
+        proxima = None
+        if len(livros) == limite:
+            proxima = {'apos_titulo': livros[-1].titulo, 'apos_codigo': livros[-1].codigo}
+        return {'livros': [livro.to_dict() for livro in livros], 'proxima': proxima}
+
+    def _obter(self, codigo: int) -> dict:
+        livro = self.server.leitura().buscar_livro_por_codigo(codigo)
+        if livro is None:
+            raise ErroRequisicao(HTTPStatus.NOT_FOUND, f"Livro {codigo} não encontrado")
+        return livro.to_dict()
+
+    def _filtrar(self, parametros: dict) -> dict:
+        filtros = {nome: parametros.get(nome) for nome in ('genero', 'editora', 'autor')}
+        filtros['ano_min'] = self._inteiro(parametros, 'ano_min', None)
+        filtros['ano_max'] = self._inteiro(parametros, 'ano_max', None)
+        resultado = self.server.leitura().filtrar(limite=self._limite(parametros),
+                                                  inicio=self._inteiro(parametros, 'inicio', 0),
+                                                  **filtros)
+        return {'livros': [livro.to_dict() for livro in resultado.livros],
+                'total': resultado.total,
+                'facetas': {faceta: [list(item) for item in contagens]
+                            for faceta, contagens in resultado.facetas.items()}}
+
+    def _buscar(self, parametros: dict) -> dict:
+        db = self.server.db_manager
+        termo = parametros.get('q', '').strip()
+        if not termo:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, "Informe o termo de busca em q")
+        if parametros.get('modo') == 'aproximado':
+            return self._buscar_aproximado(termo, parametros)
+        if not db.fts_disponivel:
+            raise ErroRequisicao(HTTPStatus.SERVICE_UNAVAILABLE,
+                                 "Busca textual indisponível: SQLite sem suporte a FTS5")
+
+        campos = [campo for campo in parametros.get('campos', '').split(',') if campo] or None
+        try:
+            resultados = db.pesquisar(termo, campos, self._limite(parametros))
+        except ValueError as e:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, str(e))
+        return {'resultados': [dict(r.livro.to_dict(), relevancia=r.relevancia, trecho=r.trecho)
+                               for r in resultados]}
+
+    def _buscar_aproximado(self, termo: str, parametros: dict) -> dict:
+        campo = parametros.get('campo', 'titulo')
+        limiar = self._decimal(parametros, 'limiar', 0.5)
+        try:
+            resultados = self.server.busca_aproximada().buscar(termo, campo, limiar,
+                                                               self._limite(parametros))
+        except ValueError as e:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, str(e))
+        return {'resultados': [dict(livro.to_dict(), similaridade=round(similaridade, 4))
+                               for livro, similaridade in resultados]}
+
+    def _limite(self, parametros: dict) -> int:
+        limite = self._inteiro(parametros, 'limite', LIMITE_PADRAO)
+        if not 1 <= limite <= LIMITE_MAXIMO:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST,
+                                 f"limite deve estar entre 1 e {LIMITE_MAXIMO}")
+        return limite
+
+    @staticmethod
+    def _inteiro(parametros: dict, nome: str, padrao: Optional[int]) -> Optional[int]:
+        valor = parametros.get(nome)
+        if valor is None:
+            return padrao
+        try:
+            return int(valor)
+        except ValueError:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"{nome} deve ser um número inteiro")
+
+    @staticmethod
+    def _decimal(parametros: dict, nome: str, padrao: float) -> float:
+        valor = parametros.get(nome)
+        if valor is None:
+            return padrao
+        try:
+            return float(valor)
+        except ValueError:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f"{nome} deve ser um número")
+
+    def _etags_aceitas(self) -> set:
+        cabecalho = self.headers.get('If-None-Match', '')
+        return {etag.strip() for etag in cabecalho.split(',') if etag.strip()}
+
+    def _aceita_gzip(self) -> bool:
+        codificacoes = self.headers.get('Accept-Encoding', '')
+        return any(item.split(';')[0].strip() == 'gzip' for item in codificacoes.split(','))
+
+    def _enviar(self, status: HTTPStatus, dados: Optional[dict], etag: Optional[str],
+                incluir_corpo: bool):
+        corpo = b''
+        if dados is not None:
+            corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if corpo:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            if len(corpo) >= TAMANHO_MINIMO_GZIP and self._aceita_gzip():
+                corpo = gzip.compress(corpo, compresslevel=5)
+                self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        if incluir_corpo and corpo:
+            self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        if not self.server.silencioso:
+            super().log_message(formato, *args)
+
+
+def main(argv=None):
+    """Função principal do servidor"""
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON do catálogo de livros")
+    parser.add_argument('--banco', default="catalogo_livros.db", help="Arquivo do banco de dados")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço de escuta")
+    parser.add_argument('--porta', type=int, default=8000, help="Porta de escuta")
+    parser.add_argument('--pool', type=int, default=8, help="Conexões no pool do banco")
+    parser.add_argument('--validade-versao', type=float, default=1.0,
+                        help="Segundos entre releituras da versão do catálogo (ETag)")
+    parser.add_argument('--silencioso', action='store_true', help="Não registra cada requisição")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="Atende leituras de uma cópia do catálogo em memória")
+    args = parser.parse_args(argv)
+
+    try:
+        db_manager = DatabaseManager(args.banco, tamanho_pool=args.pool)
+    except Exception as e:
+        print(f"Erro ao abrir o banco de dados: {e}")
+        return 1
+
+    snapshot = None
+    if args.snapshot:
+        snapshot = SnapshotCatalogo(db_manager)
+        inicio = time.monotonic()
+        total = snapshot.carregar()
+        print(f"Snapshot com {total} livros carregado em {time.monotonic() - inicio:.2f} s")
+
+    servidor = ServidorCatalogo((args.host, args.porta), db_manager,
+                                args.validade_versao, args.silencioso, snapshot)
+    print(f"Servindo o catálogo {args.banco} em http://{args.host}:{servidor.server_port}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("Encerrando...")
+    finally:
+        servidor.server_close()
+        db_manager.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
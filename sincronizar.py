@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Catálogo de Livros - Sincronização de Réplicas
+Copia para cada réplica só as alterações feitas na origem desde a sincronização
+anterior, lidas do registro de alterações (tabela alteracoes), em vez do arquivo inteiro
+
+Uso:
+    python sincronizar.py catalogo_livros.db filial_centro.db
+    python sincronizar.py catalogo_livros.db filial1.db filial2.db --compactar
+    python sincronizar.py catalogo_livros.db filial1.db --completa --lote 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from bisect import bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import DatabaseManager
+from livro import Livro
+
+
+# Chaves da tabela metadados da réplica com a posição da última sincronização
+CHAVE_ORIGEM = 'sincronizacao_origem'
+CHAVE_SEQ = 'sincronizacao_seq'
+
+
+class ResultadoSincronizacao:
+    """
+    Resumo de uma sincronização
+    realocados traz os pares (codigo_antigo, codigo_novo) dos livros criados na réplica
+    cujo código passou a ser usado pela origem.
+    """
+
+    def __init__(self, completa: bool):
+        self.completa = completa
+        self.alteracoes = 0
+        self.inseridos = 0
+        self.atualizados = 0
+        self.excluidos = 0
+        self.inalterados = 0
+        self.realocados: List[Tuple[int, int]] = []
+        self.lotes = 0
+        self.seq = 0
+        self.segundos = 0.0
+
+    def __str__(self):
+        modo = 'completa' if self.completa else 'incremental'
+        return (f"ResultadoSincronizacao({modo}, seq={self.seq}, inseridos={self.inseridos}, "
+                f"atualizados={self.atualizados}, excluidos={self.excluidos}, "
+                f"realocados={len(self.realocados)})")
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def mesmo_livro(livro: Livro, outro: Livro) -> bool:
+    """Compara todos os campos, inclusive a versão"""
+    return livro.to_dict() == outro.to_dict()
+
+
+def sincronizar(origem: DatabaseManager, replica: DatabaseManager, tamanho_lote: int = 1000,
+                completa: bool = False,
+                progresso: Optional[Callable[[ResultadoSincronizacao], None]] = None
+                ) -> ResultadoSincronizacao:
+    """
+    Leva para a réplica as alterações da origem desde a última sincronização
+    Os livros da origem são gravados na réplica com o mesmo código e versão, e os
+    excluídos na origem são excluídos da réplica, em uma transação por lote de
+    tamanho_lote livros; a posição no registro da origem é gravada na mesma transação,
+    então uma sincronização interrompida continua de onde parou.
+    Livros criados na própria réplica são mantidos. Se a origem passa a usar o código
+    de um deles, o livro da origem fica com o código e o local é gravado com um código
+    novo (veja ResultadoSincronizacao.realocados), na ordem dos códigos: o resultado
+    depende só do conteúdo dos bancos.
+    A sincronização é completa (compara todos os livros) na primeira vez, quando a
+    réplica vinha de outra origem, quando o registro da origem já descartou alterações
+    que a réplica não recebeu ou com completa=True. Na primeira vez, a réplica fica
+    idêntica à origem.
+    progresso(resultado) é chamado após cada lote.
+    """
+    if tamanho_lote < 1:
+        raise ValueError("Tamanho do lote deve ser positivo")
+    if os.path.abspath(origem.db_name) == os.path.abspath(replica.db_name):
+        raise ValueError("Origem e réplica são o mesmo banco")
+
+    inicio = time.perf_counter()
+    identificador = origem.identificador_banco()
+    if replica.identificador_banco() == identificador:
+        # Réplica criada copiando o arquivo da origem: passa a ter identidade própria
+        replica.gravar_metadado('identificador', random.getrandbits(63))
+
+    primeira = replica.ler_metadado(CHAVE_ORIGEM) != identificador
+    seq = None if primeira else replica.ler_metadado(CHAVE_SEQ)
+
+    resultado = None
+    if seq is not None and not completa:
+        resultado = _sincronizar_incremental(origem, replica, identificador, seq,
+                                             tamanho_lote, progresso)
+    if resultado is None:
+        resultado = _sincronizar_completa(origem, replica, identificador, primeira,
+                                          tamanho_lote, progresso)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def _sincronizar_incremental(origem: DatabaseManager, replica: DatabaseManager,
+                             identificador: int, seq: int, tamanho_lote: int,
+                             progresso) -> Optional[ResultadoSincronizacao]:
+    """
+    Aplica as alterações registradas na origem após seq; retorna None se parte delas
+    já foi descartada do registro (é preciso uma sincronização completa)
+    """
+    resultado = ResultadoSincronizacao(completa=False)
+    resultado.seq = seq
+    while True:
+        alteracoes = origem.alteracoes_desde(resultado.seq, tamanho_lote)
+        if alteracoes is None:
+            return None
+        if not alteracoes:
+            return resultado
+
+        # Vários registros do mesmo livro valem como um: o estado atual dele na origem
+        codigos = sorted({codigo for _, codigo, _ in alteracoes})
+        livros = {livro.codigo: livro for livro in origem.buscar_livros_por_codigos(codigos)}
+        resultado.alteracoes += len(alteracoes)
+        resultado.seq = alteracoes[-1][0]
+        _aplicar_lote(replica, livros, codigos, False, resultado,
+                      {CHAVE_ORIGEM: identificador, CHAVE_SEQ: resultado.seq})
+        if progresso is not None:
+            progresso(resultado)
+        if len(alteracoes) < tamanho_lote:
+            return resultado
+
+
+def _sincronizar_completa(origem: DatabaseManager, replica: DatabaseManager,
+                          identificador: int, primeira: bool, tamanho_lote: int,
+                          progresso) -> ResultadoSincronizacao:
+    """
+    Compara todos os livros da origem com os da réplica, em ordem de código
+    A posição no registro só é gravada no último lote: interrompida, a sincronização
+    recomeça completa.
+    """
+    resultado = ResultadoSincronizacao(completa=True)
+    replica.gravar_metadado(CHAVE_SEQ, None)
+    codigos_replica = replica.listar_codigos()
+    anterior = 0
+
+    with origem.leitura_exportacao(tamanho_lote=tamanho_lote, contar=False) as (_, lotes):
+        # Na mesma transação da leitura: alterações posteriores ficam para a próxima vez
+        resultado.seq = origem.ultima_alteracao()
+        for lote in lotes:
+            livros = {linha[0]: Livro(*linha) for linha in lote}
+            ultimo = lote[-1][0]
+            # Livros da réplica no intervalo do lote que não existem na origem
+            ausentes = codigos_replica[bisect_right(codigos_replica, anterior):
+                                       bisect_right(codigos_replica, ultimo)]
+            codigos = sorted(livros.keys() | set(ausentes))
+            _aplicar_lote(replica, livros, codigos, primeira, resultado, {})
+            anterior = ultimo
+            if progresso is not None:
+                progresso(resultado)
+
+    restantes = codigos_replica[bisect_right(codigos_replica, anterior):]
+    for indice in range(0, len(restantes), tamanho_lote):
+        _aplicar_lote(replica, {}, restantes[indice:indice + tamanho_lote], primeira, resultado, {})
+    _aplicar_lote(replica, {}, [], primeira, resultado,
+                  {CHAVE_ORIGEM: identificador, CHAVE_SEQ: resultado.seq})
+    if progresso is not None:
+        progresso(resultado)
+    return resultado
+
+
+def _aplicar_lote(replica: DatabaseManager, livros: Dict[int, Livro], codigos: Sequence[int],
+                  primeira: bool, resultado: ResultadoSincronizacao, metadados: Dict[str, int]):
+    """
+    Leva para a réplica, em uma transação, o estado na origem dos códigos informados
+    (código ausente de livros = livro excluído na origem) e grava os metadados
+    Com primeira=True, todos os livros da réplica contam como cópias da origem.
+    """
+    with replica.transacao():
+        atuais = {livro.codigo: livro for livro in replica.buscar_livros_por_codigos(codigos)}
+        replicados = set(atuais) if primeira else replica.codigos_replicados(atuais)
+
+        gravar, excluir, inalterados, realocar = [], [], [], []
+        for codigo in codigos:
+            livro, atual = livros.get(codigo), atuais.get(codigo)
+            local = atual is not None and codigo not in replicados
+            if livro is None:
+                if atual is not None and not local:
+                    excluir.append(codigo)
+            elif atual is None:
+                gravar.append(livro)
+            elif mesmo_livro(atual, livro):
+                inalterados.append(codigo)
+            else:
+                if local:
+                    realocar.append(atual)
+                gravar.append(livro)
+
+        inseridos, atualizados = replica.replicar_livros(gravar)
+        replica.marcar_replicados(inalterados)
+        if excluir:
+            replica.deletar_livros(excluir)
+        # Depois dos livros da origem: o código novo fica acima de todos os já usados
+        for livro in realocar:
+            codigo = replica.criar_livro(livro, permitir_duplicado=True)
+            resultado.realocados.append((livro.codigo, codigo))
+        for chave, valor in metadados.items():
+            replica.gravar_metadado(chave, valor)
+
+    resultado.inseridos += inseridos
+    resultado.atualizados += atualizados
+    resultado.excluidos += len(excluir)
+    resultado.inalterados += len(inalterados)
+    resultado.lotes += 1
+
+
+def compactar(origem: DatabaseManager, replicas: Iterable[DatabaseManager] = (),
+              manter: int = 0) -> int:
+    """
+    Descarta do registro da origem as alterações que todas as réplicas informadas já
+    receberam, mantendo ao menos as manter mais recentes; retorna quantas foram removidas
+    Réplicas ausentes da lista que ficarem para trás fazem uma sincronização completa.
+    """
+    identificador = origem.identificador_banco()
+    ate = origem.ultima_alteracao() - max(manter, 0)
+    for replica in replicas:
+        seq = None
+        if replica.ler_metadado(CHAVE_ORIGEM) == identificador:
+            seq = replica.ler_metadado(CHAVE_SEQ)
+        ate = min(ate, seq or 0)
+    return origem.compactar_alteracoes(ate) if ate > 0 else 0
+
+
+def main(argv=None):
+    """Função principal da sincronização"""
+    parser = argparse.ArgumentParser(description="Sincroniza réplicas do catálogo de livros")
+    parser.add_argument('origem', help="Banco de origem (ex.: catalogo_livros.db)")
+    parser.add_argument('replicas', nargs='+', help="Bancos das réplicas")
+    parser.add_argument('--lote', type=int, default=1000, help="Livros por transação")
+    parser.add_argument('--completa', action='store_true',
+                        help="Compara todos os livros em vez de usar o registro de alterações")
+    parser.add_argument('--compactar', action='store_true',
+                        help="Descarta do registro da origem o que todas as réplicas já receberam")
+    parser.add_argument('--manter', type=int, default=0,
+                        help="Alterações mais recentes mantidas no registro ao compactar")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.origem):
+        print(f"Banco de origem não encontrado: {args.origem}")
+        return 1
+
+    origem = DatabaseManager(args.origem)
+    replicas = []
+    falhas = 0
+    try:
+        for caminho in args.replicas:
+            replica = DatabaseManager(caminho)
+            replicas.append(replica)
+            try:
+                resultado = sincronizar(origem, replica, args.lote, args.completa)
+            except Exception as e:
+                print(f"{caminho}: erro na sincronização: {e}")
+                falhas += 1
+                continue
+            modo = 'completa' if resultado.completa else 'incremental'
+            print(f"{caminho}: sincronização {modo} até a alteração {resultado.seq} em "
+                  f"{resultado.segundos:.2f} s - {resultado.inseridos} inseridos, "
+                  f"{resultado.atualizados} atualizados, {resultado.excluidos} excluídos")
+            for antigo, novo in resultado.realocados:
+                print(f"  livro local {antigo} passou para o código {novo}")
+
+        if args.compactar and not falhas:
+            removidas = compactar(origem, replicas, args.manter)
+            print(f"Registro da origem compactado: {removidas} alterações descartadas")
+    finally:
+        for replica in replicas:
+            replica.fechar()
+        origem.fechar()
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,547 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import compress, islice, repeat
+from operator import floordiv
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from database import DatabaseManager, ResultadoFiltro
+from livro import Livro
+
+
+COLUNAS_ORDENACAO = ('titulo', 'codigo', 'autor', 'genero', 'editora', 'ano_publicacao')
+COLUNAS_AGRUPAMENTO = ('autor', 'genero', 'editora', 'ano_publicacao', 'decada')
+
+# Fração de linhas excluídas a partir da qual as colunas são reconstruídas sem elas
+FRACAO_COMPACTACAO = 0.25
+# Alterações lidas do registro por consulta
+LOTE_ALTERACOES = 10000
+
+
+def _bytes(mascara: int, tamanho: int) -> bytes:
+    """Máscara inteira de volta para um byte (0 ou 1) por linha"""
+    return mascara.to_bytes(tamanho, 'little')
+
+
+def _inteiro(mascara: Union[bytes, bytearray]) -> int:
+    """
+    Máscara de um byte (0 ou 1) por linha como inteiro, para combinar filtros com &
+    em uma só operação sobre todas as linhas
+    """
+    return int.from_bytes(mascara, 'little')
+
+
+class ColunaDicionario:
+    """
+    Coluna de texto codificada por dicionário
+    Cada valor distinto é guardado uma vez em valores; por linha, a coluna guarda só o
+    índice do valor (array('i')). Valores que deixam de ser usados permanecem no
+    dicionário até o snapshot ser recarregado.
+    """
+
+    def __init__(self):
+        self.valores: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.codigos = array('i')
+
+    def codificar(self, valor: str) -> int:
+        id_valor = self.ids.get(valor)
+        if id_valor is None:
+            id_valor = self.ids[valor] = len(self.valores)
+            self.valores.append(valor)
+        return id_valor
+
+    def estender(self, valores: Iterable[str]):
+        """Acrescenta uma coluna inteira de valores (um lote de linhas)"""
+        valores = list(valores)
+        for valor in set(valores).difference(self.ids):
+            self.codificar(valor)
+        self.codigos.extend(map(self.ids.__getitem__, valores))
+
+    def mascara(self, valor: str) -> bytes:
+        """Um byte por linha: 1 onde a coluna é igual ao valor"""
+        id_valor = self.ids.get(valor)
+        if id_valor is None:
+            return bytes(len(self.codigos))
+        return bytes(map(id_valor.__eq__, self.codigos))
+
+    def postos(self) -> List[int]:
+        """Posição de cada valor do dicionário na ordem alfabética (chave de ordenação)"""
+        postos = [0] * len(self.valores)
+        for posto, id_valor in enumerate(sorted(range(len(self.valores)),
+                                                key=self.valores.__getitem__)):
+            postos[id_valor] = posto
+        return postos
+
+    def __getitem__(self, posicao: int) -> str:
+        return self.valores[self.codigos[posicao]]
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def memoria(self) -> int:
+        return (sys.getsizeof(self.codigos) + sys.getsizeof(self.valores)
+                + sys.getsizeof(self.ids) + sum(map(sys.getsizeof, self.valores)))
+
+    def __str__(self):
+        return f"ColunaDicionario(linhas={len(self.codigos)}, distintos={len(self.valores)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class _Colunas:
+    """
+    Colunas do snapshot, com as linhas em ordem de código
+    Linhas excluídas ficam marcadas em vivos (0) até a próxima compactação, para que
+    as posições das demais não mudem; ordem guarda as posições vivas em ordem de
+    (titulo, codigo).
+    """
+
+    def __init__(self):
+        self.codigos = array('i')
+        self.anos = array('i')
+        self.versoes = array('i')
+        self.titulos: List[str] = []
+        self.autores = ColunaDicionario()
+        self.generos = ColunaDicionario()
+        self.editoras = ColunaDicionario()
+        self.vivos = bytearray()
+        self.excluidos = 0
+        self.ordem = array('i')
+        self.ordem_valida = True
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def anexar_lote(self, linhas: List[tuple]):
+        """Acrescenta linhas na ordem de COLUNAS_LIVRO, com códigos maiores que os atuais"""
+        codigos, titulos, autores, generos, editoras, anos, versoes = zip(*linhas)
+        self.codigos.extend(codigos)
+        self.titulos.extend(titulos)
+        self.autores.estender(autores)
+        self.generos.estender(generos)
+        self.editoras.estender(editoras)
+        self.anos.extend(anos)
+        self.versoes.extend(versoes)
+        self.vivos.extend(repeat(1, len(linhas)))
+
+    def ordenar(self):
+        """Refaz a ordem por título (as posições já estão em ordem de código)"""
+        self.ordem = array('i', sorted(compress(range(len(self.codigos)), self.vivos),
+                                       key=self.titulos.__getitem__))
+        self.ordem_valida = True
+
+    def compactar(self):
+        """Descarta as linhas excluídas e refaz a ordem"""
+        vivos = self.vivos
+        self.codigos = array('i', compress(self.codigos, vivos))
+        self.anos = array('i', compress(self.anos, vivos))
+        self.versoes = array('i', compress(self.versoes, vivos))
+        self.titulos = list(compress(self.titulos, vivos))
+        for coluna in (self.autores, self.generos, self.editoras):
+            coluna.codigos = array('i', compress(coluna.codigos, vivos))
+        self.vivos = bytearray(repeat(1, len(self.codigos)))
+        self.excluidos = 0
+        self.ordenar()
+
+    def posicao(self, codigo: int) -> Optional[int]:
+        """Posição da linha viva com o código, ou None"""
+        posicao = bisect_left(self.codigos, codigo)
+        if posicao < len(self.codigos) and self.codigos[posicao] == codigo \
+                and self.vivos[posicao]:
+            return posicao
+        return None
+
+    def livro(self, posicao: int) -> Livro:
+        return Livro(self.codigos[posicao], self.titulos[posicao], self.autores[posicao],
+                     self.generos[posicao], self.editoras[posicao], self.anos[posicao],
+                     self.versoes[posicao])
+
+    def indice_ordem(self, titulo: str, codigo: int) -> int:
+        """Índice em ordem onde (titulo, codigo) está ou entraria (busca binária)"""
+        inicio, fim = 0, len(self.ordem)
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            posicao = self.ordem[meio]
+            if (self.titulos[posicao], self.codigos[posicao]) < (titulo, codigo):
+                inicio = meio + 1
+            else:
+                fim = meio
+        return inicio
+
+    def aplicar(self, codigo: int, livro: Optional[Livro]):
+        """Aplica o estado atual de um livro (None se foi excluído)"""
+        posicao = bisect_left(self.codigos, codigo)
+        existe = posicao < len(self.codigos) and self.codigos[posicao] == codigo
+        if existe and self.vivos[posicao]:
+            if self.ordem_valida:
+                del self.ordem[self.indice_ordem(self.titulos[posicao], codigo)]
+            if livro is None:
+                self.vivos[posicao] = 0
+                self.titulos[posicao] = ''
+                self.excluidos += 1
+                return
+            self._definir(posicao, livro)
+        elif livro is None:
+            return
+        elif existe:
+            # Código reaproveitado (ex.: réplica sincronizada) de uma linha excluída
+            self._definir(posicao, livro)
+            self.vivos[posicao] = 1
+            self.excluidos -= 1
+        elif posicao == len(self.codigos):
+            self.anexar_lote([(livro.codigo, livro.titulo, livro.autor, livro.genero,
+                               livro.editora, livro.ano_publicacao, livro.versao)])
+        else:
+            self._inserir(posicao, livro)
+            # As posições seguintes mudaram: a ordem é refeita ao final das alterações
+            self.ordem_valida = False
+
+        if self.ordem_valida:
+            self.ordem.insert(self.indice_ordem(livro.titulo, codigo), posicao)
+
+    def _definir(self, posicao: int, livro: Livro):
+        self.titulos[posicao] = livro.titulo
+        self.autores.codigos[posicao] = self.autores.codificar(livro.autor)
+        self.generos.codigos[posicao] = self.generos.codificar(livro.genero)
+        self.editoras.codigos[posicao] = self.editoras.codificar(livro.editora)
+        self.anos[posicao] = livro.ano_publicacao
+        self.versoes[posicao] = livro.versao
+
+    def _inserir(self, posicao: int, livro: Livro):
+        self.codigos.insert(posicao, livro.codigo)
+        self.titulos.insert(posicao, livro.titulo)
+        self.autores.codigos.insert(posicao, self.autores.codificar(livro.autor))
+        self.generos.codigos.insert(posicao, self.generos.codificar(livro.genero))
+        self.editoras.codigos.insert(posicao, self.editoras.codificar(livro.editora))
+        self.anos.insert(posicao, livro.ano_publicacao)
+        self.versoes.insert(posicao, livro.versao)
+        self.vivos.insert(posicao, 1)
+
+
+class SnapshotCatalogo:
+    """
+    Cópia do catálogo em memória, em colunas compactas, para atender leituras sem
+    consultar o SQLite
+    codigo, ano_publicacao e versao ficam em array('i'); autor, gênero e editora são
+    codificados por dicionário (ColunaDicionario) e os títulos ficam em uma lista.
+    Filtros são máscaras de um byte por linha, geradas e combinadas por funções em C
+    (map, compress, operações com inteiros), sem laço Python por linha.
+    atualizar() aplica só os livros alterados desde a carga, lidos do registro de
+    alterações do banco (DatabaseManager.alteracoes_desde). Seguro para uso entre threads.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, fracao_compactacao: float = FRACAO_COMPACTACAO):
+        self.db_manager = db_manager
+        self.fracao_compactacao = fracao_compactacao
+        self.seq = 0
+        self.carregado = False
+        self._colunas = _Colunas()
+        self._lock = threading.RLock()
+        self._lock_atualizacao = threading.Lock()
+        self._facetas_gerais: Optional[Tuple[int, Dict[str, List[Tuple[Union[str, int], int]]]]] = None
+
+    def carregar(self) -> int:
+        """Lê o catálogo inteiro; retorna o número de livros carregados"""
+        colunas = _Colunas()
+        with self.db_manager.leitura_exportacao(contar=False) as (_, lotes):
+            # Na mesma transação da leitura: alterações posteriores ficam para atualizar()
+            seq = self.db_manager.ultima_alteracao()
+            for lote in lotes:
+                colunas.anexar_lote(lote)
+        colunas.ordenar()
+
+        with self._lock:
+            self._colunas = colunas
+            self.seq = seq
+            self.carregado = True
+            self._facetas_gerais = None
+        return len(colunas)
+
+    def atualizar(self) -> int:
+        """
+        Aplica as escritas feitas no banco desde a última carga ou atualização
+        Recarrega tudo se o registro já descartou alterações que o snapshot não viu, ou
+        se há mais alterações que livros. Retorna quantos livros foram relidos.
+        """
+        with self._lock_atualizacao:
+            if not self.carregado:
+                return self.carregar()
+
+            ultima = self.db_manager.ultima_alteracao()
+            if ultima == self.seq:
+                return 0
+            if ultima - self.seq > len(self):
+                return self.carregar()
+
+            relidos = 0
+            while True:
+                alteracoes = self.db_manager.alteracoes_desde(self.seq, LOTE_ALTERACOES)
+                if alteracoes is None:
+                    return self.carregar()
+                if not alteracoes:
+                    return relidos
+
+                codigos = list(dict.fromkeys(codigo for _, codigo, _ in alteracoes))
+                livros = {livro.codigo: livro
+                          for livro in self.db_manager.buscar_livros_por_codigos(codigos)}
+                with self._lock:
+                    colunas = self._colunas
+                    for codigo in codigos:
+                        colunas.aplicar(codigo, livros.get(codigo))
+                    if colunas.excluidos > self.fracao_compactacao * len(colunas):
+                        colunas.compactar()
+                    elif not colunas.ordem_valida:
+                        colunas.ordenar()
+                    # Os livros relidos podem ser mais novos que seq; reaplicá-los é inofensivo
+                    self.seq = alteracoes[-1][0]
+                    self._facetas_gerais = None
+                relidos += len(codigos)
+                if len(alteracoes) < LOTE_ALTERACOES:
+                    return relidos
+
+    def __len__(self):
+        colunas = self._colunas
+        return len(colunas) - colunas.excluidos
+
+    def contar_livros(self) -> int:
+        return len(self)
+
+    def buscar_livro_por_codigo(self, codigo: int) -> Optional[Livro]:
+        with self._lock:
+            posicao = self._colunas.posicao(codigo)
+            return self._colunas.livro(posicao) if posicao is not None else None
+
+    def pagina_por_posicao(self, inicio: int, limite: int = 50) -> List[Livro]:
+        """Página que começa na posição informada, em ordem de título"""
+        with self._lock:
+            colunas = self._colunas
+            inicio = max(inicio, 0)
+            return [colunas.livro(posicao) for posicao in colunas.ordem[inicio:inicio + limite]]
+
+    def pagina_apos(self, titulo: Optional[str] = None, codigo: Optional[int] = None,
+                    limite: int = 50) -> List[Livro]:
+        """Página seguinte ao par (titulo, codigo), em ordem de título (como no DatabaseManager)"""
+        with self._lock:
+            colunas = self._colunas
+            inicio = 0
+            if titulo is not None:
+                # Primeiro (titulo, codigo) estritamente maior que o informado
+                inicio = colunas.indice_ordem(titulo, (codigo if codigo is not None else 0) + 1)
+            return [colunas.livro(posicao) for posicao in colunas.ordem[inicio:inicio + limite]]
+
+    def iterar_livros(self, tamanho_lote: int = 500, **filtros) -> Iterator[Livro]:
+        """
+        Percorre os livros que atendem aos filtros (os de filtrar) em ordem de título
+        Os livros são lidos em lotes, retomando a partir do último visto, então
+        atualizações concorrentes não invalidam a iteração.
+        """
+        if tamanho_lote < 1:
+            raise ValueError("Tamanho do lote deve ser positivo")
+
+        ultimo = None
+        while True:
+            with self._lock:
+                colunas = self._colunas
+                aceita = self._predicado(colunas, **filtros)
+                indice = colunas.indice_ordem(ultimo[0], ultimo[1] + 1) if ultimo else 0
+                lote = []
+                for posicao in islice(colunas.ordem, indice, None):
+                    if aceita(posicao):
+                        lote.append(colunas.livro(posicao))
+                        if len(lote) == tamanho_lote:
+                            break
+            yield from lote
+            if len(lote) < tamanho_lote:
+                return
+            ultimo = (lote[-1].titulo, lote[-1].codigo)
+
+    def filtrar(self, genero: Optional[str] = None, editora: Optional[str] = None,
+                ano_min: Optional[int] = None, ano_max: Optional[int] = None,
+                autor: Optional[str] = None, limite: int = 50, inicio: int = 0,
+                ordenar_por: str = 'titulo', decrescente: bool = False) -> ResultadoFiltro:
+        """
+        Busca facetada em memória, com o mesmo resultado de DatabaseManager.filtrar
+        (sem o termo de busca textual): página, total e contagens por gênero, editora e
+        década, cada faceta considerando os demais filtros
+        A página pode ser ordenada por qualquer coluna de COLUNAS_ORDENACAO; empates
+        ficam em ordem de título.
+        """
+        if ordenar_por not in COLUNAS_ORDENACAO:
+            raise ValueError(f"Coluna de ordenação inválida: {ordenar_por}")
+
+        with self._lock:
+            colunas = self._colunas
+            mascaras = self._mascaras(colunas, autor=autor, genero=genero, editora=editora,
+                                      ano_min=ano_min, ano_max=ano_max)
+            vivos = _inteiro(colunas.vivos)
+            selecao = vivos
+            for mascara in mascaras.values():
+                selecao &= mascara
+            selecionadas = _bytes(selecao, len(colunas))
+
+            livros = []
+            if limite > 0:
+                posicoes = self._ordenar(colunas, selecionadas, ordenar_por, decrescente,
+                                         inicio + limite)
+                livros = [colunas.livro(posicao)
+                          for posicao in islice(posicoes, max(inicio, 0), inicio + limite)]
+
+            if not mascaras:
+                facetas = self._facetas_sem_filtros(colunas, selecionadas)
+            else:
+                facetas = {}
+                for faceta in ('genero', 'editora', 'decada'):
+                    outras = vivos
+                    for nome, mascara in mascaras.items():
+                        if nome != faceta and not (faceta == 'decada' and nome.startswith('ano_')):
+                            outras &= mascara
+                    facetas[faceta] = self._contar(colunas, faceta, _bytes(outras, len(colunas)))
+            return ResultadoFiltro(livros, selecionadas.count(1), facetas)
+
+    def agrupar(self, coluna: str, **filtros) -> List[Tuple[Union[str, int], int]]:
+        """
+        Contagens (valor, quantidade) de uma coluna de COLUNAS_AGRUPAMENTO entre os livros
+        que atendem aos filtros, da mais frequente para a menos
+        """
+        if coluna not in COLUNAS_AGRUPAMENTO:
+            raise ValueError(f"Coluna de agrupamento inválida: {coluna}")
+        with self._lock:
+            colunas = self._colunas
+            selecao = _inteiro(colunas.vivos)
+            for mascara in self._mascaras(colunas, **filtros).values():
+                selecao &= mascara
+            return self._contar(colunas, coluna, _bytes(selecao, len(colunas)))
+
+    def memoria(self) -> Dict[str, int]:
+        """Bytes aproximados ocupados por cada coluna do snapshot e o total"""
+        with self._lock:
+            colunas = self._colunas
+            uso = {
+                'codigo': sys.getsizeof(colunas.codigos),
+                'titulo': sys.getsizeof(colunas.titulos) + sum(map(sys.getsizeof, colunas.titulos)),
+                'autor': colunas.autores.memoria(),
+                'genero': colunas.generos.memoria(),
+                'editora': colunas.editoras.memoria(),
+                'ano_publicacao': sys.getsizeof(colunas.anos),
+                'versao': sys.getsizeof(colunas.versoes),
+                'controle': sys.getsizeof(colunas.vivos) + sys.getsizeof(colunas.ordem),
+            }
+        uso['total'] = sum(uso.values())
+        return uso
+
+    def comparar_memoria(self, amostra: int = 10000) -> Dict[str, float]:
+        """
+        Compara a memória do snapshot com a de uma lista de Livro com os mesmos dados
+        (como a de listar_livros, em que cada livro tem seus próprios textos e inteiros),
+        estimada a partir de uma amostra de livros
+        """
+        snapshot = self.memoria()['total']
+        with self._lock:
+            colunas = self._colunas
+            quantidade = len(self)
+            passo = max(1, quantidade // amostra)
+            livros = [colunas.livro(posicao) for posicao in colunas.ordem[::passo]]
+        por_livro = 0.0
+        if livros:
+            por_livro = sum(
+                sys.getsizeof(livro) + sys.getsizeof(livro.titulo) + sys.getsizeof(livro.autor)
+                + sys.getsizeof(livro.genero) + sys.getsizeof(livro.editora)
+                + sys.getsizeof(livro.codigo) + sys.getsizeof(livro.ano_publicacao)
+                + sys.getsizeof(livro.versao)
+                for livro in livros
+            ) / len(livros)
+        lista = sys.getsizeof([None] * quantidade) + por_livro * quantidade
+        return {'snapshot': snapshot, 'lista_livros': lista,
+                'razao': lista / snapshot if snapshot else 0.0}
+
+    @staticmethod
+    def _mascaras(colunas: _Colunas, autor: Optional[str] = None, genero: Optional[str] = None,
+                  editora: Optional[str] = None, ano_min: Optional[int] = None,
+                  ano_max: Optional[int] = None) -> Dict[str, int]:
+        """Máscara (como inteiro) de cada filtro informado"""
+        mascaras = {}
+        for nome, coluna, valor in (('autor', colunas.autores, autor),
+                                    ('genero', colunas.generos, genero),
+                                    ('editora', colunas.editoras, editora)):
+            if valor is not None:
+                mascaras[nome] = _inteiro(coluna.mascara(valor))
+        if ano_min is not None:
+            mascaras['ano_min'] = _inteiro(bytes(map(ano_min.__le__, colunas.anos)))
+        if ano_max is not None:
+            mascaras['ano_max'] = _inteiro(bytes(map(ano_max.__ge__, colunas.anos)))
+        return mascaras
+
+    @staticmethod
+    def _predicado(colunas: _Colunas, autor: Optional[str] = None, genero: Optional[str] = None,
+                   editora: Optional[str] = None, ano_min: Optional[int] = None,
+                   ano_max: Optional[int] = None):
+        """Teste linha a linha dos mesmos filtros de _mascaras, para percorrer poucas linhas"""
+        condicoes = []
+        for coluna, valor in ((colunas.autores, autor), (colunas.generos, genero),
+                              (colunas.editoras, editora)):
+            if valor is not None:
+                condicoes.append((coluna.codigos, coluna.ids.get(valor, -1)))
+
+        def aceita(posicao: int) -> bool:
+            if not all(codigos[posicao] == id_valor for codigos, id_valor in condicoes):
+                return False
+            ano = colunas.anos[posicao]
+            return (ano_min is None or ano >= ano_min) and (ano_max is None or ano <= ano_max)
+        return aceita
+
+    @staticmethod
+    def _ordenar(colunas: _Colunas, selecionadas: bytes, ordenar_por: str, decrescente: bool,
+                 necessarias: int) -> Iterator[int]:
+        """Posições selecionadas na ordem pedida"""
+        if ordenar_por == 'titulo':
+            ordem = colunas.ordem[::-1] if decrescente else colunas.ordem
+            return compress(ordem, map(selecionadas.__getitem__, ordem))
+
+        # Parte da ordem por título, então a ordenação estável deixa os empates por título
+        posicoes = list(compress(colunas.ordem, map(selecionadas.__getitem__, colunas.ordem)))
+        if ordenar_por == 'codigo':
+            chaves = list(map(colunas.codigos.__getitem__, posicoes))
+        elif ordenar_por == 'ano_publicacao':
+            chaves = list(map(colunas.anos.__getitem__, posicoes))
+        else:
+            coluna = {'autor': colunas.autores, 'genero': colunas.generos,
+                      'editora': colunas.editoras}[ordenar_por]
+            chaves = list(map(coluna.postos().__getitem__,
+                              map(coluna.codigos.__getitem__, posicoes)))
+        indices = sorted(range(len(posicoes)), key=chaves.__getitem__, reverse=decrescente)
+        return map(posicoes.__getitem__, indices)
+
+    @staticmethod
+    def _contar(colunas: _Colunas, coluna: str, selecionadas: bytes) -> List[Tuple[Union[str, int], int]]:
+        """Contagens (valor, quantidade) de uma coluna entre as linhas selecionadas"""
+        if coluna in ('ano_publicacao', 'decada'):
+            anos = compress(colunas.anos, selecionadas)
+            if coluna == 'decada':
+                contagem = Counter(map(floordiv, anos, repeat(10)))
+                contagem = {decada * 10: quantidade for decada, quantidade in contagem.items()}
+            else:
+                contagem = Counter(anos)
+        else:
+            dicionario = {'autor': colunas.autores, 'genero': colunas.generos,
+                          'editora': colunas.editoras}[coluna]
+            contagem = {dicionario.valores[id_valor]: quantidade for id_valor, quantidade
+                        in Counter(compress(dicionario.codigos, selecionadas)).items()}
+        return sorted(contagem.items(), key=lambda item: (-item[1], item[0]))
+
+    def _facetas_sem_filtros(self, colunas: _Colunas, selecionadas: bytes):
+        """Contagens do catálogo inteiro, guardadas até a próxima alteração"""
+        if self._facetas_gerais is None or self._facetas_gerais[0] != self.seq:
+            facetas = {faceta: self._contar(colunas, faceta, selecionadas)
+                       for faceta in ('genero', 'editora', 'decada')}
+            self._facetas_gerais = (self.seq, facetas)
+        return self._facetas_gerais[1]
+
+    def __str__(self):
+        return f"SnapshotCatalogo(livros={len(self)}, seq={self.seq})"
+
+    def __repr__(self):
+        return self.__str__()
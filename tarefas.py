@@ -0,0 +1,193 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Tarefa:
+    """
+    Operação submetida ao DespachanteTarefas
+    Uma tarefa cancelada não chama ao_concluir nem ao_falhar: se ainda estava na fila,
+    nem chega a ser executada; se já estava em execução, o resultado é descartado.
+    """
+
+    def __init__(self, funcao: Callable[[], Any], ao_concluir: Optional[Callable[[Any], None]],
+                 ao_falhar: Optional[Callable[[Exception], None]], descricao: str,
+                 grupo: Optional[str], cancelavel: bool):
+        self.funcao = funcao
+        self.ao_concluir = ao_concluir
+        self.ao_falhar = ao_falhar
+        self.descricao = descricao
+        self.grupo = grupo
+        self.cancelavel = cancelavel
+        self.cancelada = False
+        self.concluida = False
+        self._despachante: Optional['DespachanteTarefas'] = None
+
+    def cancelar(self) -> bool:
+        """Cancela a tarefa; retorna False se ela não pode mais ser cancelada"""
+        if self._despachante is None:
+            return False
+        return self._despachante.cancelar(self)
+
+    def __str__(self):
+        return f"Tarefa({self.descricao or self.funcao})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class DespachanteTarefas:
+    """
+    Executa as operações de banco da interface em uma thread de trabalho
+    As tarefas rodam uma de cada vez, na ordem de envio, e os resultados voltam por
+    uma fila verificada com root.after, então os callbacks sempre rodam na thread da
+    interface. Uma tarefa nova de um grupo (ex.: 'lista') cancela a anterior do mesmo
+    grupo que ainda não terminou. Escritas devem ser enviadas com cancelavel=False.
+    ao_mudar_ocupado(ocupado, descricao) é chamado quando há tarefas há mais de
+    atraso_ocupado_ms e quando a última termina, para a interface indicar o trabalho.
+    interromper(ident_thread), se informado, aborta a consulta em andamento ao cancelar
+    a tarefa em execução (ex.: DatabaseManager.interromper).
+    """
+
+    def __init__(self, root, ao_mudar_ocupado: Optional[Callable[[bool, str], None]] = None,
+                 interromper: Optional[Callable[[int], None]] = None,
+                 intervalo_ms: int = 50, atraso_ocupado_ms: int = 200):
+        self.root = root
+        self.ao_mudar_ocupado = ao_mudar_ocupado
+        self.interromper = interromper
+        self.intervalo_ms = intervalo_ms
+        self.atraso_ocupado_ms = atraso_ocupado_ms
+
+        self._pendentes: List[Tarefa] = []
+        self._grupos: Dict[str, Tarefa] = {}
+        self._em_execucao: Optional[Tarefa] = None
+        self._lock = threading.Lock()
+        self._verificando = None
+        self._aviso_ocupado = None
+        self.ocupado = False
+        self._trabalhos = queue.Queue()
+        self._resultados = queue.Queue()
+        self._thread = threading.Thread(target=self._trabalhar, name="tarefas", daemon=True)
+        self._thread.start()
+
+    def executar(self, funcao: Callable[[], Any], ao_concluir: Optional[Callable[[Any], None]] = None,
+                 ao_falhar: Optional[Callable[[Exception], None]] = None, descricao: str = '',
+                 grupo: Optional[str] = None, cancelavel: bool = True) -> Tarefa:
+        """Agenda funcao() na thread de trabalho; os callbacks rodam na thread da interface"""
+        tarefa = Tarefa(funcao, ao_concluir, ao_falhar, descricao, grupo, cancelavel)
+        tarefa._despachante = self
+        if grupo is not None:
+            anterior = self._grupos.get(grupo)
+            if anterior is not None:
+                self.cancelar(anterior)
+            self._grupos[grupo] = tarefa
+
+        self._pendentes.append(tarefa)
+        self._trabalhos.put(tarefa)
+        if self._verificando is None:
+            self._verificando = self.root.after(self.intervalo_ms, self._verificar)
+        if not self.ocupado and self._aviso_ocupado is None:
+            self._aviso_ocupado = self.root.after(self.atraso_ocupado_ms, self._avisar_ocupado)
+        return tarefa
+
+    def cancelar(self, tarefa: Tarefa) -> bool:
+        """Cancela uma tarefa pendente ou em execução (se for cancelável)"""
+        if tarefa.concluida or tarefa.cancelada:
+            return tarefa.cancelada
+        if not tarefa.cancelavel:
+            return False
+
+        with self._lock:
+            tarefa.cancelada = True
+            # Com o lock, a thread não passa para a próxima tarefa durante a interrupção
+            if self._em_execucao is tarefa and self.interromper is not None:
+                self.interromper(self._thread.ident)
+        self._esquecer(tarefa)
+        return True
+
+    def cancelar_grupo(self, grupo: str) -> bool:
+        """Cancela a tarefa do grupo que ainda não terminou, se houver"""
+        tarefa = self._grupos.get(grupo)
+        return tarefa is not None and self.cancelar(tarefa)
+
+    def cancelar_todas(self) -> int:
+        """Cancela todas as tarefas canceláveis; retorna quantas foram canceladas"""
+        return sum(self.cancelar(tarefa) for tarefa in list(self._pendentes))
+
+    def fechar(self):
+        """Descarta as tarefas canceláveis e encerra a thread após as demais"""
+        self.cancelar_todas()
+        for agendado in (self._verificando, self._aviso_ocupado):
+            if agendado is not None:
+                self.root.after_cancel(agendado)
+        self._verificando = self._aviso_ocupado = None
+        self._trabalhos.put(None)
+
+    def aguardar(self, timeout: Optional[float] = None):
+        """Aguarda o fim da thread de trabalho (após fechar)"""
+        self._thread.join(timeout)
+
+    def _esquecer(self, tarefa: Tarefa):
+        if tarefa in self._pendentes:
+            self._pendentes.remove(tarefa)
+        if tarefa.grupo is not None and self._grupos.get(tarefa.grupo) is tarefa:
+            del self._grupos[tarefa.grupo]
+        if not self._pendentes:
+            self._definir_ocupado(False)
+
+    def _trabalhar(self):
+        """Laço da thread de trabalho; tarefas canceladas na fila são puladas"""
+        while True:
+            tarefa = self._trabalhos.get()
+            if tarefa is None:
+                return
+
+            with self._lock:
+                if tarefa.cancelada:
+                    continue
+                self._em_execucao = tarefa
+            try:
+                self._resultados.put((tarefa, tarefa.funcao(), None))
+            except Exception as e:
+                self._resultados.put((tarefa, None, e))
+            finally:
+                with self._lock:
+                    self._em_execucao = None
+
+    def _verificar(self):
+        """Entrega na thread da interface os resultados das tarefas concluídas"""
+        self._verificando = None
+        while True:
+            try:
+                tarefa, resultado, erro = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+
+            if tarefa.cancelada:
+                continue
+            tarefa.concluida = True
+            self._esquecer(tarefa)
+            if erro is not None:
+                if tarefa.ao_falhar is not None:
+                    tarefa.ao_falhar(erro)
+            elif tarefa.ao_concluir is not None:
+                tarefa.ao_concluir(resultado)
+
+        if self._pendentes and self._verificando is None:
+            self._verificando = self.root.after(self.intervalo_ms, self._verificar)
+
+    def _avisar_ocupado(self):
+        self._aviso_ocupado = None
+        if self._pendentes:
+            self._definir_ocupado(True)
+
+    def _definir_ocupado(self, ocupado: bool):
+        if not ocupado and self._aviso_ocupado is not None:
+            self.root.after_cancel(self._aviso_ocupado)
+            self._aviso_ocupado = None
+        if ocupado == self.ocupado:
+            return
+        self.ocupado = ocupado
+        if self.ao_mudar_ocupado is not None:
+            descricao = self._pendentes[0].descricao if ocupado and self._pendentes else ''
+            self.ao_mudar_ocupado(ocupado, descricao)
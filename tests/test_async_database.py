@@ -0,0 +1,32 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_database import AsyncDatabaseManager
+from database import DatabaseManager
+from livro import Livro
+
+
+def test_fechar_nao_fecha_gerenciador_informado(tmp_path):
+    db = DatabaseManager(str(tmp_path / "catalogo.db"))
+
+    async def usar():
+        async with AsyncDatabaseManager(db_manager=db) as fachada:
+            await fachada.criar_livro(Livro(None, "Helena", "Machado de Assis", "Romance",
+                                            "Ática", 1876))
+
+    asyncio.run(usar())
+    assert db.contar_livros() == 1
+    db.fechar()
+
+
+def test_fechar_fecha_gerenciador_proprio(tmp_path):
+    async def usar():
+        async with AsyncDatabaseManager(str(tmp_path / "catalogo.db")) as fachada:
+            await fachada.contar_livros()
+        return fachada
+
+    fachada = asyncio.run(usar())
+    assert fachada.db_manager.estatisticas_pool()['abertas'] == 0
@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import DatabaseManagerCache
+from livro import Livro
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManagerCache(str(tmp_path / "catalogo.db"))
+    yield db
+    db.fechar()
+
+
+def _em_outra_thread(funcao):
+    resultado = []
+    thread = threading.Thread(target=lambda: resultado.append(funcao()))
+    thread.start()
+    thread.join()
+    return resultado[0]
+
+
+def _titulo(db, codigo):
+    return db.buscar_livro_por_codigo(codigo).titulo
+
+
+def _titulos(db, titulo):
+    return [livro.titulo for livro in db.buscar_livros_por_titulo(titulo)]
+
+
+def _alterar_titulo(db, codigo, titulo):
+    livro = db.buscar_livro_por_codigo(codigo)
+    livro.titulo = titulo
+    db.atualizar_livro(livro)
+
+
+@pytest.fixture
+def codigo(db):
+    return db.criar_livro(Livro(None, "Helena", "Machado de Assis", "Romance", "Ática", 1876))
+
+
+def test_leitura_de_outra_thread_durante_transacao(db, codigo):
+    with db.transacao():
+        _alterar_titulo(db, codigo, "Iaiá Garcia")
+        assert _titulo(db, codigo) == "Iaiá Garcia"
+        # Outra thread lê (e guarda no cache) a versão confirmada, ainda a antiga
+        assert _em_outra_thread(lambda: _titulo(db, codigo)) == "Helena"
+        assert _em_outra_thread(lambda: _titulos(db, "Helena")) == ["Helena"]
+
+    assert _titulo(db, codigo) == "Iaiá Garcia"
+    assert _titulos(db, "Helena") == []
+    assert _em_outra_thread(lambda: _titulo(db, codigo)) == "Iaiá Garcia"
+
+
+def test_transacao_desfeita_mantem_cache(db, codigo):
+    assert _titulo(db, codigo) == "Helena"
+    with pytest.raises(RuntimeError):
+        with db.transacao():
+            _alterar_titulo(db, codigo, "Iaiá Garcia")
+            raise RuntimeError("desfazer")
+    assert _titulo(db, codigo) == "Helena"
+    assert _titulos(db, "Helena") == ["Helena"]
+
+
+def test_escrita_avulsa_invalida_na_hora(db, codigo):
+    assert _titulo(db, codigo) == "Helena"
+    _alterar_titulo(db, codigo, "Iaiá Garcia")
+    assert _titulo(db, codigo) == "Iaiá Garcia"
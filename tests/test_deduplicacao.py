@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from deduplicacao import LIMIAR_PADRAO, _Comparador, encontrar_duplicatas, main
+from livro import Livro
+from texto import impressao_digital
+
+# Volumes de uma série: títulos quase iguais que são livros diferentes
+SERIES = [
+    (("Harry Potter 1", "J. K. Rowling", "Rocco", 2000),
+     ("Harry Potter 2", "J. K. Rowling", "Rocco", 2000)),
+    (("Dom Casmurro Volume I", "Machado de Assis", "Ática", 1899),
+     ("Dom Casmurro Volume II", "Machado de Assis", "Ática", 1899)),
+    (("Os Maias tomo 1", "Eça de Queirós", "Lello", 1888),
+     ("Os Maias tomo 2", "Eça de Queirós", "Lello", 1888)),
+    (("Livro a139 de teste", "Autor Teste", "Editora Teste", 2020),
+     ("Livro a13939 de teste", "Autor Teste", "Editora Teste", 2020)),
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "catalogo.db"))
+    yield db
+    db.fechar()
+
+
+def _cadastrar(db, *dados):
+    for titulo, autor, editora, ano in dados:
+        db.criar_livro(Livro(None, titulo, autor, "Romance", editora, ano), permitir_duplicado=True)
+
+
+@pytest.mark.parametrize("livro, outro", SERIES)
+def test_volumes_diferentes_tem_similaridade_zero(livro, outro):
+    assert _Comparador().similaridade(impressao_digital(*livro), impressao_digital(*outro)) == 0.0
+
+
+@pytest.mark.parametrize("livro, outro", SERIES)
+def test_volumes_diferentes_nao_sao_agrupados(db, livro, outro):
+    _cadastrar(db, livro, outro)
+    assert encontrar_duplicatas(db, limiar=0.5).grupos == []
+
+
+def test_erro_de_digitacao_e_agrupado(db):
+    _cadastrar(db, ("O Cortiço", "Aluísio Azevedo", "Ática", 1890),
+               ("O Corticco", "Aluísio Azevedo", "Ática", 1890))
+    resultado = encontrar_duplicatas(db, limiar=LIMIAR_PADRAO)
+    assert len(resultado.grupos) == 1
+    assert [livro.titulo for livro, _ in resultado.grupos[0].duplicados] == ["O Corticco"]
+
+
+def test_mesmo_volume_e_agrupado(db):
+    _cadastrar(db, ("Dom Casmurro Volume II", "Machado de Assis", "Ática", 1899),
+               ("Dom Casmurro  volume II!", "Machado de Assis", "Atica", 1899),
+               ("Dom Casmurro Volume I", "Machado de Assis", "Ática", 1899))
+    resultado = encontrar_duplicatas(db)
+    assert len(resultado.grupos) == 1
+    assert resultado.duplicados == 1
+
+
+def test_aplicar_exige_limiar(db, tmp_path, capsys):
+    _cadastrar(db, ("Helena", "Machado de Assis", "Ática", 1876),
+               ("Helena", "Machado de Assis", "Ática", 1876))
+    relatorio = str(tmp_path / "mesclagem.csv")
+    assert main(["--banco", db.db_name, "--relatorio", relatorio, "--aplicar"]) == 1
+    assert "--limiar" in capsys.readouterr().err
+    assert db.contar_livros() == 2
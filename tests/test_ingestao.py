@@ -0,0 +1,71 @@
+import csv
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingestao
+from database import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "catalogo.db"))
+    yield db
+    db.fechar()
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    caminho = str(tmp_path / "livros.csv")
+    with open(caminho, 'w', newline='', encoding='utf-8') as saida:
+        escritor = csv.writer(saida)
+        escritor.writerow(['titulo', 'autor', 'genero', 'editora', 'ano_publicacao'])
+        for i in range(60):
+            escritor.writerow([f'Livro {i}', 'Autor', 'Romance', 'Editora', 2000 if i % 7 else 'x'])
+    return caminho
+
+
+def _escritores_vivos():
+    return [thread for thread in threading.enumerate()
+            if thread.name == 'ingestao-escritor' and thread.is_alive()]
+
+
+def test_ingestao_completa(db, arquivo, tmp_path):
+    rejeitados = str(tmp_path / "rejeitados.csv")
+    resultado = ingestao.ingerir(db, arquivo, processos=2, registros_por_bloco=10,
+                                 arquivo_rejeitados=rejeitados)
+    assert resultado.importacao.inseridos == db.contar_livros() == 51
+    assert resultado.rejeitados == 9
+    with open(rejeitados, encoding='utf-8') as entrada:
+        assert len(entrada.read().splitlines()) == 10
+
+
+def test_erro_na_leitura_espera_o_escritor(db, arquivo, tmp_path, monkeypatch):
+    dividir_blocos = ingestao.dividir_blocos
+
+    def dividir_com_erro(*argumentos):
+        for indice, bloco in enumerate(dividir_blocos(*argumentos)):
+            if indice == 3:
+                raise OSError("erro de leitura")
+            yield bloco
+
+    criar_livros_validados = db.criar_livros_validados
+
+    def criar_devagar(*argumentos):
+        time.sleep(0.2)
+        return criar_livros_validados(*argumentos)
+
+    monkeypatch.setattr(ingestao, 'dividir_blocos', dividir_com_erro)
+    db.criar_livros_validados = criar_devagar
+    with pytest.raises(OSError):
+        ingestao.ingerir(db, arquivo, processos=2, registros_por_bloco=10,
+                         arquivo_rejeitados=str(tmp_path / "rejeitados.csv"))
+    assert _escritores_vivos() == []
+    gravados = db.contar_livros()
+    time.sleep(0.5)
+    assert db.contar_livros() == gravados < 51
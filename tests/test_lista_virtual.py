@@ -0,0 +1,149 @@
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from lista_virtual import FonteCatalogo, FonteFiltro, FontePaginada
+from livro import Livro
+
+
+class ContadorConsultas:
+    """Repassa ao DatabaseManager contando as leituras de páginas"""
+
+    def __init__(self, db):
+        self.db = db
+        self.consultas = 0
+
+    def __getattr__(self, nome):
+        atributo = getattr(self.db, nome)
+        if nome.startswith('pagina_'):
+            self.consultas += 1
+        return atributo
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "catalogo.db"))
+    db.criar_livros([Livro(None, f"Livro {i:03}", "Autor", "Romance", "Editora", 2000)
+                     for i in range(0, 200, 2)])
+    yield db
+    db.fechar()
+
+
+@pytest.fixture
+def fonte(db):
+    fonte = FonteCatalogo(ContadorConsultas(db), folga=5)
+    fonte.janela(40, 10)
+    fonte.db_manager.consultas = 0
+    return fonte
+
+
+def _janela_do_banco(db, fonte):
+    return [livro.codigo for livro in db.pagina_por_posicao(fonte._inicio, len(fonte._livros))]
+
+
+def _criar(db, titulo):
+    livro = Livro(None, titulo, "Autor", "Romance", "Editora", 2000)
+    livro.codigo = db.criar_livro(livro)
+    return livro
+
+
+@pytest.mark.parametrize("titulo", ["Livro 071", "Livro 001", "Livro 199", "Livro 085"])
+def test_inserir_ajusta_janela_sem_consultar(db, fonte, titulo):
+    fonte.inserir(_criar(db, titulo))
+    assert fonte.db_manager.consultas == 0
+    assert [livro.codigo for livro in fonte._livros] == _janela_do_banco(db, fonte)
+
+
+def test_remover_da_janela_sem_consultar(db, fonte):
+    livro = fonte._livros[3]
+    db.deletar_livro(livro.codigo)
+    fonte.remover(livro.codigo)
+    assert fonte.db_manager.consultas == 0
+    assert [livro.codigo for livro in fonte._livros] == _janela_do_banco(db, fonte)
+
+
+def test_remover_fora_da_janela_relê(db, fonte):
+    primeiro = db.pagina_por_posicao(0, 1)[0]
+    db.deletar_livro(primeiro.codigo)
+    fonte.remover(primeiro.codigo)
+    assert [livro.codigo for livro in fonte.janela(40, 10)] == \
+        [livro.codigo for livro in db.pagina_por_posicao(40, 10)]
+
+
+def test_substituir_no_lugar_e_com_nova_posicao(db, fonte):
+    livro = copy.copy(fonte._livros[2])
+    livro.autor = "Outro Autor"
+    db.atualizar_livro(livro)
+    fonte.substituir(livro)
+    assert fonte._livros[2].autor == "Outro Autor"
+
+    livro = copy.copy(livro)
+    livro.titulo = "Livro 999"
+    db.atualizar_livro(livro)
+    fonte.substituir(livro)
+    assert fonte.db_manager.consultas == 0
+    assert [livro.codigo for livro in fonte._livros] == _janela_do_banco(db, fonte)
+
+
+def test_em_memoria_nao_consulta(fonte):
+    assert fonte.em_memoria(40, 10) is not None
+    assert fonte.em_memoria(80, 10) is None
+    assert fonte.db_manager.consultas == 0
+
+
+def test_leitura_preparada_e_aplicada(db, fonte):
+    buscar = fonte.preparar(60, 10)
+    assert fonte.db_manager.consultas == 0
+    assert fonte.aplicar(buscar())
+    assert [livro.codigo for livro in fonte.em_memoria(60, 10)] == \
+        [livro.codigo for livro in db.pagina_por_posicao(60, 10)]
+
+
+def test_leitura_obsoleta_e_descartada(db, fonte):
+    buscar = fonte.preparar(60, 10)
+    fonte.inserir(_criar(db, "Livro 081"))
+    assert not fonte.aplicar(buscar())
+    assert fonte.em_memoria(60, 10) is None
+
+
+def test_filtro_continua_sem_offset(db):
+    db.criar_livros([Livro(None, f"Poema {i:03}", "Autor", "Poesia", "Editora", 2000)
+                     for i in range(30)])
+    fonte = FonteFiltro(db, folga=5, genero="Romance")
+    paginas = []
+    filtrar_livros = db.filtrar_livros
+    db.filtrar_livros = lambda **argumentos: paginas.append(argumentos) or filtrar_livros(**argumentos)
+
+    esperado = [livro.codigo for livro in filtrar_livros(genero="Romance", limite=500)]
+    for inicio in range(0, 100, 7):
+        assert [livro.codigo for livro in fonte.janela(inicio, 10)] == esperado[inicio:inicio + 10]
+    assert paginas[0].get('apos') is None
+    assert all(pagina.get('apos') is not None and not pagina.get('inicio') for pagina in paginas[1:])
+
+
+def test_fonte_incompleta_falha_ao_ser_criada(db):
+    class FonteSemPosicao(FontePaginada):
+        def _pagina_apos(self, livro, limite):
+            return []
+
+        def _pagina_antes(self, livro, inicio, limite):
+            return []
+
+    with pytest.raises(TypeError):
+        FonteSemPosicao(db)
+
+
+@pytest.mark.parametrize("posicao, titulo", [(0, "Livro 999"), (-1, "Livro 000a")])
+def test_substituir_livro_que_atravessa_a_janela(db, fonte, posicao, titulo):
+    # Livro de antes da janela que passa para depois dela, e vice-versa
+    livro = db.pagina_por_posicao(0 if posicao == 0 else db.contar_livros() - 1, 1)[0]
+    livro.titulo = titulo
+    db.atualizar_livro(livro)
+    fonte.substituir(livro)
+    assert [livro.codigo for livro in fonte.janela(40, 10)] == \
+        [livro.codigo for livro in db.pagina_por_posicao(40, 10)]
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from importar import converter_registro
+from livro import Livro
+
+DADOS = {'titulo': 'Helena', 'autor': 'Machado de Assis', 'genero': 'Romance',
+         'editora': 'Ática', 'ano_publicacao': 1876}
+
+
+@pytest.mark.parametrize("versao", [None, '', '  '])
+def test_versao_vazia_equivale_a_ausente(versao):
+    assert Livro.from_dict(dict(DADOS, versao=versao)).versao is None
+    assert Livro.from_dict(converter_registro(dict(DADOS, versao=versao))).versao is None
+
+
+def test_versao_informada():
+    assert Livro.from_dict(converter_registro(dict(DADOS, versao='3'))).versao == 3
+    with pytest.raises(ValueError):
+        Livro.from_dict(dict(DADOS, versao='x'))
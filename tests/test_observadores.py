@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from livro import Livro
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "catalogo.db"))
+    yield db
+    db.fechar()
+
+
+def _livro(titulo):
+    return Livro(None, titulo, "Machado de Assis", "Romance", "Ática", 1899)
+
+
+def test_escrita_avulsa_avisa_na_hora(db):
+    avisos = []
+    db.adicionar_observador(avisos.append)
+    codigo = db.criar_livro(_livro("Dom Casmurro"))
+    assert avisos == [[codigo]]
+
+
+def test_transacao_avisa_depois_do_commit(db):
+    avisos, no_banco = [], []
+    db.adicionar_observador(avisos.append)
+    db.adicionar_observador(lambda codigos: no_banco.append(db.contar_livros()))
+    with db.transacao():
+        primeiro = db.criar_livro(_livro("Dom Casmurro"))
+        segundo = db.criar_livro(_livro("Helena"))
+        assert avisos == []
+    assert avisos == [[primeiro], [segundo]]
+    assert no_banco == [2, 2]
+
+
+def test_transacao_desfeita_nao_avisa(db):
+    avisos = []
+    db.adicionar_observador(avisos.append)
+    with pytest.raises(RuntimeError):
+        with db.transacao():
+            db.criar_livro(_livro("Dom Casmurro"))
+            raise RuntimeError("desfazer")
+    assert avisos == []
+    assert db.contar_livros() == 0
+    codigo = db.criar_livro(_livro("Helena"))
+    assert avisos == [[codigo]]
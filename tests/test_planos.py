@@ -0,0 +1,43 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from livro import Livro
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "catalogo.db"))
+    db.criar_livros([Livro(None, f"Livro {i}", f"Autor {i % 7}", f"Gênero {i % 3}",
+                           f"Editora {i % 5}", 1900 + i % 100) for i in range(500)])
+    yield db
+    db.fechar()
+
+
+def _ordenam(db):
+    return {nome for nome, _, _, ordena in db._consultas_diagnostico() if ordena}
+
+
+def test_banco_migrado_usa_indices(db):
+    planos = db.verificar_planos()
+    assert planos
+    for nome, detalhes in planos.items():
+        for detalhe in detalhes:
+            varre_livros = detalhe.split()[:2] == ['SCAN', 'livros']
+            assert not varre_livros or 'USING' in detalhe, f"{nome}: {detalhe}"
+            if nome not in _ordenam(db):
+                assert 'TEMP B-TREE' not in detalhe, f"{nome}: {detalhe}"
+
+
+def test_indice_removido_e_detectado(db):
+    with sqlite3.connect(db.db_name) as conn:
+        conn.execute("DROP INDEX idx_livros_impressao")
+    with pytest.raises(Exception, match="buscar_duplicado"):
+        db.verificar_planos()
+    planos = db.verificar_planos(falhar=False)
+    assert 'SCAN livros' in planos['buscar_duplicado']
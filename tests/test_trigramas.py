@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from livro import Livro
+from trigramas import BuscaAproximada, IndiceTrigramas
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "catalogo.db"))
+    yield db
+    db.fechar()
+
+
+def _livro(titulo, autor="Machado de Assis"):
+    return Livro(None, titulo, autor, "Romance", "Ática", 1899)
+
+
+def test_busca_tolera_erro_de_digitacao():
+    indice = IndiceTrigramas()
+    indice.adicionar(1, "Joaquim Maria Machado de Assis")
+    indice.adicionar(2, "Clarice Lispector")
+    assert [codigo for codigo, _ in indice.buscar("Machado de Asis")] == [1]
+
+
+def test_orcamento_pequeno_confere_a_similaridade_dos_candidatos():
+    titulos = ["Memórias Póstumas de Brás Cubas", "Memórias de um Sargento de Milícias",
+               "Memorial de Aires", "Quincas Borba", "Dom Casmurro", "Casa Velha"]
+    exato, limitado = IndiceTrigramas(), IndiceTrigramas(orcamento=1, max_conferidos=50)
+    for codigo, titulo in enumerate(titulos, 1):
+        exato.adicionar(codigo, titulo)
+        limitado.adicionar(codigo, titulo)
+    for termo in ("Memorias Postumas", "Dom Casmuro", "memorial"):
+        esperados = exato.buscar(termo, limiar=0.3)
+        encontrados = limitado.buscar(termo, limiar=0.3)
+        assert encontrados[0] == esperados[0]
+        assert set(encontrados) <= set(esperados)
+
+
+def test_escrita_nao_le_o_banco_e_aparece_na_busca_seguinte(db):
+    db.criar_livro(_livro("Dom Casmurro"))
+    busca = BuscaAproximada(db)
+    busca.carregar()
+
+    leituras = []
+    original = db.buscar_livros_por_codigos
+
+    def buscar_livros_por_codigos(codigos):
+        leituras.append(threading.current_thread())
+        return original(codigos)
+
+    db.buscar_livros_por_codigos = buscar_livros_por_codigos
+    codigo = db.criar_livro(_livro("Quincas Borba"))
+    assert leituras == []
+
+    assert [livro.codigo for livro, _ in busca.buscar("Quincas Borda")] == [codigo]
+    db.deletar_livro(codigo)
+    assert busca.buscar("Quincas Borda") == []
+
+
+def test_escrita_antes_da_carga_nao_fica_pendente(db):
+    busca = BuscaAproximada(db)
+    db.criar_livro(_livro("Dom Casmurro"))
+    assert not busca._pendentes
+    assert [livro.titulo for livro, _ in busca.buscar("Dom Casmuro")] == ["Dom Casmurro"]
@@ -0,0 +1,48 @@
+import re
+import unicodedata
+from typing import List
+
+
+# Letras e dígitos, como no tokenizador unicode61 do FTS5 (sublinhado separa palavras)
+_PADRAO_PALAVRA = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def remover_acentos(texto: str) -> str:
+    """Remove os acentos de um texto ("Ângelo" -> "Angelo")"""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def normalizar(texto: str) -> str:
+    """Normaliza um texto para comparação: sem acentos, minúsculo e com espaços simples"""
+    return ' '.join(remover_acentos(texto).casefold().split())
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Divide um texto normalizado em palavras, ignorando pontuação"""
+    return _PADRAO_PALAVRA.findall(normalizar(texto))
+
+
+def corresponde_prefixos(texto: str, termo: str) -> bool:
+    """
+    Indica se cada palavra do termo é prefixo de alguma palavra do texto
+    Reproduz em memória a regra da busca textual do banco.
+    """
+    palavras = tokenizar(texto)
+    return all(any(palavra.startswith(prefixo) for palavra in palavras)
+               for prefixo in tokenizar(termo))
+
+
+# Separa os campos da impressão digital; tokenizar() nunca o devolve dentro de uma palavra
+SEPARADOR_IMPRESSAO = '|'
+
+
+def impressao_digital(titulo: str, autor: str, editora: str, ano_publicacao: int) -> str:
+    """
+    Chave para reconhecer o mesmo livro cadastrado duas vezes: título, autor e editora
+    sem acentos, maiúsculas, pontuação e espaços extras, seguidos do ano
+    ("O Cortiço", "Aluísio  Azevedo", "Ática", 1890) -> "o cortico|aluisio azevedo|atica|1890"
+    """
+    return SEPARADOR_IMPRESSAO.join(
+        [' '.join(tokenizar(campo)) for campo in (titulo, autor, editora)] + [str(ano_publicacao)]
+    )
@@ -0,0 +1,328 @@
+import threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+from heapq import nlargest
+from itertools import groupby
+from math import ceil
+from operator import itemgetter
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+from livro import Livro
+from texto import tokenizar
+
+
+CAMPOS_APROXIMADOS = ('titulo', 'autor')
+
+
+@lru_cache(maxsize=100000)
+def _trigramas_palavra(palavra: str) -> FrozenSet[str]:
+    marcada = f'  {palavra} '
+    return frozenset(marcada[i:i + 3] for i in range(len(marcada) - 2))
+
+
+def trigramas_palavras(palavras: Iterable[str]) -> Set[str]:
+    """Trigramas de palavras já normalizadas, com margem de dois espaços antes e um depois"""
+    return set().union(*map(_trigramas_palavra, palavras))
+
+
+def extrair_trigramas(texto: str) -> Set[str]:
+    """Trigramas do texto normalizado ("Assis" -> {'  a', ' as', 'ass', 'ssi', 'sis', 'is '})"""
+    return trigramas_palavras(tokenizar(texto))
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido em memória de trigrama -> textos que o contêm
+    Textos repetidos (o mesmo autor em vários livros) são indexados uma única vez e
+    guardam o conjunto de códigos em que aparecem.
+    A similaridade de um texto com o termo é a fração dos trigramas do termo presentes
+    no texto, então "Machado de Asis" encontra "Joaquim Maria Machado de Assis"; entre
+    textos igualmente similares, vem antes o mais curto (maior Jaccard).
+    Na busca, as listas dos trigramas mais raros são percorridas primeiro, enquanto
+    couberem no orçamento de entradas; se todas couberem, a contagem já dá a
+    similaridade exata. Senão, os candidatos são conferidos em ordem decrescente de
+    contagem parcial até que nenhum dos restantes possa entrar entre os melhores, ou
+    até max_conferidos. Um texto com similaridade mínima s contém pelo menos um dos
+    (1 - s) * n + 1 trigramas mais raros do termo, então o resultado é exato quando
+    essas listas cabem no orçamento; em termos formados só por trigramas muito comuns
+    ele é aproximado, mas o tempo de busca continua limitado.
+    Textos que deixam de ser usados continuam nas listas até compactar(), chamada
+    automaticamente quando eles passam de um quarto do índice.
+    """
+
+    def __init__(self, orcamento: int = 40000, max_conferidos: int = 1000):
+        self.orcamento = orcamento
+        self.max_conferidos = max_conferidos
+        self._postagens: Dict[str, array] = {}
+        self._ids: Dict[Tuple[str, ...], int] = {}
+        self._palavras: Dict[int, Tuple[str, ...]] = {}
+        self._tamanhos: Dict[int, int] = {}
+        self._codigos: Dict[int, Set[int]] = {}
+        self._texto_de: Dict[int, int] = {}
+        self._proximo_id = 0
+        self._entradas = 0
+        self._obsoletas = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._texto_de)
+
+    def adicionar(self, codigo: int, texto: str):
+        """Indexa (ou reindexa) o texto de um código"""
+        palavras = tuple(tokenizar(texto))
+        with self._lock:
+            anterior = self._texto_de.get(codigo)
+            if anterior is not None:
+                if self._palavras[anterior] == palavras:
+                    return
+                self._desassociar(codigo, anterior)
+
+            identificador = self._ids.get(palavras)
+            if identificador is None:
+                identificador = self._novo_texto(palavras)
+            self._codigos[identificador].add(codigo)
+            self._texto_de[codigo] = identificador
+            self._compactar_se_preciso()
+
+    def remover(self, codigo: int):
+        """Remove um código do índice"""
+        with self._lock:
+            identificador = self._texto_de.get(codigo)
+            if identificador is not None:
+                self._desassociar(codigo, identificador)
+                self._compactar_se_preciso()
+
+    def _novo_texto(self, palavras: Tuple[str, ...]) -> int:
+        identificador = self._proximo_id
+        self._proximo_id += 1
+        self._ids[palavras] = identificador
+        self._palavras[identificador] = palavras
+        self._codigos[identificador] = set()
+        trigramas = trigramas_palavras(palavras)
+        self._tamanhos[identificador] = len(trigramas)
+        for trigrama in trigramas:
+            lista = self._postagens.get(trigrama)
+            if lista is None:
+                lista = self._postagens[trigrama] = array('q')
+            lista.append(identificador)
+        self._entradas += len(trigramas)
+        return identificador
+
+    def _desassociar(self, codigo: int, identificador: int):
+        """Tira o código do texto; textos sem códigos ficam obsoletos nas listas"""
+        del self._texto_de[codigo]
+        codigos = self._codigos[identificador]
+        codigos.discard(codigo)
+        if not codigos:
+            del self._ids[self._palavras.pop(identificador)]
+            del self._codigos[identificador]
+            self._obsoletas += self._tamanhos.pop(identificador)
+
+    def limpar(self):
+        """Esvazia o índice"""
+        with self._lock:
+            self._postagens.clear()
+            self._ids.clear()
+            self._palavras.clear()
+            self._tamanhos.clear()
+            self._codigos.clear()
+            self._texto_de.clear()
+            self._entradas = self._obsoletas = 0
+
+    def compactar(self):
+        """Reconstrói as listas, descartando as entradas de textos que não são mais usados"""
+        with self._lock:
+            postagens: Dict[str, array] = {}
+            for identificador, palavras in self._palavras.items():
+                for trigrama in trigramas_palavras(palavras):
+                    lista = postagens.get(trigrama)
+                    if lista is None:
+                        lista = postagens[trigrama] = array('q')
+                    lista.append(identificador)
+            self._postagens = postagens
+            self._entradas = sum(len(lista) for lista in postagens.values())
+            self._obsoletas = 0
+
+    def _compactar_se_preciso(self):
+        if self._obsoletas > 1000 and self._obsoletas * 4 > self._entradas:
+            self.compactar()
+
+    def buscar(self, termo: str, limiar: float = 0.5, limite: int = 20) -> List[Tuple[int, float]]:
+        """
+        Retorna até limite pares (codigo, similaridade) com similaridade >= limiar,
+        do mais parecido para o menos parecido (empates pelo menor código)
+        """
+        if not 0 < limiar <= 1:
+            raise ValueError("Limiar deve estar entre 0 (exclusivo) e 1")
+
+        consulta = extrair_trigramas(termo)
+        if not consulta or limite < 1:
+            return []
+
+        total = len(consulta)
+        minimo = ceil(limiar * total - 1e-9)
+        with self._lock:
+            listas = sorted((self._postagens.get(trigrama, ()) for trigrama in consulta), key=len)
+
+            # Lê as listas das mais raras para as mais comuns, enquanto couberem no orçamento
+            lidas, lidos = 0, 0
+            while lidas < total and (lidas == 0 or lidos + len(listas[lidas]) <= self.orcamento):
+                lidos += len(listas[lidas])
+                lidas += 1
+
+            contagem = Counter()
+            for lista in listas[:lidas]:
+                contagem.update(lista)
+            nao_lidas = total - lidas
+
+            # Candidatos pela contagem parcial (limite superior da similaridade), da maior
+            # para a menor; com listas não lidas, só os max_conferidos primeiros são conferidos
+            necessario = max(minimo - nao_lidas, 1)
+            if nao_lidas:
+                candidatos = nlargest(self.max_conferidos, contagem.items(), key=itemgetter(1))
+            else:
+                candidatos = sorted((item for item in contagem.items() if item[1] >= minimo),
+                                    key=itemgetter(1), reverse=True)
+
+            # (similaridade, jaccard, identificador) dos textos avaliados
+            avaliados: List[Tuple[float, float, int]] = []
+            for quantidade, grupo in groupby(candidatos, key=itemgetter(1)):
+                maximo = min(quantidade + nao_lidas, total) / total
+                # Para se os textos já avaliados acima do máximo restante bastam
+                garantidos = sum(len(self._codigos[identificador])
+                                 for similaridade, _, identificador in avaliados
+                                 if similaridade > maximo)
+                if quantidade < necessario or garantidos >= limite:
+                    break
+
+                for identificador, _ in grupo:
+                    palavras = self._palavras.get(identificador)
+                    if palavras is None:
+                        continue  # texto obsoleto
+                    if nao_lidas == 0:
+                        # Todas as listas lidas: a contagem já é exata
+                        comuns = quantidade
+                    else:
+                        comuns = len(consulta & trigramas_palavras(palavras))
+                    similaridade = comuns / total
+                    if similaridade >= limiar:
+                        jaccard = comuns / (total + self._tamanhos[identificador] - comuns)
+                        avaliados.append((similaridade, jaccard, identificador))
+
+            avaliados.sort(key=lambda item: (-item[0], -item[1]))
+            resultados: List[Tuple[float, float, int]] = []
+            for similaridade, jaccard, identificador in avaliados:
+                if len(resultados) >= limite and (similaridade, jaccard) < resultados[-1][:2]:
+                    break
+                resultados.extend((similaridade, jaccard, codigo)
+                                  for codigo in self._codigos[identificador])
+
+        resultados.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        return [(codigo, similaridade) for similaridade, _, codigo in resultados[:limite]]
+
+    def estatisticas(self) -> Dict[str, int]:
+        """Retorna o número de códigos, de textos e trigramas distintos e de entradas nas listas"""
+        with self._lock:
+            return {'codigos': len(self._texto_de), 'textos': len(self._palavras),
+                    'trigramas': len(self._postagens), 'entradas': self._entradas,
+                    'obsoletas': self._obsoletas}
+
+
+class BuscaAproximada:
+    """
+    Busca tolerante a erros de digitação por título e autor, sobre um DatabaseManager
+    Os índices são carregados do banco na primeira busca (ou em carregar()) e depois
+    acompanham as escritas feitas pelo gerenciador, como observador. O observador só
+    anota os códigos alterados; os livros são relidos e reindexados na busca seguinte,
+    sem atrasar quem escreveu. Escritas de outros processos só aparecem após recarregar().
+    """
+
+    def __init__(self, db_manager, orcamento: int = 40000, max_conferidos: int = 1000):
+        self.db_manager = db_manager
+        self.indices = {campo: IndiceTrigramas(orcamento, max_conferidos)
+                        for campo in CAMPOS_APROXIMADOS}
+        self.carregado = False
+        self._lock = threading.Lock()
+        # Códigos alterados desde a carga (ou durante ela), reindexados na próxima busca
+        self._carregando = False
+        self._pendentes: Set[int] = set()
+        self._lock_pendentes = threading.Lock()
+        db_manager.adicionar_observador(self._ao_alterar)
+
+    def carregar(self):
+        """Lê todos os livros do banco e reconstrói os índices"""
+        with self._lock:
+            self._carregar()
+
+    def _carregar(self):
+        with self._lock_pendentes:
+            self._carregando = True
+            self._pendentes.clear()
+        try:
+            for indice in self.indices.values():
+                indice.limpar()
+            for livro in self.db_manager.iterar_livros(tamanho_lote=5000):
+                self._indexar(livro)
+            self.carregado = True
+        finally:
+            with self._lock_pendentes:
+                self._carregando = False
+
+    def recarregar(self):
+        """Descarta os índices; serão reconstruídos na próxima busca"""
+        with self._lock:
+            self.carregado = False
+
+    def fechar(self):
+        """Deixa de acompanhar as escritas do gerenciador"""
+        self.db_manager.remover_observador(self._ao_alterar)
+
+    def buscar(self, termo: str, campo: str = 'titulo', limiar: float = 0.5,
+               limite: int = 20) -> List[Tuple[Livro, float]]:
+        """
+        Retorna até limite pares (livro, similaridade) do campo informado, do mais
+        parecido para o menos parecido
+        """
+        if campo not in self.indices:
+            raise ValueError(f"Campo de busca aproximada inválido: {campo}")
+        with self._lock:
+            if self.carregado:
+                with self._lock_pendentes:
+                    pendentes, self._pendentes = self._pendentes, set()
+                if pendentes:
+                    self._reindexar(pendentes)
+            if not self.carregado:
+                self._carregar()
+
+        encontrados = self.indices[campo].buscar(termo, limiar, limite)
+        livros = {livro.codigo: livro for livro in
+                  self.db_manager.buscar_livros_por_codigos([codigo for codigo, _ in encontrados])}
+        return [(livros[codigo], similaridade) for codigo, similaridade in encontrados
+                if codigo in livros]
+
+    def _indexar(self, livro: Livro):
+        for campo, indice in self.indices.items():
+            indice.adicionar(livro.codigo, getattr(livro, campo))
+
+    def _ao_alterar(self, codigos: Iterable[int]):
+        # Chamado na thread de quem escreveu: só anota, sem ler o banco. Antes da carga
+        # não há o que anotar, ela já lerá o estado atual
+        with self._lock_pendentes:
+            if self.carregado or self._carregando:
+                self._pendentes.update(codigos)
+
+    def _reindexar(self, codigos: Iterable[int]):
+        """Reindexa os livros alterados (os ausentes do banco foram excluídos)"""
+        codigos = list(codigos)
+        try:
+            livros = self.db_manager.buscar_livros_por_codigos(codigos)
+        except Exception:
+            # Sem saber o estado atual, o índice é refeito do zero
+            self.carregado = False
+            return
+
+        for livro in livros:
+            self._indexar(livro)
+        for codigo in set(codigos).difference(livro.codigo for livro in livros):
+            for indice in self.indices.values():
+                indice.remover(codigo)